@@ -0,0 +1,146 @@
+"""CPU benchmark of the time stepping of the conceptual models.
+
+Compares the runtime of a training step (forward and backward pass) of the conceptual models, when the step function
+is run eagerly (default) and when it is compiled (``compile_conceptual_model: True``), for several batch sizes and
+sequence lengths. With ``--baseline_ref``, the models of another git reference (e.g. the commit before the time loop
+was factored out) are also run, from a temporary ``git worktree``, so the table also shows whether the eager loop is
+slower than the one of that reference. The parameters are generated in the same way as in the hybrid model, with a
+static parameterization during the warmup period and the parameterization of the simulation period having gradients.
+
+Compiling is not a general speedup: it helps the models with many operations per timestep (e.g. HBV, SHM), but it
+can be slower for cheap models and for some batch sizes. linear_reservoir ignores the flag, so its compiled column
+runs the eager loop.
+
+Example
+-------
+    python benchmarks/conceptual_models_cpu.py --models hbv shm --batch_sizes 32 256 --seq_lengths 365 730
+    python benchmarks/conceptual_models_cpu.py --baseline_ref <commit>
+
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import torch
+
+from hy2dl.modelzoo.hybrid import _get_conceptual_model
+from hy2dl.utils.config import Config
+
+
+def training_step(model: torch.nn.Module, x_conceptual: dict[str, torch.Tensor], lstm_out: torch.Tensor, warmup: int):
+    """Run the warmup (without gradients) and the simulation period of a conceptual model, and backpropagate."""
+    parameters_warmup, parameters_simulation = model.map_parameters(lstm_out=lstm_out, warmup_period=warmup)
+    with torch.no_grad():
+        pred = model(x_conceptual={k: v[:, :warmup] for k, v in x_conceptual.items()}, parameters=parameters_warmup)
+    pred = model(
+        x_conceptual={k: v[:, warmup:] for k, v in x_conceptual.items()},
+        parameters=parameters_simulation,
+        initial_states=pred["final_states"],
+    )
+    pred["y_hat"].mean().backward()
+    return pred["y_hat"].detach()
+
+
+def benchmark(conceptual_model: str, compiled: bool, batch_size: int, seq_length: int, repeats: int):
+    """Return the mean runtime of a training step and the simulated outflow."""
+    cfg = Config(
+        {
+            "conceptual_model": conceptual_model,
+            "compile_conceptual_model": compiled,
+            "dynamic_parameterization_conceptual_model": ["FC", "sumax", "ki"],
+            "num_conceptual_models": 4,
+        },
+        dev_mode=True,
+    )
+    model = _get_conceptual_model(cfg)
+
+    generator = torch.Generator().manual_seed(0)
+    x_conceptual = {
+        "precipitation": torch.rand((batch_size, seq_length), generator=generator) * 10.0,
+        "temperature": torch.randn((batch_size, seq_length), generator=generator) * 5.0,
+        "pet": torch.rand((batch_size, seq_length), generator=generator) * 3.0,
+    }
+    n_param = len(model.parameter_ranges) * cfg.num_conceptual_models
+    lstm_out = torch.randn((batch_size, seq_length, n_param), generator=generator).requires_grad_()
+    warmup = seq_length // 2
+
+    # The first steps compile the step function (compiled version) and warm up the allocator.
+    for _ in range(2):
+        y_hat = training_step(model, x_conceptual, lstm_out, warmup)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        training_step(model, x_conceptual, lstm_out, warmup)
+    return (time.perf_counter() - start) / repeats, y_hat
+
+
+def run_baseline(args: argparse.Namespace) -> dict[tuple[str, int, int], tuple[float, torch.Tensor]]:
+    """Run the eager benchmarks with the models of `args.baseline_ref`, in a separate process."""
+    repository = Path(__file__).resolve().parents[1]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        worktree = Path(tmp_dir) / "baseline"
+        output = Path(tmp_dir) / "baseline.pt"
+        subprocess.run(
+            ["git", "-C", str(repository), "worktree", "add", "--detach", str(worktree), args.baseline_ref],
+            check=True,
+            capture_output=True,
+        )
+        try:
+            command = [sys.executable, __file__, "--output", str(output), "--repeats", str(args.repeats)]
+            command += ["--models", *args.models, "--batch_sizes", *map(str, args.batch_sizes)]
+            command += ["--seq_lengths", *map(str, args.seq_lengths)]
+            if args.num_threads is not None:
+                command += ["--num_threads", str(args.num_threads)]
+            subprocess.run(command, check=True, env={**os.environ, "PYTHONPATH": str(worktree / "src")})
+            return torch.load(output)
+        finally:
+            subprocess.run(
+                ["git", "-C", str(repository), "worktree", "remove", "--force", str(worktree)],
+                check=True,
+                capture_output=True,
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--models", nargs="+", default=["hbv", "shm", "nonsense", "linear_reservoir"])
+    parser.add_argument("--batch_sizes", nargs="+", type=int, default=[16, 64, 256])
+    parser.add_argument("--seq_lengths", nargs="+", type=int, default=[365, 730])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--num_threads", type=int, default=None)
+    parser.add_argument("--baseline_ref", type=str, default=None, help="git reference of the baseline models")
+    parser.add_argument("--output", type=str, default=None, help=argparse.SUPPRESS)  # eager results of the baseline
+    args = parser.parse_args()
+
+    if args.num_threads is not None:
+        torch.set_num_threads(args.num_threads)
+
+    cases = [(m, b, s) for m in args.models for b in args.batch_sizes for s in args.seq_lengths]
+    if args.output is not None:
+        torch.save({case: benchmark(case[0], False, case[1], case[2], args.repeats) for case in cases}, args.output)
+        sys.exit()
+
+    baseline = run_baseline(args) if args.baseline_ref is not None else {}
+
+    # Speedups of the eager version relative to the baseline (if any), and of the compiled version relative to the
+    # eager one. The differences are the maximum absolute difference to the outflow of the baseline (or of the eager
+    # version, without baseline).
+    print(
+        f"{'model':<18}{'batch':>7}{'seq':>7}{'baseline [s]':>14}{'eager [s]':>11}{'speedup':>9}{'max |diff|':>12}"
+        f"{'compiled [s]':>14}{'vs eager':>10}{'max |diff|':>12}"
+    )
+    for conceptual_model, batch_size, seq_length in cases:
+        t_eager, y_eager = benchmark(conceptual_model, False, batch_size, seq_length, args.repeats)
+        t_compiled, y_compiled = benchmark(conceptual_model, True, batch_size, seq_length, args.repeats)
+        t_base, y_base = baseline.get((conceptual_model, batch_size, seq_length), (float("nan"), y_eager))
+        print(
+            f"{conceptual_model:<18}{batch_size:>7}{seq_length:>7}{t_base:>14.3f}"
+            f"{t_eager:>11.3f}{t_base / t_eager:>8.2f}x{(y_eager - y_base).abs().max().item():>12.2e}"
+            f"{t_compiled:>14.3f}{t_eager / t_compiled:>9.2f}x{(y_compiled - y_base).abs().max().item():>12.2e}",
+            flush=True,
+        )
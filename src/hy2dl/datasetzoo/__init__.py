@@ -4,6 +4,7 @@ from hy2dl.datasetzoo.camelsgb import CAMELS_GB
 from hy2dl.datasetzoo.camelsus import CAMELS_US
 from hy2dl.datasetzoo.camelsch import CAMELS_CH
 from hy2dl.datasetzoo.caravan import CARAVAN
+from hy2dl.datasetzoo.consolidatedstore import ConsolidatedStore
 from hy2dl.datasetzoo.hourlycamelsde import Hourly_CAMELS_DE
 from hy2dl.datasetzoo.hourlycamelsus import Hourly_CAMELS_US
 from hy2dl.utils.config import Config
@@ -38,6 +39,8 @@ def get_dataset(cfg: Config) -> BaseDataset:
         Dataset = Hourly_CAMELS_US
     elif cfg.dataset.lower() == "hourly_camels_de":
         Dataset = Hourly_CAMELS_DE
+    elif cfg.dataset.lower() == "consolidated_store":
+        Dataset = ConsolidatedStore
     else:
         raise NotImplementedError(f"No dataset class implemented for dataset {cfg.dataset}")
 
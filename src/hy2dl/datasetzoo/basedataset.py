@@ -1,14 +1,20 @@
 import pickle
 import warnings
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
 from typing import Optional
 
 import numpy as np
 import pandas as pd
 import torch
-from numpy.lib.stride_tricks import sliding_window_view
 from torch.utils.data import Dataset
 from tqdm import tqdm
 
+from hy2dl.datasetzoo.cache import DataCache
+from hy2dl.datasetzoo.statistics import RunningStatistics
 from hy2dl.utils.config import Config
 
 
@@ -39,6 +45,18 @@ class BaseDataset(Dataset):
 
     """
 
+    # Attributes already read in this process, shared by all the instances (see `_load_attributes`). Creating one
+    # dataset per entity (e.g. during evaluation) then requires a single read of the attribute files.
+    _attributes_cache = {}
+
+    # Number of rows parsed at once when the time series files are read by periods (see `_read_csv`)
+    _csv_chunk_size = 50000
+
+    # Whether the dataset supports resolving the lagged features by offsetting the time index of the columns of their
+    # features (see `lagged_columns` and `virtual_lagged_features` in the configuration file), instead of adding them
+    # as columns of the dataframes (see `_add_lagged_features`)
+    _virtual_lagged_features = True
+
     # Function to initialize the data
     def __init__(
         self,
@@ -47,31 +65,67 @@ class BaseDataset(Dataset):
         check_NaN: Optional[bool] = True,
         entities_ids: Optional[str | list[str]] = None,
     ):
-        # Store configuration file
-        self.cfg = cfg
-
         # Define time period type
         allowed_periods = {"training", "validation", "testing"}
         if time_period not in allowed_periods:
             raise ValueError(f"`time_period` must be one of: {allowed_periods}, but got '{time_period}'.")
 
-        self.time_period = getattr(self.cfg, f"{time_period}_period")
+        self._initialize(
+            cfg=cfg,
+            time_period=getattr(cfg, f"{time_period}_period"),
+            check_NaN=check_NaN,
+            entities_ids=BaseDataset._get_entities_ids(cfg=cfg, time_period=time_period, entities_ids=entities_ids),
+        )
+        self._ingest_entities()
 
-        # Read entities_ids from variable
-        if entities_ids:
-            self.entities_ids = [entities_ids] if isinstance(entities_ids, str) else entities_ids
-        # Read entities_ids from configuration file
-        elif hasattr(self.cfg, f"path_entities_{time_period}"):
-            path_entities = getattr(self.cfg, f"path_entities_{time_period}")
-            entities_ids = np.loadtxt(path_entities, dtype="str").tolist()
-            self.entities_ids = [entities_ids] if isinstance(entities_ids, str) else entities_ids
-        else:
-            raise ValueError(
-                f"No entities_ids found. Provide the `entities_ids` variable directly or define in the configuration"
-                f"file either `path_entities` or `path_entities_{time_period}`"
-            )
+    def _initialize(
+        self,
+        cfg: Config,
+        time_period: list[str],
+        check_NaN: bool,
+        entities_ids: list[str],
+        df_attributes: Optional[pd.DataFrame] = None,
+    ):
+        """Define the structures and the information used to process the entities.
+
+        Parameters
+        ----------
+        cfg : Config
+            Configuration file.
+        time_period : list[str]
+            Start and end date of the period of interest.
+        check_NaN : bool
+            Whether to check for NaN values while processing the data.
+        entities_ids : list[str]
+            ID of the entities to be processed.
+        df_attributes : Optional[pd.DataFrame], default=None
+            Static attributes of the entities, already loaded (e.g. by the processes of the ingestion pool). By default,
+            they are loaded with `_load_attributes`.
+
+        """
+        # Store configuration file
+        self.cfg = cfg
+        self.time_period = time_period
+        self.check_NaN = check_NaN
+        self.entities_ids = entities_ids
+
+        # Lagged features, indexed by the name of their column, with the feature and the lag of each one. The lags are
+        # calculated with the rows that precede each timestep.
+        lagged_features = BaseDataset._lagged_columns(lagged_features=self.cfg.lagged_features)
+        self.max_lag = max((lag for _, lag in lagged_features.values()), default=0)
+
+        # With `virtual_lagged_features`, the lagged features are not stored as additional columns. They are read from
+        # the shared input store, with the time index of their feature shifted by the lag. For this, the store keeps
+        # `lag_rows` timesteps before the warmup period of each entity.
+        self.lagged_columns = (
+            lagged_features if self._virtual_lagged_features and self.cfg.virtual_lagged_features else {}
+        )
+        self.lag_rows = self.max_lag if self.lagged_columns else 0
+        self.use_input_store = self.cfg.deduplicate_inputs or bool(self.lagged_columns)
 
-        # Dictionaries to store the information used by the model. The dictionaries are basin-indexed.
+        # Dictionaries to store the information used by the model. The dictionaries are basin-indexed. If
+        # `contiguous_storage` is True, they are replaced at the end of the processing by [total_timesteps, n_features]
+        # tensors (see `_build_contiguous_storage`).
         self.x_d = {}  # dynamic input going into the lstm
         self.y_obs = {}  # target variable
         if self.cfg.forecast_input:
@@ -80,20 +134,36 @@ class BaseDataset(Dataset):
             self.x_s = {}  # static input (e.g. catchment attributes)
         if self.cfg.dynamic_input_conceptual_model:
             self.x_d_conceptual = {}  # conceptual input (case of hybrid models)
+        self.x_d_aggregated = {}  # aggregated dynamic input (case of custom_seq_processing)
+        if self.use_input_store:
+            self.x_store = {}  # shared store of the dynamic, forecast and conceptual inputs
+        self._standardize_input = False  # whether the inputs are standardized when the samples are read
+        self.quantization_error = {}  # maximum error of each variable due to the `storage_dtype` (if not float32)
 
         # Dictionary to store additional information
-        self.df_ts = {}  # processed dataframe for each basin.
+        self.df_ts = {}  # processed dataframe for each basin (not kept if `lean_storage` is True)
+        self.entity_dates = {}  # first date, time step and number of timesteps of each basin
         self.scaler = {}  # information to standardize the data
         self.basin_std = {}  # std of the target variable of each basin (can be used later in the loss function)
 
-        # List to store the valid entities (basin, time_index) that will be used for training.
-        self.valid_entities = []
-        basins_without_samples = []
+        # Index of the valid samples that will be used for training. Each sample is defined by the code of its basin
+        # (position of the basin in self.entity_table) and the time index of the last timestep of the hindcast period.
+        # Both are stored in compact arrays, so the index requires little memory and is shared without copies by the
+        # workers of the dataloader.
+        self.entity_table = []  # basins with valid samples
+        self.entity_index = {}  # position of each basin in self.entity_table
+        self.valid_entities_basin = np.array([], dtype=np.int32)
+        self.valid_entities_time = np.array([], dtype=np.int32)
+
+        # On-disk cache for the time series and attributes (optional)
+        self.cache = (
+            DataCache(path=self.cfg.path_cache, max_size_gb=self.cfg.cache_max_size_gb) if self.cfg.path_cache else None
+        )
 
         # --------------------------------------------------------------------------
         # Process static attributes
         if self.cfg.static_input:
-            self.df_attributes = self._read_attributes()
+            self.df_attributes = self._load_attributes() if df_attributes is None else df_attributes
 
         # Process additional features that can be included as inputs
         if self.cfg.path_additional_features:
@@ -112,6 +182,57 @@ class BaseDataset(Dataset):
         # Retrive unique forecast input names
         self.unique_forecast_input = BaseDataset.unique_values(x=self.cfg.forecast_input)
 
+        # Columns of the shared input store (`deduplicate_inputs` or lagged features). Each variable is stored once per
+        # basin, and the dynamic, forecast and conceptual inputs reference the columns of the store. The lagged features
+        # reference the column of their feature, with the lag given by `column_lag`. Conceptual inputs that are the
+        # mean of multiple variables are stored as additional columns.
+        self.column_lag = {}
+        if self.use_input_store:
+            conceptual_columns = {
+                k: [v] if isinstance(v, str) else v for k, v in (self.cfg.dynamic_input_conceptual_model or {}).items()
+            }
+            self.derived_columns = {
+                f"mean({', '.join(v)})": v for v in conceptual_columns.values() if len(v) > 1
+            }  # name and variables of the additional columns
+            self.input_columns = {
+                "x_d": {k: k for k in self.unique_dynamic_input},
+                "x_fc": {k: k for k in self.unique_forecast_input},
+                "x_d_conceptual": {
+                    k: v[0] if len(v) == 1 else f"mean({', '.join(v)})" for k, v in conceptual_columns.items()
+                },
+            }
+            self.column_lag = {
+                group: {k: self.lagged_columns[c][1] for k, c in columns.items() if c in self.lagged_columns}
+                for group, columns in self.input_columns.items()
+            }
+            self.input_columns = {
+                group: {k: self.lagged_columns[c][0] if c in self.lagged_columns else c for k, c in columns.items()}
+                for group, columns in self.input_columns.items()
+            }
+            self.store_columns = list(
+                dict.fromkeys(
+                    [
+                        c
+                        for columns in self.input_columns.values()
+                        for c in columns.values()
+                        if c not in self.derived_columns
+                    ]
+                    + list(self.derived_columns)
+                )
+            )
+
+        # Columns and rows of the time series that are used. They are passed to the readers (see `_load_data`), so
+        # only this information needs to be parsed. The rows are the time period plus the warmup rows before its start
+        # (sequence length and lags). When additional features are used, the lags are calculated after combining
+        # them with the time series, so the whole time series is read.
+        self.read_columns = self._get_read_columns()
+        self.read_period = None
+        if not self.cfg.path_additional_features:
+            self.read_period = (pd.to_datetime(self.time_period[0]), pd.to_datetime(self.time_period[1]))
+        self.read_n_warmup = (
+            self.cfg.seq_length_hindcast + self.cfg.seq_length_forecast - self.cfg.predict_last_n + self.max_lag
+        )
+
         # Concatenate and extract the unique variables per frequency if applicable. This is useful
         # if we have different groups of variables for each frequency
         if self.cfg.custom_seq_processing is not None and isinstance(self.cfg.dynamic_input, dict):
@@ -119,114 +240,105 @@ class BaseDataset(Dataset):
                 k: BaseDataset.unique_values(self.cfg.dynamic_input[k]) for k in self.cfg.custom_seq_processing
             }
 
-        # This loop goes one by one through all the entities. For each entity it creates an entry in the different
-        # dictionaries. We define a progress bar if self.entitites_ids contains more than one entity.
-        iterator = (
-            tqdm(self.entities_ids, desc="Processing entities", unit="entity", ascii=True)
-            if len(self.entities_ids) > 1
-            else self.entities_ids
-        )
-        for id in iterator:
-            # Load time series for specific catchment id
-            df_ts = self._read_data(catch_id=id)
-
-            additional_flag = []
-            if self.cfg.path_additional_features:
-                # Add additional features (optional)
-                df_ts = pd.concat([df_ts, self.additional_features[id]], axis=1)
-                # We can add a flag using additional features, that indicate which samples should be excluded from
-                # training. For this we need a date-indexed pandas DataFrame with a column named "ablation_flag",
-                # containing 0/1 flags (0 for exclusion).
-                if "ablation_flag" in df_ts.columns:
-                    additional_flag.append("ablation_flag")
-
-            # In case we need to add lagged features
-            if isinstance(self.cfg.lagged_features, dict):
-                df_ts = self._add_lagged_features(df=df_ts)
-
-            # Defines the start date considering the offset due to sequence length. We want that, if possible, the start
-            # date is the first date of prediction.
-            freq = pd.infer_freq(df_ts.index)
-            start_date = self._parse_datetime(date_str=self.time_period[0], freq=freq)
-            end_date = self._parse_datetime(date_str=self.time_period[1], freq=freq)
-            warmup_start_date = start_date - (
-                self.cfg.seq_length_hindcast + self.cfg.seq_length_forecast - self.cfg.predict_last_n
-            ) * pd.tseries.frequencies.to_offset(freq)
-
-            # Filter dataframe for the period and variables of interest
-            df_ts = df_ts.loc[
-                warmup_start_date:end_date,
-                list(
-                    dict.fromkeys(self.hindcast_input + self.unique_forecast_input + self.cfg.target + additional_flag)
-                ),
-            ]
-
-            # Reindex the dataframe to assure continuos data between the start and end date of the time period. Missing
-            # data will be filled with NaN, so this will be taken care of later by the valid_samples function.
-            full_range = pd.date_range(start=warmup_start_date, end=end_date, freq=freq)
-            df_ts = df_ts.reindex(full_range)
-
-            # Checks for invalid samples due to NaN or insufficient sequence length
-            flag = self._validate_samples(df_ts=df_ts, df_attributes=self.df_attributes.loc[id], check_NaN=check_NaN)
-            # Index of valid samples
-            valid_samples = np.where(flag)[0]
-
-            # When working seq-seq, if we want non-overlapping blocks, we calculate their respective starting indices.
-            if self.cfg.unique_prediction_blocks:
-                block_id = np.arange(len(df_ts) // self.cfg.predict_last_n) * self.cfg.predict_last_n + (
-                    self.cfg.predict_last_n - 1
-                )
-                valid_samples = block_id[flag[block_id]]
-
-            # Create a list that contain the indexes (basin, time_index) of the valid samples
-            self.valid_entities.extend([(id, int(f)) for f in valid_samples])
+    def _ingest_entities(self, records: Optional[dict[str, dict[str, pd.DataFrame | torch.Tensor]]] = None):
+        """Process all the entities and store the information used by the model.
 
-            # Store the processed information of the basin, in basin-indexed dictionaries.
-            if valid_samples.size > 0:
-                # Store processed dataframes
-                self.df_ts[id] = df_ts
-
-                # Store dynamic input as nested dictionary. First indexed by basin and then by variable name.
-                self.x_d[id] = {
-                    col: torch.tensor(df_ts[col].values, dtype=torch.float32) for col in self.unique_dynamic_input
-                }
-
-                # Store target data as dictionary indexed by basin.
-                self.y_obs[id] = torch.tensor(df_ts[self.cfg.target].values, dtype=torch.float32)
+        Parameters
+        ----------
+        records : Optional[dict[str, dict[str, pd.DataFrame | torch.Tensor]]], default=None
+            Full records of the entities, already read and processed (see `from_periods`). If they are given, the
+            information of each entity is a slice of its record, instead of being read from the files.
 
-                # Store forecast input as nested dictionary. First indexed by basin and then by variable name.
-                if self.cfg.forecast_input:
-                    self.x_fc[id] = {
-                        col: torch.tensor(df_ts[col].values, dtype=torch.float32) for col in self.unique_forecast_input
-                    }
+        """
+        valid_entities_basin, valid_entities_time = [], []
+        basins_without_samples = []
 
-                # Store static input (e.g. catchment attributes) as dictionary indexed by basin.
-                if self.cfg.static_input:
-                    self.x_s[id] = torch.tensor(self.df_attributes.loc[id].values, dtype=torch.float32)
-
-                # Store conceptual input as nested dictionary. First indexed by basin and then by variable name
-                if self.cfg.dynamic_input_conceptual_model:
-                    self.x_d_conceptual[id] = {}
-                    for k, v in self.cfg.dynamic_input_conceptual_model.items():
-                        col = [v] if isinstance(v, str) else v
-                        self.x_d_conceptual[id][k] = torch.tensor(
-                            df_ts[col].mean(axis=1, skipna=True).values,
-                            dtype=torch.float32,
-                        )
+        # This loop goes one by one through all the entities. For each entity it creates an entry in the different
+        # dictionaries. The entities can be processed in parallel (num_ingest_workers > 0); the results are merged in
+        # the order of self.entities_ids, so the outcome is the same as in the serial case. We define a progress bar
+        # if self.entitites_ids contains more than one entity.
+        executor = None
+        if records is not None:
+            processed_entities = (self._slice_record(catch_id=id, record=records[id]) for id in self.entities_ids)
+        elif self.cfg.num_ingest_workers > 0 and len(self.entities_ids) > 1:
+            executor = self._ingest_pool()
+            processed_entities = _map_bounded(
+                executor=executor,
+                function=_ingest_entity,
+                ids=self.entities_ids,
+                max_pending=2 * self.cfg.num_ingest_workers,
+            )
+        else:
+            processed_entities = (
+                self._process_entity(catch_id=id, check_NaN=self.check_NaN) for id in self.entities_ids
+            )
 
-            else:  # Basins without valid samples
-                basins_without_samples.append(id)
+        iterator = (
+            tqdm(
+                processed_entities, total=len(self.entities_ids), desc="Processing entities", unit="entity", ascii=True
+            )
+            if len(self.entities_ids) > 1
+            else processed_entities
+        )
+        # The pool is shut down also when an entity fails, cancelling the pending ones
+        try:
+            for id, entity_data in zip(self.entities_ids, iterator, strict=True):
+                # Store the processed information of the basin, in basin-indexed dictionaries.
+                if entity_data["valid_samples"].size > 0:
+                    # Indexes (basin code, time_index) of the valid samples
+                    n_samples = entity_data["valid_samples"].size
+                    valid_entities_basin.append(np.full(n_samples, len(self.entity_table), dtype=np.int32))
+                    valid_entities_time.append(entity_data["valid_samples"].astype(np.int32))
+                    self.entity_table.append(id)
+
+                    self._store_entity(catch_id=id, entity_data=entity_data)
+
+                else:  # Basins without valid samples
+                    basins_without_samples.append(id)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        if self.entity_table:
+            self.valid_entities_basin = np.concatenate(valid_entities_basin)
+            self.valid_entities_time = np.concatenate(valid_entities_time)
+        self.entity_index = {basin: i for i, basin in enumerate(self.entity_table)}
+
+        # Concatenate the information of all the basins in contiguous tensors
+        if self.cfg.contiguous_storage:
+            self._build_contiguous_storage()
+
+        # Precompute the aggregated dynamic inputs of the low frequencies
+        if self.cfg.custom_seq_processing is not None:
+            self._aggregate_dynamic_input()
 
         # Print information of basins without valid samples
         if len(basins_without_samples) > 0:
-            cfg.logger.info(f"Basins without valid samples in period of interest: {basins_without_samples}")
+            self.cfg.logger.info(f"Basins without valid samples in period of interest: {basins_without_samples}")
 
     def __len__(self):
-        return len(self.valid_entities)
+        return len(self.valid_entities_time)
+
+    def __getstate__(self) -> dict:
+        # The inputs that are views of the shared input store (see `_set_input_views`) are not part of the state, so
+        # they are not copied when the state is serialized. They are defined again from the store in `__setstate__`.
+        state = self.__dict__.copy()
+        if state.get("use_input_store") and not self.cfg.contiguous_storage:
+            for group in ("x_d", "x_fc", "x_d_conceptual"):
+                if group in state:
+                    state[group] = {}
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        if state.get("use_input_store") and not self.cfg.contiguous_storage:
+            for basin in self.x_store:
+                self._set_input_views(catch_id=basin)
 
     def __getitem__(self, id) -> dict[str, torch.Tensor | np.ndarray | dict[str, torch.Tensor]]:
         """Function used to construct the elements of the batches"""
-        basin, i = self.valid_entities[id]
+        basin = self.entity_table[self.valid_entities_basin[id]]
+        i = int(self.valid_entities_time[id])
         sample = {}
         # --------------------------
         # Input in hindcast period
@@ -234,62 +346,68 @@ class BaseDataset(Dataset):
         # If we do not have custom processing (process the whole sequence length the same way)
         if self.cfg.custom_seq_processing is None:
             # Dynamic input
-            sample["x_d"] = {k: v[i - self.cfg.seq_length_hindcast + 1 : i + 1] for k, v in self.x_d[basin].items()}
+            sample["x_d"] = self._get_sequence(
+                group="x_d", basin=basin, start=i - self.cfg.seq_length_hindcast + 1, end=i + 1
+            )
 
         # If we have custom processing along the hindcast sequence length (e.g. multiple temporal frequencies)
         else:
-            current_index = 0  # index to keep track of the current position in the x_d tensor
+            # index to keep track of the current position along the hindcast period
+            current_index = i - self.cfg.seq_length_hindcast + 1
             # Iterate through each part of the custom processing
             for subset_name, subset_info in self.cfg.custom_seq_processing.items():
-                sample["x_d_" + subset_name] = {}
-
-                # Retrieve the variables of interest for the current frequency
-                var_of_interest = (
-                    self.unique_input_per_freq[subset_name]
-                    if isinstance(self.cfg.dynamic_input, dict)
-                    else self.cfg.dynamic_input
-                )
-
-                # Iterate through each variable in the dynamic input
-                for k in var_of_interest:
-                    x_lstm = self.x_d[basin][k][i - self.cfg.seq_length_hindcast + 1 : i + 1]
-                    # Select timesteps of interest
-                    x_lstm = x_lstm[current_index : current_index + subset_info["n_steps"] * subset_info["freq_factor"]]
-                    # Process values using the frequency factor
-                    x_lstm = x_lstm.reshape(subset_info["n_steps"], subset_info["freq_factor"]).mean(dim=1)
-                    # Store processed sequence
-                    sample["x_d_" + subset_name][k] = x_lstm
+                subset_length = subset_info["n_steps"] * subset_info["freq_factor"]
+                # The means over blocks of freq_factor timesteps were precomputed (see `_aggregate_dynamic_input`), so
+                # the processed sequence is a strided slice of the aggregated dynamic input.
+                if subset_info["freq_factor"] > 1:
+                    sample["x_d_" + subset_name] = self._get_sequence(
+                        group="x_d_" + subset_name,
+                        basin=basin,
+                        start=current_index,
+                        end=current_index + subset_length,
+                        step=subset_info["freq_factor"],
+                    )
+                # Without aggregation, we select the variables of interest for the current frequency
+                else:
+                    x_d = self._get_sequence(
+                        group="x_d", basin=basin, start=current_index, end=current_index + subset_length
+                    )
+                    sample["x_d_" + subset_name] = {k: x_d[k] for k in self._variables_of_interest(subset_name)}
 
                 # Update start position for next part of the sequence
-                current_index += subset_info["n_steps"] * subset_info["freq_factor"]
+                current_index += subset_length
         # --------------------------
         # Input in forecast period
         # --------------------------
         if self.cfg.forecast_input:
-            sample["x_d_fc"] = {k: v[i + 1 : i + 1 + self.cfg.seq_length_forecast] for k, v in self.x_fc[basin].items()}
+            sample["x_d_fc"] = self._get_sequence(
+                group="x_fc", basin=basin, start=i + 1, end=i + 1 + self.cfg.seq_length_forecast
+            )
 
             # Forecast metadata
-            sample["date_issue_fc"] = self.df_ts[basin].index[i].to_numpy()
-            sample["persistent_q"] = self.y_obs[basin][i, :]  # last available discharge (for metric calculation)
+            sample["date_issue_fc"] = self._get_dates(basin=basin, start=i, end=i + 1)[0]
+            # last available discharge (for metric calculation)
+            sample["persistent_q"] = self._get_target(basin=basin, start=i, end=i + 1)[0, :]
         # --------------------------
         # Information about the static input
         # --------------------------
         if self.cfg.static_input:
-            sample["x_s"] = self.x_s[basin]
+            sample["x_s"] = self.x_s[self.entity_index[basin]] if self.cfg.contiguous_storage else self.x_s[basin]
         # --------------------------
         # Information about target variable
         # --------------------------
-        sample["y_obs"] = self.y_obs[basin][
-            i + self.cfg.seq_length_forecast + 1 - self.cfg.predict_last_n : i + self.cfg.seq_length_forecast + 1,
-            :,
-        ]
+        sample["y_obs"] = self._get_target(
+            basin=basin,
+            start=i + self.cfg.seq_length_forecast + 1 - self.cfg.predict_last_n,
+            end=i + self.cfg.seq_length_forecast + 1,
+        )
         # --------------------------
         # Information about the conceptual (hybrid model)
         # --------------------------
         if self.cfg.dynamic_input_conceptual_model:
-            sample["x_d_conceptual"] = {
-                k: v[i - self.cfg.seq_length_hindcast + 1 : i + 1] for k, v in self.x_d_conceptual[basin].items()
-            }
+            sample["x_d_conceptual"] = self._get_sequence(
+                group="x_d_conceptual", basin=basin, start=i - self.cfg.seq_length_hindcast + 1, end=i + 1
+            )
 
         # --------------------------
         # Additional data
@@ -300,14 +418,192 @@ class BaseDataset(Dataset):
         # Information about the basin and the dates to which predictions will be made. This facilitates evaluating and
         # ploting the results.
         sample["basin"] = np.array(basin, dtype=np.str_)
-        sample["date"] = (
-            self.df_ts[basin]
-            .index[
-                i + self.cfg.seq_length_forecast + 1 - self.cfg.predict_last_n : i + self.cfg.seq_length_forecast + 1
-            ]
-            .to_numpy()
+        sample["date"] = self._get_dates(
+            basin=basin,
+            start=i + self.cfg.seq_length_forecast + 1 - self.cfg.predict_last_n,
+            end=i + self.cfg.seq_length_forecast + 1,
+        )
+
+        return sample
+
+    def __getitems__(self, ids: list[int]) -> dict[str, torch.Tensor | np.ndarray | dict[str, torch.Tensor]]:
+        """Function used to construct a whole batch at once.
+
+        The DataLoader calls this function, instead of `__getitem__` for each sample, with the indices of the samples
+        of a batch. If the data is stored in contiguous tensors (`contiguous_storage`), each group of variables is
+        retrieved with a single gather operation. Otherwise, the samples are constructed one by one and combined with
+        `collate_fn`. In both cases, the batch has the same structure as the output of `collate_fn`.
+
+        Parameters
+        ----------
+        ids : list[int]
+            Indices of the samples of the batch.
+
+        Returns
+        -------
+        batch : dict[str, torch.Tensor | np.ndarray | dict[str, torch.Tensor]]
+            Dictionary with the batched data
+
+        """
+        if not self.cfg.contiguous_storage or len(ids) == 0:
+            return self.collate_fn([self[id] for id in ids])
+
+        codes = self.valid_entities_basin[ids]
+        basins = [self.entity_table[c] for c in codes]
+        # Rows (in the contiguous tensors) of the last timestep of the hindcast period of each sample, in the targets
+        # and in the inputs (which also contain the rows of the lagged features, see `input_offset`)
+        rows = self.entity_offset[codes] + self.valid_entities_time[ids]
+        input_rows = self.input_offset[codes] + self.valid_entities_time[ids]
+        # Rows of each timestep of the hindcast period and of the prediction period, shape [batch_size, seq_length]
+        hindcast_rows = torch.from_numpy(input_rows[:, None] + np.arange(-self.cfg.seq_length_hindcast + 1, 1))
+        target_rows = rows[:, None] + np.arange(
+            self.cfg.seq_length_forecast + 1 - self.cfg.predict_last_n, self.cfg.seq_length_forecast + 1
         )
 
+        batch = {}
+        # --------------------------
+        # Input in hindcast period
+        # --------------------------
+        # If we do not have custom processing (process the whole sequence length the same way)
+        if self.cfg.custom_seq_processing is None:
+            batch["x_d"] = self._prepare_inputs(group="x_d", x=self._gather_inputs(group="x_d", rows=hindcast_rows))
+
+        # If we have custom processing along the hindcast sequence length (e.g. multiple temporal frequencies)
+        else:
+            current_index = -self.cfg.seq_length_hindcast + 1  # current position along the hindcast period
+            for subset_name, subset_info in self.cfg.custom_seq_processing.items():
+                # Rows of the first timestep of each block of freq_factor timesteps
+                block_rows = torch.from_numpy(
+                    input_rows[:, None] + current_index + np.arange(subset_info["n_steps"]) * subset_info["freq_factor"]
+                )
+                # Aggregated values of each block (precomputed in `_aggregate_dynamic_input`)
+                if subset_info["freq_factor"] > 1:
+                    batch["x_d_" + subset_name] = self._prepare_inputs(
+                        group="x_d_" + subset_name,
+                        x=self._gather_inputs(group="x_d_" + subset_name, rows=block_rows),
+                    )
+                # Without aggregation, we select the variables of interest for the current frequency
+                else:
+                    batch["x_d_" + subset_name] = self._prepare_inputs(
+                        group="x_d",
+                        x=self._gather_inputs(
+                            group="x_d", rows=block_rows, variables=self._variables_of_interest(subset_name)
+                        ),
+                    )
+                current_index += subset_info["n_steps"] * subset_info["freq_factor"]
+        # --------------------------
+        # Input in forecast period
+        # --------------------------
+        if self.cfg.forecast_input:
+            forecast_rows = torch.from_numpy(input_rows[:, None] + np.arange(1, self.cfg.seq_length_forecast + 1))
+            batch["x_d_fc"] = self._prepare_inputs(
+                group="x_fc", x=self._gather_inputs(group="x_fc", rows=forecast_rows)
+            )
+
+            # Forecast metadata
+            batch["date_issue_fc"] = self.dates[rows]
+            batch["persistent_q"] = self.y_obs[torch.from_numpy(rows)].float()
+        # --------------------------
+        # Information about the static input
+        # --------------------------
+        if self.cfg.static_input:
+            batch["x_s"] = self.x_s[torch.from_numpy(codes)]
+        # --------------------------
+        # Information about target variable
+        # --------------------------
+        batch["y_obs"] = self.y_obs[torch.from_numpy(target_rows)].float()
+        # --------------------------
+        # Information about the conceptual (hybrid model)
+        # --------------------------
+        if self.cfg.dynamic_input_conceptual_model:
+            batch["x_d_conceptual"] = self._prepare_inputs(
+                group="x_d_conceptual", x=self._gather_inputs(group="x_d_conceptual", rows=hindcast_rows)
+            )
+        # --------------------------
+        # Additional data
+        # --------------------------
+        if self.basin_std:
+            batch["std_basin"] = (
+                torch.stack([self.basin_std[basin] for basin in basins])
+                .unsqueeze(1)
+                .repeat(1, self.cfg.predict_last_n)
+                .unsqueeze(2)
+            )
+        batch["basin"] = np.array(basins, dtype=np.str_)
+        batch["date"] = self.dates[target_rows]
+
+        return batch
+
+    def full_sequence(self, basin: str) -> dict[str, torch.Tensor | np.ndarray | dict[str, torch.Tensor]]:
+        """Construct a single sample with the whole time series of a basin, for stateful evaluation.
+
+        The sample covers from the start of the hindcast period of the first valid sample of the basin to the last
+        valid sample, so that a model processing it as one sequence (e.g. `CudaLSTM.forward_stateful`) predicts every
+        time step of the period. The elements have a batch dimension of one, as the batches of the dataloader.
+
+        With forecast inputs, each valid sample is an issue time (e.g. `ForecastLSTM.forward_stateful`). The hindcast
+        inputs are still a single sequence, but the forecast inputs, targets and dates have one row per issue time, as
+        in a batch with all the valid samples of the basin.
+
+        Multi-frequency inputs (`custom_seq_processing`) are not supported, since the hindcast of each sample is
+        aggregated relative to its own issue time and there is no single sequence shared by consecutive samples.
+
+        Parameters
+        ----------
+        basin : str
+            identifier of the basin.
+
+        Returns
+        -------
+        dict[str, torch.Tensor | np.ndarray | dict[str, torch.Tensor]]
+            Sample with the dynamic inputs ('x_d'), the static inputs ('x_s'), the targets ('y_obs'), the basin and the
+            dates of each time step. With forecast inputs, it also contains the forecast inputs ('x_d_fc'), the position
+            of each issue time in the hindcast sequence ('issue_index'), and the forecast metadata ('date_issue_fc' and
+            'persistent_q'), and the targets and dates are the ones of each issue time [n_issue_times, predict_last_n].
+
+        """
+        if self.cfg.custom_seq_processing is not None:
+            raise ValueError("Full-sequence samples do not support custom_seq_processing")
+
+        if basin not in self.entity_index:
+            raise ValueError(f"Basin {basin} has no valid samples in the dataset")
+        # The samples of the index are grouped by basin, in the order of self.entity_table
+        code = self.entity_index[basin]
+        first_sample, end_sample = np.searchsorted(self.valid_entities_basin, [code, code + 1])
+        times = np.sort(self.valid_entities_time[first_sample:end_sample])
+        start, end = int(times[0]) - self.cfg.seq_length_hindcast + 1, int(times[-1]) + 1
+
+        sample = {"x_d": {k: v.unsqueeze(0) for k, v in self._get_sequence("x_d", basin, start, end).items()}}
+        if self.cfg.static_input:
+            x_s = self.x_s[self.entity_index[basin]] if self.cfg.contiguous_storage else self.x_s[basin]
+            sample["x_s"] = x_s.unsqueeze(0)
+        sample["basin"] = np.array([basin], dtype=np.str_)
+
+        if not self.cfg.forecast_input:
+            sample["y_obs"] = self._get_target(basin=basin, start=start, end=end).unsqueeze(0)
+            sample["date"] = self._get_dates(basin=basin, start=start, end=end)[np.newaxis]
+            return sample
+
+        # Rows of each issue time, relative to the first one, and offsets of the forecast period and the predictions
+        first, last = int(times[0]), int(times[-1])
+        rows = torch.from_numpy(times - first).long()
+        fc_offsets = torch.arange(self.cfg.seq_length_forecast)
+        target_offsets = torch.arange(self.cfg.predict_last_n)
+        target_start = first + self.cfg.seq_length_forecast + 1 - self.cfg.predict_last_n
+        target_end = last + self.cfg.seq_length_forecast + 1
+
+        x_fc = self._get_sequence("x_fc", basin, first + 1, last + 1 + self.cfg.seq_length_forecast)
+        sample["x_d_fc"] = {k: v[rows.unsqueeze(1) + fc_offsets] for k, v in x_fc.items()}
+        sample["issue_index"] = rows + (first - start)
+        sample["date_issue_fc"] = self._get_dates(basin=basin, start=first, end=last + 1)[rows.numpy()]
+        sample["persistent_q"] = self._get_target(basin=basin, start=first, end=last + 1)[rows]
+        sample["y_obs"] = self._get_target(basin=basin, start=target_start, end=target_end)[
+            rows.unsqueeze(1) + target_offsets
+        ]
+        sample["date"] = self._get_dates(basin=basin, start=target_start, end=target_end)[
+            (rows.unsqueeze(1) + target_offsets).numpy()
+        ]
+
         return sample
 
     def calculate_basin_std(self):
@@ -322,8 +618,9 @@ class BaseDataset(Dataset):
             Hydrology and Earth System Sciences*, 2019, 23, 5089-5110, doi:10.5194/hess-23-5089-2019
 
         """
-        for k, v in self.y_obs.items():
-            self.basin_std[k] = torch.tensor(np.nanstd(v.numpy()), dtype=torch.float32)
+        for basin, (_, _, length) in self.entity_dates.items():
+            y = self._get_target(basin=basin, start=0, end=length)
+            self.basin_std[basin] = torch.tensor(np.nanstd(y.numpy()), dtype=torch.float32)
 
     def calculate_global_statistics(self, save_scaler: bool = False):
         """Calculate statistics of data.
@@ -339,36 +636,23 @@ class BaseDataset(Dataset):
             file
 
         """
-        # Dynamic variables in hindcast period
-        x_d_mean = {}
-        x_d_std = {}
-        for k in self.unique_dynamic_input:
-            global_x = np.hstack([df[k].values for df in self.df_ts.values()])
-            x_d_mean[k] = torch.tensor(np.nanmean(global_x, axis=0), dtype=torch.float32)
-            x_d_std[k] = torch.tensor(np.nanstd(global_x, axis=0), dtype=torch.float32)
-            del global_x
+        statistics = self._running_statistics()
+        x_d_stats, y_stats, x_fc_stats = statistics["x_d"], statistics["y"], statistics["x_fc"]
 
-        self.scaler["x_d_mean"] = x_d_mean
-        self.scaler["x_d_std"] = self._check_std(x_d_std)
+        # Dynamic variables in hindcast period
+        self.scaler["x_d_mean"] = BaseDataset._as_tensor_dict(x_d_stats.mean, self.unique_dynamic_input)
+        self.scaler["x_d_std"] = self._check_std(BaseDataset._as_tensor_dict(x_d_stats.std, self.unique_dynamic_input))
 
         # Target variables
-        global_y = np.vstack([df[self.cfg.target].values for df in self.df_ts.values()])
-        self.scaler["y_mean"] = torch.tensor(np.nanmean(global_y, axis=0), dtype=torch.float32)
-        self.scaler["y_std"] = torch.tensor(np.nanstd(global_y, axis=0), dtype=torch.float32)
-        del global_y
+        self.scaler["y_mean"] = torch.tensor(y_stats.mean, dtype=torch.float32)
+        self.scaler["y_std"] = torch.tensor(y_stats.std, dtype=torch.float32)
 
         # Dynamic variables in forecast period
         if self.cfg.forecast_input:
-            x_fc_mean = {}
-            x_fc_std = {}
-            for k in self.unique_forecast_input:
-                global_x = np.hstack([df[k].values for df in self.df_ts.values()])
-                x_fc_mean[k] = torch.tensor(np.nanmean(global_x, axis=0), dtype=torch.float32)
-                x_fc_std[k] = torch.tensor(np.nanstd(global_x, axis=0), dtype=torch.float32)
-                del global_x
-
-            self.scaler["x_fc_mean"] = x_fc_mean
-            self.scaler["x_fc_std"] = self._check_std(x_fc_std)
+            self.scaler["x_fc_mean"] = BaseDataset._as_tensor_dict(x_fc_stats.mean, self.unique_forecast_input)
+            self.scaler["x_fc_std"] = self._check_std(
+                BaseDataset._as_tensor_dict(x_fc_stats.std, self.unique_forecast_input)
+            )
 
         # Static attributes
         if self.cfg.static_input:
@@ -386,8 +670,14 @@ class BaseDataset(Dataset):
             self.scaler["x_s_std"] = torch.tensor(list(self._check_std(x_s_std).values()), dtype=torch.float32)
 
         if save_scaler:  # save the results in a pickle file
-            with open(self.cfg.path_save_folder / "scaler.pickle", "wb") as f:
-                pickle.dump(self.scaler, f)
+            self.save_scaler()
+
+    def save_scaler(self):
+        """Save the scaler in a pickle file (scaler.pickle) in the folder defined by `path_save_folder` in the config
+        file.
+        """
+        with open(self.cfg.path_save_folder / "scaler.pickle", "wb") as f:
+            pickle.dump(self.scaler, f)
 
     def standardize_data(self, standardize_output: bool = True):
         """Standardize data, basin by basin.
@@ -398,23 +688,117 @@ class BaseDataset(Dataset):
             Boolean to define if the output should be standardize or not.
 
         """
-        for basin in self.x_d.keys():
-            # Dynamic input
-            for k, v in self.x_d[basin].items():
-                self.x_d[basin][k] = (v - self.scaler["x_d_mean"][k]) / self.scaler["x_d_std"][k]
+        # The inputs of the shared store are not modified: they are standardized, with the scaler of each variable,
+        # when the samples are read (see `_prepare_inputs`)
+        self._standardize_input = self.use_input_store
 
-            # Forecast input
-            if self.cfg.forecast_input:
-                for k, v in self.x_fc[basin].items():
-                    self.x_fc[basin][k] = (v - self.scaler["x_fc_mean"][k]) / self.scaler["x_fc_std"][k]
+        if self.cfg.contiguous_storage:
+            self._standardize_contiguous_storage(standardize_output=standardize_output)
+        else:
+            for basin in self.y_obs.keys():
+                # Dynamic input
+                if not self._standardize_input:
+                    for k, v in self.x_d[basin].items():
+                        self.x_d[basin][k] = (v - self.scaler["x_d_mean"][k]) / self.scaler["x_d_std"][k]
+
+                # Forecast input
+                if self.cfg.forecast_input and not self._standardize_input:
+                    for k, v in self.x_fc[basin].items():
+                        self.x_fc[basin][k] = (v - self.scaler["x_fc_mean"][k]) / self.scaler["x_fc_std"][k]
+
+                # Static input
+                if self.cfg.static_input:
+                    self.x_s[basin] = (self.x_s[basin] - self.scaler["x_s_mean"]) / self.scaler["x_s_std"]
 
-            # Static input
-            if self.cfg.static_input:
-                self.x_s[basin] = (self.x_s[basin] - self.scaler["x_s_mean"]) / self.scaler["x_s_std"]
+                # Output
+                if standardize_output:
+                    self.y_obs[basin] = (self.y_obs[basin] - self.scaler["y_mean"]) / self.scaler["y_std"]
+
+        # The aggregated dynamic input has to be computed again from the standardized data
+        if self.cfg.custom_seq_processing is not None:
+            self._aggregate_dynamic_input()
+
+        # The time series are stored with reduced precision, and converted back to float32 when the samples are read
+        if self.cfg.storage_dtype != "float32":
+            self._cast_storage()
+
+    @classmethod
+    def from_periods(
+        cls,
+        cfg: Config,
+        time_periods: list[str] | dict[str, list[str]] = ("training", "validation", "testing"),
+        check_NaN: bool | dict[str, bool] = True,
+        entities_ids: Optional[str | list[str]] = None,
+    ) -> dict[str, "BaseDataset"]:
+        """Create the datasets of multiple periods, reading the time series of each entity only once.
+
+        The full record of each entity (from the start of the warmup of the first period to the end of the last period)
+        is read and processed once. The dataset of each period is a view of the records: it has its own valid samples
+        and offsets, but its time series are slices of the records, so the data is not copied (unless
+        `contiguous_storage` is used, in which case the slices are concatenated). The datasets are the same as the
+        ones created independently for each period.
+
+        The periods can also be defined by their dates, e.g. to create the folds of a temporal cross-validation (see
+        `temporal_folds`), without reading the data again for each fold.
+
+        Parameters
+        ----------
+        cfg : Config
+            Configuration file.
+        time_periods : list[str] | dict[str, list[str]], default=('training', 'validation', 'testing')
+            Name of the periods (defined in the configuration file), or dictionary with the name of each period and its
+            start and end date.
+        check_NaN : bool | dict[str, bool], default=True
+            Whether to check for NaN values while processing the data. It can be defined for each period.
+        entities_ids : Optional[str | list[str]], default=None
+            ID of the entities, for all the periods. By default, the entities of each period defined in the
+            configuration file (`path_entities` for periods that are not defined in the configuration file).
+
+        Returns
+        -------
+        dict[str, BaseDataset]
+            Dataset of each period
+
+        Examples
+        --------
+        >>> folds = BaseDataset.temporal_folds(time_period=config.training_period, n_folds=5)
+        >>> datasets = Dataset.from_periods(cfg=config, time_periods={"training": config.training_period, **folds})
+
+        """
+        if not isinstance(time_periods, dict):
+            time_periods = {name: getattr(cfg, f"{name}_period") for name in time_periods}
+        if not isinstance(check_NaN, dict):
+            check_NaN = dict.fromkeys(time_periods, check_NaN)
+
+        period_entities = {
+            name: BaseDataset._get_entities_ids(cfg=cfg, time_period=name, entities_ids=entities_ids)
+            for name in time_periods
+        }
+
+        # Read the full record of all the entities, covering all the periods
+        reader = cls.__new__(cls)
+        reader._initialize(
+            cfg=cfg,
+            time_period=[
+                min((p[0] for p in time_periods.values()), key=pd.to_datetime),
+                max((p[1] for p in time_periods.values()), key=pd.to_datetime),
+            ],
+            check_NaN=False,
+            entities_ids=list(dict.fromkeys(id for ids in period_entities.values() for id in ids)),
+        )
+        records = reader._read_records()
+
+        # Views of the records for each period
+        datasets = {}
+        for name, period in time_periods.items():
+            dataset = cls.__new__(cls)
+            dataset._initialize(
+                cfg=cfg, time_period=list(period), check_NaN=check_NaN[name], entities_ids=period_entities[name]
+            )
+            dataset._ingest_entities(records=records)
+            datasets[name] = dataset
 
-            # Output
-            if standardize_output:
-                self.y_obs[basin] = (self.y_obs[basin] - self.scaler["y_mean"]) / self.scaler["y_std"]
+        return datasets
 
     def _add_lagged_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Add lagged input features to dataframe.
@@ -441,6 +825,213 @@ class BaseDataset(Dataset):
 
         return df
 
+    def _materialize_lagged_features(self, df_ts: pd.DataFrame) -> pd.DataFrame:
+        """Add the virtual lagged features as columns of a processed dataframe.
+
+        The lagged features are calculated with `_add_lagged_features`, and the `lag_rows` timesteps before the warmup
+        period are removed, so the result is the dataframe that would be processed without virtual lagged features.
+
+        Parameters
+        ----------
+        df_ts : pd.DataFrame
+            Processed dataframe, as returned by `_prepare_entity`.
+
+        Returns
+        -------
+        pd.DataFrame
+            Dataframe with the lagged features, from the start of the warmup period
+
+        """
+        if not self.lagged_columns:
+            return df_ts
+
+        return self._add_lagged_features(df=df_ts.copy(deep=False)).iloc[self.lag_rows :]
+
+    def _aggregate_dynamic_input(self):
+        """Precompute the aggregated dynamic input of the frequencies defined in `custom_seq_processing`.
+
+        For each frequency with a freq_factor larger than one, the mean of the blocks of freq_factor consecutive
+        timesteps is calculated once, for every possible start of the block (see `_block_mean`). The processed
+        sequence of a sample is then a strided slice of the aggregated dynamic input, instead of the mean of the whole
+        sequence. The results are stored in `self.x_d_aggregated`, indexed by the key of the frequency in the samples
+        (e.g. "x_d_1D"), with the same structure as `self.x_d`.
+
+        """
+        self.x_d_aggregated = {}
+        for subset_name, subset_info in self.cfg.custom_seq_processing.items():
+            if subset_info["freq_factor"] == 1:
+                continue
+
+            group = "x_d_" + subset_name
+            var_of_interest = self._variables_of_interest(subset_name)
+            if self.cfg.contiguous_storage:
+                # The rows of each basin in the contiguous tensors are [input_offset - lag_rows, next input_offset -
+                # lag_rows). The lagged features are shifted by their lag inside the rows of their basin, and the blocks
+                # that do not fit in the rows of their basin are NaN, so no value is taken from another basin.
+                self.column_index[group] = {k: i for i, k in enumerate(var_of_interest)}
+                lags = self.column_lag.get("x_d", {})
+                rows = torch.arange(len(self.x_d))
+                basin_rows = np.diff(self.input_offset)
+                basin_start = torch.from_numpy(np.repeat(self.input_offset[:-1] - self.lag_rows, basin_rows))
+                basin_end = torch.from_numpy(np.repeat(self.input_offset[1:] - self.lag_rows, basin_rows))
+                x_d = self._prepare_inputs(
+                    group="x_d",
+                    x={
+                        k: self.x_d[(rows - lags[k]).clamp(min=0), self.column_index["x_d"][k]]
+                        if k in lags
+                        else self.x_d[:, self.column_index["x_d"][k]].contiguous()
+                        for k in var_of_interest
+                    },
+                )
+                for k in var_of_interest:
+                    if k in lags:
+                        x_d[k][rows - lags[k] < basin_start] = torch.nan
+                x_aggregated = torch.stack(
+                    [BaseDataset._block_mean(x_d[k], subset_info["freq_factor"]) for k in var_of_interest], dim=1
+                )
+                x_aggregated[rows + subset_info["freq_factor"] > basin_end] = torch.nan
+                self.x_d_aggregated[group] = x_aggregated
+            else:
+                self.x_d_aggregated[group] = {
+                    basin: {
+                        k: BaseDataset._block_mean(v, subset_info["freq_factor"])
+                        for k, v in self._prepare_inputs(group="x_d", x={k: x_d[k] for k in var_of_interest}).items()
+                    }
+                    for basin, x_d in self.x_d.items()
+                }
+
+    def _build_contiguous_storage(self):
+        """Concatenate the information of all the basins in contiguous tensors.
+
+        The dynamic inputs, forecast inputs, targets and conceptual inputs are stored as [total_timesteps, n_features]
+        tensors, in which the timesteps of each basin are consecutive. The first row of a basin is given by
+        `self.entity_offset[self.entity_index[basin]]`. The static inputs are stored as a [n_basins, n_features]
+        tensor, in which the row of a basin is given by `self.entity_index[basin]`.
+
+        The input tensors also contain the `lag_rows` timesteps before the warmup period of each basin (see
+        `lagged_columns`), so their row of the start of the warmup period is given by `self.input_offset` instead.
+
+        """
+        self.entity_offset = np.cumsum([0] + [length for _, _, length in self.entity_dates.values()])
+        self.input_offset = self.entity_offset + self.lag_rows * np.arange(1, len(self.entity_offset) + 1)
+
+        # Dates of all the basins, concatenated in the same way as the tensors
+        self.dates = (
+            np.concatenate(
+                [self._get_dates(basin=basin, start=0, end=n) for basin, (_, _, n) in self.entity_dates.items()]
+            )
+            if self.entity_dates
+            else np.array([], dtype="datetime64[ns]")
+        )
+
+        # Position of each variable in the columns of the contiguous tensors
+        self.column_index = {
+            "x_d": {k: i for i, k in enumerate(self.unique_dynamic_input)},
+            "x_fc": {k: i for i, k in enumerate(self.unique_forecast_input)},
+            "x_d_conceptual": {k: i for i, k in enumerate(self.cfg.dynamic_input_conceptual_model or {})},
+        }
+
+        self.y_obs = BaseDataset._concatenate(self.y_obs, n_columns=len(self.cfg.target))
+        if self.use_input_store:
+            # The dynamic, forecast and conceptual inputs are the same tensor (the shared store), and their variables
+            # are indexed by the position of the columns in the store
+            self.x_store = BaseDataset._concatenate(self.x_store, n_columns=len(self.store_columns))
+            store_index = {c: i for i, c in enumerate(self.store_columns)}
+            for group, columns in self.input_columns.items():
+                self.column_index[group] = {k: store_index[c] for k, c in columns.items()}
+            self.x_d = self.x_store
+            if self.cfg.forecast_input:
+                self.x_fc = self.x_store
+            if self.cfg.dynamic_input_conceptual_model:
+                self.x_d_conceptual = self.x_store
+        else:
+            self.x_d = BaseDataset._concatenate(self.x_d, n_columns=len(self.unique_dynamic_input))
+            if self.cfg.forecast_input:
+                self.x_fc = BaseDataset._concatenate(self.x_fc, n_columns=len(self.unique_forecast_input))
+            if self.cfg.dynamic_input_conceptual_model:
+                self.x_d_conceptual = BaseDataset._concatenate(
+                    self.x_d_conceptual, n_columns=len(self.cfg.dynamic_input_conceptual_model)
+                )
+        if self.cfg.static_input:
+            self.x_s = (
+                torch.stack(list(self.x_s.values()))
+                if self.x_s
+                else torch.zeros((0, len(self.cfg.static_input)), dtype=torch.float32)
+            )
+
+    def _cast_storage(self):
+        """Store the time series of the dynamic, forecast and conceptual inputs and of the targets as `storage_dtype`.
+
+        The values are converted back to float32 when the samples are read (see `_prepare_inputs` and `_get_target`).
+        NaN values are preserved. The maximum absolute difference between the stored values and the original float32
+        values of each variable is saved in `self.quantization_error`, indexed by group and variable name, and logged.
+        The errors refer to the standardized values, except for the conceptual inputs and the inputs of the shared store
+        (which are standardized when the samples are read), whose values are not standardized. An infinite error means
+        that some values are out of the range of `storage_dtype`.
+
+        """
+        dtypes = {"float16": torch.float16, "bfloat16": torch.bfloat16}
+        if self.cfg.storage_dtype not in dtypes:
+            raise ValueError(
+                f"`storage_dtype` must be 'float32', 'float16' or 'bfloat16', but got '{self.cfg.storage_dtype}'."
+            )
+        dtype = dtypes[self.cfg.storage_dtype]
+
+        # Converted tensors and errors of their columns, by id of the original tensor. The tensors that are shared by
+        # several groups (shared input store) are converted once, and remain shared.
+        memo = {}
+
+        groups = {"x_d": self.x_d, "y_obs": self.y_obs}
+        if self.cfg.forecast_input:
+            groups["x_fc"] = self.x_fc
+        if self.cfg.dynamic_input_conceptual_model:
+            groups["x_d_conceptual"] = self.x_d_conceptual
+        groups.update(self.x_d_aggregated)
+
+        self.quantization_error = {}
+        if self.cfg.contiguous_storage:
+            column_index = {**self.column_index, "y_obs": {k: i for i, k in enumerate(self.cfg.target)}}
+            if self.use_input_store:
+                self.x_store = BaseDataset._quantize(self.x_store, dtype, memo)[0]
+            for group, x in groups.items():
+                groups[group], error = BaseDataset._quantize(x, dtype, memo)
+                self.quantization_error[group] = {k: error[i].item() for k, i in column_index[group].items()}
+
+            self.x_d, self.y_obs = groups["x_d"], groups["y_obs"]
+            if self.cfg.forecast_input:
+                self.x_fc = groups["x_fc"]
+            if self.cfg.dynamic_input_conceptual_model:
+                self.x_d_conceptual = groups["x_d_conceptual"]
+            self.x_d_aggregated = {group: groups[group] for group in self.x_d_aggregated}
+        else:
+            # The tensors are replaced in the basin-indexed dictionaries. The inputs that are views of the shared store
+            # are defined again from the converted store, and their errors are the errors of their columns.
+            store_error = {}
+            if self.use_input_store:
+                for basin, x in self.x_store.items():
+                    for c, v in x.items():
+                        x[c], e = BaseDataset._quantize(v, dtype, memo)
+                        store_error[basin, c] = e.item()
+                    self._set_input_views(catch_id=basin)
+            for group, data in groups.items():
+                error = {}
+                for basin, x in data.items():
+                    if group == "y_obs":
+                        data[basin], e = BaseDataset._quantize(x, dtype, memo)
+                        basin_error = dict(zip(self.cfg.target, e.tolist(), strict=True))
+                    elif store_error and group in self.input_columns:
+                        basin_error = {k: store_error[basin, c] for k, c in self.input_columns[group].items()}
+                    else:
+                        basin_error = {}
+                        for k, v in x.items():
+                            x[k], e = BaseDataset._quantize(v, dtype, memo)
+                            basin_error[k] = e.item()
+                    error = {k: max(error.get(k, 0.0), e) for k, e in basin_error.items()}
+                self.quantization_error[group] = error
+
+        for group, error in self.quantization_error.items():
+            self.cfg.logger.info(f"Maximum quantization error ({self.cfg.storage_dtype}) of {group}: {error}")
+
     def _check_std(self, std: dict[str, torch.Tensor]) -> dict[str, torch.Tensor]:
         """Check if the standard deviation is (almost) zero and adjust.
 
@@ -469,6 +1060,84 @@ class BaseDataset(Dataset):
                 )
         return std
 
+    def _load_attributes(self) -> pd.DataFrame:
+        """Read the attributes of the entities of interest.
+
+        The attributes of all the entities (already encoded and filtered by `static_input`) are kept in a cache shared
+        by all the instances of the process, indexed by dataset, `path_data` and `static_input`. If the dataset
+        specifies its attribute files, their size and modification time are also part of the key, so changes in the
+        files are detected. Additionally, the on-disk cache is used if `path_cache` is defined.
+
+        Returns
+        -------
+        df : pd.DataFrame
+            Dataframe with the attributes of the entities of interest
+
+        """
+        try:
+            files = self._get_attributes_files()
+            files_key = DataCache.make_key(kind="attributes", files=files, reader=type(self).__name__)
+        except NotImplementedError:  # the dataset does not specify its source files
+            files_key = None
+
+        key = (type(self).__name__, str(self.cfg.path_data), tuple(self.cfg.static_input), files_key)
+        if key not in BaseDataset._attributes_cache:
+            df = None
+            if self.cache is not None and files_key is not None:
+                df = self.cache.load(files_key)
+                if df is None:
+                    df = self.cache.save(files_key, self._read_attributes(), dtype=np.float64)
+
+            if df is None:
+                df = self._read_attributes()
+
+            BaseDataset._attributes_cache[key] = df.loc[:, self.cfg.static_input]
+
+        # Filter basins of interest
+        return BaseDataset._attributes_cache[key].loc[self.entities_ids]
+
+    @staticmethod
+    def clear_attributes_cache():
+        """Remove the attributes kept in memory by `_load_attributes`, so they are read again from the files."""
+        BaseDataset._attributes_cache.clear()
+
+    def _load_data(self, catch_id: str) -> pd.DataFrame:
+        """Read the time series of a specific entity, using the on-disk cache if `path_cache` is defined.
+
+        When the cache is used, the time series are returned as float32 values.
+
+        Parameters
+        ----------
+        catch_id : str
+            identifier of the basin.
+
+        Returns
+        -------
+        df : pd.DataFrame
+            Dataframe with the catchments` timeseries
+
+        """
+        # Without cache, only the columns and period of interest are read
+        if self.cache is None:
+            return self._read_data(
+                catch_id=catch_id, columns=self.read_columns, period=self.read_period, n_warmup=self.read_n_warmup
+            )
+
+        # The cached time series are complete, so they can be reused by all the periods and configurations
+        try:
+            files = self._get_data_files(catch_id=catch_id)
+        except NotImplementedError:  # the dataset does not specify its source files, so it can not be cached
+            return self._read_data(
+                catch_id=catch_id, columns=self.read_columns, period=self.read_period, n_warmup=self.read_n_warmup
+            )
+
+        key = DataCache.make_key(kind="data", files=files, reader=type(self).__name__, entity=catch_id)
+        df = self.cache.load(key)
+        if df is None:
+            df = self.cache.save(key, self._read_data(catch_id=catch_id), dtype=np.float32)
+
+        return df
+
     def _load_additional_features(self) -> dict[str, pd.DataFrame]:
         """Read pickle dictionary containing additional features.
 
@@ -504,16 +1173,787 @@ class BaseDataset(Dataset):
         elif freq == "h":
             return pd.to_datetime(date_str, format="%Y-%m-%d %H:%M:%S")
 
-    def _read_attributes(self) -> pd.DataFrame:
-        # This function is specific for each dataset
-        raise NotImplementedError
-
-    def _read_data(self) -> pd.DataFrame:
-        # This function is specific for each dataset
-        raise NotImplementedError
+    def _process_entity(self, catch_id: str, check_NaN: bool) -> dict[str, np.ndarray | pd.DataFrame | torch.Tensor]:
+        """Read and process the time series of a specific entity.
 
-    def _validate_samples(self, df_ts: pd.DataFrame, df_attributes: pd.DataFrame, check_NaN: bool) -> np.ndarray:
-        """Checks for invalid samples due to NaN or insufficient sequence length.
+        Parameters
+        ----------
+        catch_id : str
+            identifier of the basin.
+        check_NaN : bool
+            Boolean to specify if Nan should be checked or not
+
+        Returns
+        -------
+        entity_data : dict[str, np.ndarray | pd.DataFrame | torch.Tensor]
+            Dictionary with the index of the valid samples ("valid_samples") and, if there is at least one valid sample,
+            the processed dataframe ("df_ts") and the model inputs and targets of the entity ("x_d", "y_obs", "x_fc",
+            "x_s", "x_d_conceptual")
+
+        """
+        df_ts = self._prepare_entity(catch_id=catch_id)
+        valid_samples = self._select_samples(catch_id=catch_id, df_ts=df_ts, check_NaN=check_NaN)
+
+        entity_data = {"valid_samples": valid_samples}
+        if valid_samples.size == 0:  # Basins without valid samples
+            return entity_data
+
+        # Processed dataframe
+        entity_data["df_ts"] = df_ts
+        entity_data.update(self._tensorize_entity(catch_id=catch_id, df_ts=df_ts))
+
+        return entity_data
+
+    def _prepare_entity(self, catch_id: str) -> pd.DataFrame:
+        """Read the time series of a specific entity and select the variables and the time period of interest.
+
+        Parameters
+        ----------
+        catch_id : str
+            identifier of the basin.
+
+        Returns
+        -------
+        df_ts : pd.DataFrame
+            Dataframe with the variables of interest, with continuous dates from the start of the warmup period to the
+            end of the period of interest. If the lagged features are virtual (see `lagged_columns`), the dataframe
+            starts `lag_rows` timesteps before the warmup period and contains the columns of their features instead.
+
+        """
+        # Load time series for specific catchment id
+        df_ts = self._load_data(catch_id=catch_id)
+
+        additional_flag = []
+        if self.cfg.path_additional_features:
+            # Add additional features (optional)
+            df_ts = pd.concat([df_ts, self.additional_features[catch_id]], axis=1)
+            # We can add a flag using additional features, that indicate which samples should be excluded from
+            # training. For this we need a date-indexed pandas DataFrame with a column named "ablation_flag",
+            # containing 0/1 flags (0 for exclusion).
+            if "ablation_flag" in df_ts.columns:
+                additional_flag.append("ablation_flag")
+
+        # In case we need to add lagged features
+        columns = self.hindcast_input + self.unique_forecast_input + self.cfg.target + additional_flag
+        if self.lagged_columns:
+            columns = [self.lagged_columns[c][0] if c in self.lagged_columns else c for c in columns]
+        elif isinstance(self.cfg.lagged_features, dict):
+            df_ts = self._add_lagged_features(df=df_ts)
+
+        # Defines the start date considering the offset due to sequence length. We want that, if possible, the start
+        # date is the first date of prediction.
+        freq = pd.infer_freq(df_ts.index)
+        start_date = self._parse_datetime(date_str=self.time_period[0], freq=freq)
+        end_date = self._parse_datetime(date_str=self.time_period[1], freq=freq)
+        warmup_start_date = start_date - (
+            self.cfg.seq_length_hindcast + self.cfg.seq_length_forecast - self.cfg.predict_last_n + self.lag_rows
+        ) * pd.tseries.frequencies.to_offset(freq)
+
+        # Filter dataframe for the period and variables of interest
+        df_ts = df_ts.loc[warmup_start_date:end_date, list(dict.fromkeys(columns))]
+
+        # Reindex the dataframe to assure continuos data between the start and end date of the time period. Missing
+        # data will be filled with NaN, so this will be taken care of later by the valid_samples function.
+        full_range = pd.date_range(start=warmup_start_date, end=end_date, freq=freq)
+        df_ts = df_ts.reindex(full_range)
+
+        return df_ts
+
+    def _select_samples(self, catch_id: str, df_ts: pd.DataFrame, check_NaN: bool) -> np.ndarray:
+        """Index of the valid samples of a specific entity.
+
+        Parameters
+        ----------
+        catch_id : str
+            identifier of the basin.
+        df_ts : pd.DataFrame
+            Processed dataframe of the entity, as returned by `_prepare_entity`.
+        check_NaN : bool
+            Boolean to specify if Nan should be checked or not
+
+        Returns
+        -------
+        np.ndarray
+            Time index (relative to the start of df_ts) of the last timestep of the hindcast period of each valid sample
+
+        """
+        # The samples are validated with the lagged features as columns, in the same way as if they were stored
+        df_ts = self._materialize_lagged_features(df_ts=df_ts)
+
+        # Checks for invalid samples due to NaN or insufficient sequence length
+        flag = self._validate_samples(df_ts=df_ts, df_attributes=self.df_attributes.loc[catch_id], check_NaN=check_NaN)
+        # Index of valid samples
+        valid_samples = np.where(flag)[0]
+
+        # When working seq-seq, if we want non-overlapping blocks, we calculate their respective starting indices.
+        if self.cfg.unique_prediction_blocks:
+            block_id = np.arange(len(df_ts) // self.cfg.predict_last_n) * self.cfg.predict_last_n + (
+                self.cfg.predict_last_n - 1
+            )
+            valid_samples = block_id[flag[block_id]]
+
+        return valid_samples
+
+    def _tensorize_entity(self, catch_id: str, df_ts: pd.DataFrame) -> dict[str, torch.Tensor]:
+        """Convert the model inputs and targets of a specific entity into tensors.
+
+        Parameters
+        ----------
+        catch_id : str
+            identifier of the basin.
+        df_ts : pd.DataFrame
+            Processed dataframe of the entity, as returned by `_prepare_entity`.
+
+        Returns
+        -------
+        dict[str, torch.Tensor]
+            Dictionary with the model inputs and targets of the entity ("x_d", "y_obs", "x_fc", "x_s", "x_d_conceptual")
+
+        """
+        entity_data = {}
+        # Shared store of the inputs as [time, variables] tensor, including the `lag_rows` timesteps before the warmup
+        # period. The targets start at the warmup period.
+        if self.use_input_store:
+            physical_columns = self.store_columns[: len(self.store_columns) - len(self.derived_columns)]
+            # The additional columns can be the mean of lagged features
+            df_derived = df_ts
+            if self.lagged_columns and self.derived_columns:
+                df_derived = self._add_lagged_features(df=df_ts.copy(deep=False))
+            entity_data["x_store"] = torch.cat(
+                [torch.tensor(df_ts[physical_columns].values, dtype=torch.float32)]
+                + [
+                    torch.tensor(df_derived[col].mean(axis=1, skipna=True).values, dtype=torch.float32).unsqueeze(1)
+                    for col in self.derived_columns.values()
+                ],
+                dim=1,
+            )
+            entity_data["y_obs"] = torch.tensor(df_ts[self.cfg.target].values[self.lag_rows :], dtype=torch.float32)
+            if self.cfg.static_input:
+                entity_data["x_s"] = torch.tensor(self.df_attributes.loc[catch_id].values, dtype=torch.float32)
+            return entity_data
+
+        # Dynamic input as [time, variables] tensor.
+        entity_data["x_d"] = torch.tensor(df_ts[self.unique_dynamic_input].values, dtype=torch.float32)
+
+        # Target data
+        entity_data["y_obs"] = torch.tensor(df_ts[self.cfg.target].values, dtype=torch.float32)
+
+        # Forecast input as [time, variables] tensor.
+        if self.cfg.forecast_input:
+            entity_data["x_fc"] = torch.tensor(df_ts[self.unique_forecast_input].values, dtype=torch.float32)
+
+        # Static input (e.g. catchment attributes)
+        if self.cfg.static_input:
+            entity_data["x_s"] = torch.tensor(self.df_attributes.loc[catch_id].values, dtype=torch.float32)
+
+        # Conceptual input as [time, variables] tensor. Each variable is the mean of the columns assigned to it.
+        if self.cfg.dynamic_input_conceptual_model:
+            x_conceptual = []
+            for v in self.cfg.dynamic_input_conceptual_model.values():
+                col = [v] if isinstance(v, str) else v
+                x_conceptual.append(torch.tensor(df_ts[col].mean(axis=1, skipna=True).values, dtype=torch.float32))
+            entity_data["x_d_conceptual"] = torch.stack(x_conceptual, dim=1)
+
+        return entity_data
+
+    def _ingest_pool(self) -> ProcessPoolExecutor:
+        """Pool of processes used to read and process the entities in parallel (see `num_ingest_workers`).
+
+        Each process creates its own dataset once, when it is initialized, from the configuration file and the static
+        attributes. The rest of the dataset is not copied to the processes.
+
+        Returns
+        -------
+        ProcessPoolExecutor
+            Pool of processes
+
+        """
+        return ProcessPoolExecutor(
+            max_workers=min(self.cfg.num_ingest_workers, len(self.entities_ids)),
+            initializer=_init_ingest_worker,
+            initargs=(
+                type(self),
+                self.cfg,
+                self.time_period,
+                self.check_NaN,
+                self.entities_ids,
+                self.df_attributes if self.cfg.static_input else None,
+            ),
+        )
+
+    def _read_records(self) -> dict[str, dict[str, pd.DataFrame | torch.Tensor]]:
+        """Read and process the full record (whole time period of the dataset) of all the entities.
+
+        Returns
+        -------
+        dict[str, dict[str, pd.DataFrame | torch.Tensor]]
+            Record of each entity, as returned by `_read_record`
+
+        """
+        executor = None
+        if self.cfg.num_ingest_workers > 0 and len(self.entities_ids) > 1:
+            executor = self._ingest_pool()
+            records = _map_bounded(
+                executor=executor,
+                function=_read_entity_record,
+                ids=self.entities_ids,
+                max_pending=2 * self.cfg.num_ingest_workers,
+            )
+        else:
+            records = (self._read_record(catch_id=id) for id in self.entities_ids)
+
+        if len(self.entities_ids) > 1:
+            records = tqdm(records, total=len(self.entities_ids), desc="Reading entities", unit="entity", ascii=True)
+
+        # The pool is shut down also when an entity fails, cancelling the pending ones
+        try:
+            return dict(zip(self.entities_ids, records, strict=True))
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    def _read_record(self, catch_id: str) -> dict[str, pd.DataFrame | torch.Tensor]:
+        """Read and process the full record (whole time period of the dataset) of a specific entity.
+
+        Parameters
+        ----------
+        catch_id : str
+            identifier of the basin.
+
+        Returns
+        -------
+        dict[str, pd.DataFrame | torch.Tensor]
+            Processed dataframe ("df_ts") and model inputs and targets of the entity (see `_tensorize_entity`)
+
+        """
+        df_ts = self._prepare_entity(catch_id=catch_id)
+        record = {"df_ts": df_ts, **self._tensorize_entity(catch_id=catch_id, df_ts=df_ts)}
+
+        # The variables of the inputs are stored in column-major order, so the time slices of each variable are
+        # contiguous and can be shared without copies (see `_split_columns`)
+        if not self.cfg.contiguous_storage:
+            for group in ("x_d", "x_fc", "x_d_conceptual", "x_store"):
+                if group in record:
+                    record[group] = record[group].T.contiguous().T
+
+        return record
+
+    def _slice_record(
+        self, catch_id: str, record: dict[str, pd.DataFrame | torch.Tensor]
+    ) -> dict[str, np.ndarray | pd.DataFrame | torch.Tensor]:
+        """Process a specific entity as a view of its full record.
+
+        Parameters
+        ----------
+        catch_id : str
+            identifier of the basin.
+        record : dict[str, pd.DataFrame | torch.Tensor]
+            Full record of the entity, as returned by `_read_record`.
+
+        Returns
+        -------
+        entity_data : dict[str, np.ndarray | pd.DataFrame | torch.Tensor]
+            Same information as returned by `_process_entity`, in which the dataframe and the time series are slices of
+            the record
+
+        """
+        # Position, in the record, of the start of the warmup period and of the end of the period of interest
+        index = record["df_ts"].index
+        freq = index.freqstr
+        start_date = self._parse_datetime(date_str=self.time_period[0], freq=freq)
+        end_date = self._parse_datetime(date_str=self.time_period[1], freq=freq)
+        warmup_start_date = start_date - (
+            self.cfg.seq_length_hindcast + self.cfg.seq_length_forecast - self.cfg.predict_last_n
+        ) * pd.tseries.frequencies.to_offset(freq)
+        # The dataframe and the input store also contain the `lag_rows` timesteps before the warmup period
+        start = index.searchsorted(warmup_start_date) - self.lag_rows
+        end = index.searchsorted(end_date, side="right") - self.lag_rows
+
+        df_ts = record["df_ts"].iloc[start : end + self.lag_rows]
+        valid_samples = self._select_samples(catch_id=catch_id, df_ts=df_ts, check_NaN=self.check_NaN)
+
+        entity_data = {"valid_samples": valid_samples}
+        if valid_samples.size == 0:  # Basins without valid samples
+            return entity_data
+
+        entity_data["df_ts"] = df_ts
+        for k, v in record.items():
+            if k == "x_s":
+                entity_data[k] = v
+            elif k != "df_ts":
+                entity_data[k] = v[start:end] if k == "y_obs" else v[start : end + self.lag_rows]
+
+        return entity_data
+
+    def _gather_inputs(
+        self, group: str, rows: torch.Tensor, variables: Optional[list[str]] = None
+    ) -> dict[str, torch.Tensor]:
+        """Gather rows of a group of variables from the contiguous tensors.
+
+        Parameters
+        ----------
+        group : str
+            Group of variables: 'x_d', 'x_fc', 'x_d_conceptual' or one of the keys of `self.x_d_aggregated`.
+        rows : torch.Tensor
+            Rows of the inputs (see `input_offset`), of any shape.
+        variables : Optional[list[str]], default=None
+            Variables that are gathered. By default, all the variables of the group.
+
+        Returns
+        -------
+        dict[str, torch.Tensor]
+            Dictionary indexed by variable name with tensors of the same shape as rows. The lagged features are taken
+            from the rows of their feature shifted by the lag.
+
+        """
+        data = self.x_d_aggregated[group] if group in self.x_d_aggregated else getattr(self, group)
+        column_index = self.column_index[group]
+        lags = self.column_lag.get(group, {})
+        variables = list(column_index) if variables is None else variables
+
+        # The variables without lag are gathered at once
+        x = data[rows] if any(k not in lags for k in variables) else None
+        return {k: data[rows - lags[k], column_index[k]] if k in lags else x[..., column_index[k]] for k in variables}
+
+    def _get_dates(self, basin: str, start: int, end: int) -> np.ndarray:
+        """Dates of a slice of the time series of a specific basin.
+
+        Parameters
+        ----------
+        basin : str
+            identifier of the basin.
+        start : int
+            First time index (inclusive) of the slice, relative to the start of the basin's time series.
+        end : int
+            Last time index (exclusive) of the slice, relative to the start of the basin's time series.
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape [end - start] with the dates
+
+        """
+        first_date, time_step, _ = self.entity_dates[basin]
+        return first_date + np.arange(start, end) * time_step
+
+    def _get_sequence(self, group: str, basin: str, start: int, end: int, step: int = 1) -> dict[str, torch.Tensor]:
+        """Slice the time series of a group of variables for a specific basin.
+
+        Parameters
+        ----------
+        group : str
+            Group of variables: 'x_d', 'x_fc', 'x_d_conceptual' or one of the keys of `self.x_d_aggregated`.
+        basin : str
+            identifier of the basin.
+        start : int
+            First time index (inclusive) of the slice, relative to the start of the basin's time series.
+        end : int
+            Last time index (exclusive) of the slice, relative to the start of the basin's time series.
+        step : int, default=1
+            Step of the slice.
+
+        Returns
+        -------
+        dict[str, torch.Tensor]
+            Dictionary indexed by variable name with the sliced time series
+
+        """
+        data = self.x_d_aggregated[group] if group in self.x_d_aggregated else getattr(self, group)
+        if self.cfg.contiguous_storage:
+            # The slices of the lagged features start `lag` rows earlier
+            offset = self.input_offset[self.entity_index[basin]]
+            lags = self.column_lag.get(group, {})
+            x = data[offset + start : offset + end : step]
+            return self._prepare_inputs(
+                group=group,
+                x={
+                    k: data[offset + start - lags[k] : offset + end - lags[k] : step, i] if k in lags else x[:, i]
+                    for k, i in self.column_index[group].items()
+                },
+            )
+
+        return self._prepare_inputs(group=group, x={k: v[start:end:step] for k, v in data[basin].items()})
+
+    def _get_target(self, basin: str, start: int, end: int) -> torch.Tensor:
+        """Slice the target variables for a specific basin.
+
+        Parameters
+        ----------
+        basin : str
+            identifier of the basin.
+        start : int
+            First time index (inclusive) of the slice, relative to the start of the basin's time series.
+        end : int
+            Last time index (exclusive) of the slice, relative to the start of the basin's time series.
+
+        Returns
+        -------
+        torch.Tensor
+            Tensor of shape [end - start, n_targets] with the target variables (float32 values)
+
+        """
+        if self.cfg.contiguous_storage:
+            offset = self.entity_offset[self.entity_index[basin]]
+            return self.y_obs[offset + start : offset + end, :].float()
+
+        return self.y_obs[basin][start:end, :].float()
+
+    def _get_attributes_files(self) -> list[Path]:
+        # This function is specific for each dataset. Returns the files read by _read_attributes (used by the cache)
+        raise NotImplementedError
+
+    def _get_data_files(self, catch_id: str) -> list[Path]:
+        # This function is specific for each dataset. Returns the files read by _read_data (used by the cache)
+        raise NotImplementedError
+
+    @staticmethod
+    def _get_entities_ids(cfg: Config, time_period: str, entities_ids: Optional[str | list[str]] = None) -> list[str]:
+        """ID of the entities of interest.
+
+        Parameters
+        ----------
+        cfg : Config
+            Configuration file.
+        time_period : str
+            Name of the period of the dataset (e.g. 'training').
+        entities_ids : Optional[str | list[str]], default=None
+            ID of the entities given directly. By default, the entities are read from the file defined in the
+            configuration file.
+
+        Returns
+        -------
+        list[str]
+            ID of the entities
+
+        """
+        # Read entities_ids from variable
+        if entities_ids:
+            return [entities_ids] if isinstance(entities_ids, str) else entities_ids
+        # Read entities_ids from configuration file. Periods without their own file (e.g. the folds of a temporal
+        # cross-validation, see `from_periods`) use `path_entities`.
+        elif getattr(cfg, f"path_entities_{time_period}", cfg.path_entities):
+            path_entities = getattr(cfg, f"path_entities_{time_period}", cfg.path_entities)
+            entities_ids = np.loadtxt(path_entities, dtype="str").tolist()
+            return [entities_ids] if isinstance(entities_ids, str) else entities_ids
+        else:
+            raise ValueError(
+                f"No entities_ids found. Provide the `entities_ids` variable directly or define in the configuration"
+                f"file either `path_entities` or `path_entities_{time_period}`"
+            )
+
+    def _get_read_columns(self) -> list[str]:
+        """Columns of the time series that are used to process the entities.
+
+        The columns that are calculated after reading the data (lagged features) are replaced by the columns from which
+        they are calculated.
+
+        Returns
+        -------
+        list[str]
+            Name of the columns
+
+        """
+        columns = self.hindcast_input + self.unique_forecast_input + self.cfg.target
+        if isinstance(self.cfg.lagged_features, dict):
+            lagged_columns = BaseDataset._lagged_columns(lagged_features=self.cfg.lagged_features)
+            columns = [c for c in columns if c not in lagged_columns] + list(self.cfg.lagged_features)
+
+        return list(dict.fromkeys(columns))
+
+    def _read_attributes(self) -> pd.DataFrame:
+        # This function is specific for each dataset. Returns the attributes of all the available entities.
+        raise NotImplementedError
+
+    def _read_data(
+        self,
+        catch_id: str,
+        columns: Optional[list[str]] = None,
+        period: Optional[tuple[pd.Timestamp, pd.Timestamp]] = None,
+        n_warmup: int = 0,
+    ) -> pd.DataFrame:
+        # This function is specific for each dataset. The optional arguments define the columns, the time period and
+        # the number of rows before the start of the period that are used. The readers can use them to parse only this
+        # information (e.g. with `_read_csv`), but they can also return additional columns and rows.
+        raise NotImplementedError
+
+    def _read_csv(
+        self,
+        path: Path,
+        columns: Optional[list[str]] = None,
+        period: Optional[tuple[pd.Timestamp, pd.Timestamp]] = None,
+        n_warmup: int = 0,
+        date_column: str = "date",
+        **kwargs,
+    ) -> pd.DataFrame:
+        """Read a date-indexed csv file, parsing only the columns and rows that are used.
+
+        Parameters
+        ----------
+        path : Path
+            Path of the csv file. The rows must be sorted by date.
+        columns : Optional[list[str]], default=None
+            Columns that are used (columns that are not in the file are ignored). By default, all the columns.
+        period : Optional[tuple[pd.Timestamp, pd.Timestamp]], default=None
+            Start and end of the time period that is used. By default, all the rows.
+        n_warmup : int, default=0
+            Number of rows before the start of the period that are used.
+        date_column : str, default="date"
+            Name of the column with the dates.
+        **kwargs
+            Additional arguments of `pd.read_csv`.
+
+        Returns
+        -------
+        df : pd.DataFrame
+            Date-indexed dataframe with (at least) the columns and rows that are used
+
+        """
+        if columns is not None:
+            columns_of_interest = set(columns)
+            kwargs["usecols"] = lambda c: c == date_column or c in columns_of_interest
+            if self.cfg.read_float32:
+                kwargs["dtype"] = {c: np.float32 for c in columns}
+
+        if period is None:
+            return pd.read_csv(path, index_col=date_column, parse_dates=[date_column], **kwargs)
+
+        with pd.read_csv(
+            path, index_col=date_column, parse_dates=[date_column], chunksize=BaseDataset._csv_chunk_size, **kwargs
+        ) as chunks:
+            return BaseDataset._select_period(chunks=chunks, period=period, n_warmup=n_warmup)
+
+    def _store_entity(self, catch_id: str, entity_data: dict[str, np.ndarray | pd.DataFrame | torch.Tensor]):
+        """Store the processed information of an entity with valid samples, in basin-indexed dictionaries.
+
+        Parameters
+        ----------
+        catch_id : str
+            identifier of the basin.
+        entity_data : dict[str, np.ndarray | pd.DataFrame | torch.Tensor]
+            Processed information of the entity, as returned by `_process_entity`.
+
+        """
+        # Without the dataframe (`lean_storage`), the dates of the basin are defined by the first date, the time step
+        # and the number of timesteps (from the start of the warmup period)
+        index = entity_data["df_ts"].index[self.lag_rows :]
+        dates = index.to_numpy()
+        time_step = ((index[0] + index.freq) - index[0]).to_numpy().astype(f"m8[{np.datetime_data(dates.dtype)[0]}]")
+        self.entity_dates[catch_id] = (dates[0], time_step, len(dates))
+        if not self.cfg.lean_storage:
+            self.df_ts[catch_id] = entity_data["df_ts"]
+
+        self.y_obs[catch_id] = entity_data["y_obs"]
+        if self.cfg.static_input:
+            self.x_s[catch_id] = entity_data["x_s"]
+
+        # The dynamic, forecast and conceptual inputs are kept as [time, variables] tensors if they will be
+        # concatenated later. Otherwise, they are stored as nested dictionaries, first indexed by basin and
+        # then by variable name.
+        if self.use_input_store and self.cfg.contiguous_storage:
+            self.x_store[catch_id] = entity_data["x_store"]
+        elif self.use_input_store:
+            self.x_store[catch_id] = BaseDataset._split_columns(entity_data["x_store"], self.store_columns)
+            self._set_input_views(catch_id=catch_id)
+        elif self.cfg.contiguous_storage:
+            self.x_d[catch_id] = entity_data["x_d"]
+            if self.cfg.forecast_input:
+                self.x_fc[catch_id] = entity_data["x_fc"]
+            if self.cfg.dynamic_input_conceptual_model:
+                self.x_d_conceptual[catch_id] = entity_data["x_d_conceptual"]
+        else:
+            self.x_d[catch_id] = BaseDataset._split_columns(entity_data["x_d"], self.unique_dynamic_input)
+            if self.cfg.forecast_input:
+                self.x_fc[catch_id] = BaseDataset._split_columns(entity_data["x_fc"], self.unique_forecast_input)
+            if self.cfg.dynamic_input_conceptual_model:
+                self.x_d_conceptual[catch_id] = BaseDataset._split_columns(
+                    entity_data["x_d_conceptual"], list(self.cfg.dynamic_input_conceptual_model)
+                )
+
+    def _running_statistics(self) -> dict[str, RunningStatistics]:
+        """Accumulate the statistics of the dynamic inputs ("x_d"), targets ("y") and forecast inputs ("x_fc").
+
+        The statistics are accumulated basin by basin, so the time series of all the basins are never concatenated.
+
+        Returns
+        -------
+        dict[str, RunningStatistics]
+            Statistics of each group of variables
+
+        """
+        statistics = {
+            "x_d": RunningStatistics(n_features=len(self.unique_dynamic_input)),
+            "y": RunningStatistics(n_features=len(self.cfg.target)),
+            "x_fc": RunningStatistics(n_features=len(self.unique_forecast_input)),
+        }
+        # Without the dataframes (`lean_storage`), the statistics are calculated from the (float32) tensors
+        if self.cfg.lean_storage and self.cfg.contiguous_storage:
+            # Rows of the inputs of all the timesteps (from the start of the warmup period of each basin)
+            rows = torch.from_numpy(
+                np.concatenate(
+                    [self.input_offset[i] + np.arange(n) for i, (_, _, n) in enumerate(self.entity_dates.values())]
+                    + [np.array([], dtype=np.int64)]
+                )
+            )
+            statistics["x_d"].update(torch.stack(list(self._gather_inputs("x_d", rows).values()), dim=1).numpy())
+            statistics["y"].update(self.y_obs.numpy())
+            if self.cfg.forecast_input:
+                statistics["x_fc"].update(torch.stack(list(self._gather_inputs("x_fc", rows).values()), dim=1).numpy())
+        elif self.cfg.lean_storage:
+            for basin in self.entity_table:
+                statistics["x_d"].update(torch.stack(list(self.x_d[basin].values()), dim=1).numpy())
+                statistics["y"].update(self.y_obs[basin].numpy())
+                if self.cfg.forecast_input:
+                    statistics["x_fc"].update(torch.stack(list(self.x_fc[basin].values()), dim=1).numpy())
+        else:
+            for df in self.df_ts.values():
+                df = self._materialize_lagged_features(df_ts=df)
+                statistics["x_d"].update(df[self.unique_dynamic_input].values)
+                statistics["y"].update(df[self.cfg.target].values)
+                if self.cfg.forecast_input:
+                    statistics["x_fc"].update(df[self.unique_forecast_input].values)
+
+        return statistics
+
+    def _set_input_views(self, catch_id: str):
+        """Define the dynamic, forecast and conceptual inputs of an entity as views of the shared input store.
+
+        The variables are references to the columns of the store (or slices of them, which start at the warmup period),
+        so they are not copied. The slices of the lagged features start `lag` timesteps earlier.
+
+        Parameters
+        ----------
+        catch_id : str
+            identifier of the basin.
+
+        """
+        store = self.x_store[catch_id]
+        length = self.entity_dates[catch_id][2]
+        for group in ("x_d", "x_fc", "x_d_conceptual"):
+            if hasattr(self, group):
+                views = {}
+                for k, c in self.input_columns[group].items():
+                    start = self.lag_rows - self.column_lag[group].get(k, 0)
+                    views[k] = store[c] if self.lag_rows == 0 else store[c][start : start + length]
+                getattr(self, group)[catch_id] = views
+
+    def _standardize_contiguous_storage(self, standardize_output: bool):
+        """Standardize the data, in place, when it is stored in contiguous tensors.
+
+        Parameters
+        ----------
+        standardize_output : bool
+            Boolean to define if the output should be standardize or not.
+
+        """
+        # Dynamic input
+        if not self._standardize_input:
+            self.x_d.sub_(torch.stack([self.scaler["x_d_mean"][k] for k in self.unique_dynamic_input]))
+            self.x_d.div_(torch.stack([self.scaler["x_d_std"][k] for k in self.unique_dynamic_input]))
+
+        # Forecast input
+        if self.cfg.forecast_input and not self._standardize_input:
+            self.x_fc.sub_(torch.stack([self.scaler["x_fc_mean"][k] for k in self.unique_forecast_input]))
+            self.x_fc.div_(torch.stack([self.scaler["x_fc_std"][k] for k in self.unique_forecast_input]))
+
+        # Static input
+        if self.cfg.static_input:
+            self.x_s = (self.x_s - self.scaler["x_s_mean"]) / self.scaler["x_s_std"]
+
+        # Output
+        if standardize_output:
+            self.y_obs = (self.y_obs - self.scaler["y_mean"]) / self.scaler["y_std"]
+
+    def _prepare_inputs(self, group: str, x: dict[str, torch.Tensor]) -> dict[str, torch.Tensor]:
+        """Convert the inputs read from the storage to the values of the samples.
+
+        The values stored with reduced precision (see `storage_dtype`) are converted to float32, and the inputs that
+        are standardized when the samples are read (see `standardize_data`) are standardized.
+
+        Parameters
+        ----------
+        group : str
+            Group of the variables (e.g. 'x_d', 'x_fc'). Only the dynamic and forecast inputs are standardized.
+        x : dict[str, torch.Tensor]
+            Dictionary indexed by variable name with the values.
+
+        Returns
+        -------
+        dict[str, torch.Tensor]
+            Dictionary indexed by variable name with the (standardized) float32 values
+
+        """
+        x = {k: v.float() for k, v in x.items()}  # no copy if the values are already float32
+        if not self._standardize_input or group not in ("x_d", "x_fc"):
+            return x
+
+        return {k: (v - self.scaler[f"{group}_mean"][k]) / self.scaler[f"{group}_std"][k] for k, v in x.items()}
+
+    def _nan_free_groups(
+        self, df_ts: pd.DataFrame, groups: dict[str, list[str]], start: int, window_length: int, n_windows: int
+    ) -> np.ndarray:
+        """Check the windows of multiple groups of variables for NaN.
+
+        A window is valid if at least one group has no NaN and all the mandatory groups have no NaN. A mandatory group
+        is a group that, according to the `nan_probability` configuration argument, has a nan_seq = 0.
+
+        Parameters
+        ----------
+        df_ts : pd.DataFrame
+            DataFrame with time series of inputs and targets.
+        groups : dict[str, list[str]]
+            Variables of each group.
+        start : int
+            Start of the first window.
+        window_length : int
+            Number of timesteps of each window.
+        n_windows : int
+            Number of windows (the window j starts at start + j).
+
+        Returns
+        -------
+        np.ndarray
+            Boolean array of length n_windows, True for the valid windows
+
+        """
+        mask_groups = None
+        mask_mandatory_groups = None
+        # Check for each group
+        for group_name, group_var in groups.items():
+            g_mask = BaseDataset._nan_free_windows(
+                x=df_ts[group_var].values, start=start, window_length=window_length, n_windows=n_windows
+            )
+
+            # The mask is True if there is at least one valid group (logical OR -> |)
+            mask_groups = g_mask if mask_groups is None else mask_groups | g_mask
+
+            # Mandatory groups
+            if self.cfg.nan_probability is not None and self.cfg.nan_probability[group_name]["nan_seq"] == 0:
+                # The mask is True if all mandatory groups are True (logical AND -> &)
+                mask_mandatory_groups = g_mask if mask_mandatory_groups is None else mask_mandatory_groups & g_mask
+
+        # Final mask: least one group valid AND all mandatory groups valid
+        return mask_groups if mask_mandatory_groups is None else mask_groups & mask_mandatory_groups
+
+    def _variables_of_interest(self, subset_name: str) -> list[str]:
+        """Dynamic input variables used in a specific frequency of `custom_seq_processing`.
+
+        Parameters
+        ----------
+        subset_name : str
+            Name of the frequency (key in `custom_seq_processing`).
+
+        Returns
+        -------
+        list[str]
+            Name of the variables
+
+        """
+        if isinstance(self.cfg.dynamic_input, dict):
+            return self.unique_input_per_freq[subset_name]
+        return self.cfg.dynamic_input
+
+    def _validate_samples(self, df_ts: pd.DataFrame, df_attributes: pd.DataFrame, check_NaN: bool) -> np.ndarray:
+        """Checks for invalid samples due to NaN or insufficient sequence length.
 
         Parameters
         ----------
@@ -548,6 +1988,13 @@ class BaseDataset(Dataset):
                     flag[:] = False
                     return flag
 
+            # The windows are checked with prefix sums of the number of timesteps with NaN (see `_window_sum`), so
+            # the cost does not depend on the sequence length. Window j of the hindcast check starts at timestep j
+            # and corresponds to the sample i = j + seq_length_hindcast - 1.
+            w_hindcast = self.cfg.seq_length_hindcast
+            n_hindcast = max(len(df_ts) - w_hindcast + 1, 0)  # samples with a full hindcast period
+            n_forecast = max(last_forecast - w_hindcast + 1, 0)  # samples with full hindcast and forecast periods
+
             # -------------------------
             # Hindcast NaN check
             # -------------------------
@@ -557,11 +2004,10 @@ class BaseDataset(Dataset):
             # - We have a single group of variables and we work with single frequency data
             # - We have multi-frequency approaches but all frequencies use the same single group of variables.
             if isinstance(self.cfg.dynamic_input, list):
-                # values of interest
-                x = df_ts[self.hindcast_input].values
-                x_slide_view = sliding_window_view(x, (self.cfg.seq_length_hindcast, x.shape[1]))
-                mask = ~np.any(np.isnan(x_slide_view), axis=(2, 3)).flatten()
-                flag[self.cfg.seq_length_hindcast - 1 :] &= mask
+                mask = BaseDataset._nan_free_windows(
+                    x=df_ts[self.hindcast_input].values, start=0, window_length=w_hindcast, n_windows=n_hindcast
+                )
+                flag[w_hindcast - 1 :] &= mask
 
             # Case 2: If we have multiple groups of variables, and use the same groups along the whole sequence.
             # Example: We have multiple group of variables but have single frequency data.
@@ -570,81 +2016,58 @@ class BaseDataset(Dataset):
             # - a "mandatory group" have NaN elements. A mandatory group is a group that according to the
             # ´nan_probability´ configuration argument have a nan_seq = 0
             elif isinstance(self.cfg.dynamic_input, dict) and self.cfg.custom_seq_processing is None:
-                mask_groups = None
-                mask_mandatory_groups = None
-                # Check for each group
-                for group_name, group_var in self.cfg.dynamic_input.items():
-                    x = df_ts[group_var].values
-                    x_slide_view = sliding_window_view(x, (self.cfg.seq_length_hindcast, x.shape[1]))
-                    g_mask = ~np.any(np.isnan(x_slide_view), axis=(2, 3)).flatten()
-
-                    # The mask is True if there is at least one valid group (logical OR -> |)
-                    mask_groups = g_mask if mask_groups is None else mask_groups | g_mask
-
-                    # Mandatory groups
-                    if self.cfg.nan_probability is not None and self.cfg.nan_probability[group_name]["nan_seq"] == 0:
-                        # The mask is True if all mandatory groups are True (logical AND -> &)
-                        mask_mandatory_groups = (
-                            g_mask if mask_mandatory_groups is None else mask_mandatory_groups & g_mask
-                        )
-
-                # Final mask: least one group valid AND all mandatory groups valid
-                mask = mask_groups if mask_mandatory_groups is None else mask_groups & mask_mandatory_groups
-                flag[self.cfg.seq_length_hindcast - 1 :] &= mask
+                mask = self._nan_free_groups(
+                    df_ts=df_ts,
+                    groups=self.cfg.dynamic_input,
+                    start=0,
+                    window_length=w_hindcast,
+                    n_windows=n_hindcast,
+                )
+                flag[w_hindcast - 1 :] &= mask
 
             # Case 3: If we use the different variables (or group of variables) along the sequence length.
             # Example: We have multi-frequency approaches and the variables change along the sequence.
             elif isinstance(self.cfg.dynamic_input, dict) and isinstance(self.cfg.custom_seq_processing, dict):
                 aux_index = 0  # start of sequence subset
                 for k, v in self.cfg.custom_seq_processing.items():
+                    subset_length = v["n_steps"] * v["freq_factor"]
                     # If we have single group of variables for each frequency
                     if isinstance(self.cfg.dynamic_input[k], list):
-                        x = df_ts[self.cfg.dynamic_input[k]].values
-                        x_slide_view = sliding_window_view(x, (self.cfg.seq_length_hindcast, x.shape[1]))
-                        x_freq_subset = x_slide_view[:, :, aux_index : aux_index + (v["n_steps"] * v["freq_factor"])]
-                        mask = ~np.any(np.isnan(x_freq_subset), axis=(2, 3)).flatten()
+                        mask = BaseDataset._nan_free_windows(
+                            x=df_ts[self.cfg.dynamic_input[k]].values,
+                            start=aux_index,
+                            window_length=subset_length,
+                            n_windows=n_hindcast,
+                        )
 
                     # If we have multiple groups of variables for each frequency
                     elif isinstance(self.cfg.dynamic_input[k], dict):
-                        mask_groups = None
-                        mask_mandatory_groups = None
-                        for group_name, group_var in self.cfg.dynamic_input[k].items():
-                            x = df_ts[group_var].values
-                            x_slide_view = sliding_window_view(x, (self.cfg.seq_length_hindcast, x.shape[1]))
-                            x_freq_subset = x_slide_view[
-                                :,
-                                :,
-                                aux_index : aux_index + (v["n_steps"] * v["freq_factor"]),
-                            ]
-                            g_mask = ~np.any(np.isnan(x_freq_subset), axis=(2, 3)).flatten()
-
-                            # The mask is True if there is at least one valid group (logical OR -> |)
-                            mask_groups = g_mask if mask_groups is None else mask_groups | g_mask
-
-                            # Mandatory groups
-                            if (
-                                self.cfg.nan_probability is not None
-                                and self.cfg.nan_probability[group_name]["nan_seq"] == 0
-                            ):
-                                # The mask is True if all mandatory groups are True (logical AND -> &)
-                                mask_mandatory_groups = (
-                                    g_mask if mask_mandatory_groups is None else mask_mandatory_groups & g_mask
-                                )
-
-                        # Final mask: least one group valid AND all mandatory groups valid
-                        mask = mask_groups if mask_mandatory_groups is None else mask_groups & mask_mandatory_groups
-
-                    flag[self.cfg.seq_length_hindcast - 1 :] &= mask
-                    aux_index += v["n_steps"] * v["freq_factor"]
+                        mask = self._nan_free_groups(
+                            df_ts=df_ts,
+                            groups=self.cfg.dynamic_input[k],
+                            start=aux_index,
+                            window_length=subset_length,
+                            n_windows=n_hindcast,
+                        )
+
+                    flag[w_hindcast - 1 :] &= mask
+                    aux_index += subset_length
 
             # -------------------------
             # Target NaN check: all-NaN in the targets makes the sample invalid
             # -------------------------
-            i_start = self.cfg.seq_length_hindcast + self.cfg.seq_length_forecast - self.cfg.predict_last_n
-            y = df_ts[self.cfg.target].values[i_start:]
-            y_slide_view = sliding_window_view(y, (self.cfg.predict_last_n, y.shape[1]))
-            mask = ~np.all(np.isnan(y_slide_view), axis=(2, 3)).flatten()
-            flag[self.cfg.seq_length_hindcast - 1 : last_forecast] &= mask
+            # A window is all-NaN if none of its timesteps has a valid target
+            valid_rows = ~np.all(np.isnan(df_ts[self.cfg.target].values), axis=1)
+            mask = (
+                BaseDataset._window_sum(
+                    x=valid_rows,
+                    start=w_hindcast + self.cfg.seq_length_forecast - self.cfg.predict_last_n,
+                    window_length=self.cfg.predict_last_n,
+                    n_windows=n_forecast,
+                )
+                > 0
+            )
+            flag[w_hindcast - 1 : last_forecast] &= mask
 
             # -------------------------
             # Forecast NaN check: any-NaN in the x makes the sample invalid
@@ -652,37 +2075,25 @@ class BaseDataset(Dataset):
             if self.cfg.forecast_input:
                 # Case 1: If have only one group of variables, any NaN makes the sample invalid.
                 if isinstance(self.cfg.forecast_input, list):
-                    x = df_ts[self.cfg.forecast_input].values[self.cfg.seq_length_hindcast :]
-                    x_slide_view = sliding_window_view(x, (self.cfg.seq_length_forecast, x.shape[1]))
-                    mask = ~np.any(np.isnan(x_slide_view), axis=(2, 3)).flatten()
+                    mask = BaseDataset._nan_free_windows(
+                        x=df_ts[self.cfg.forecast_input].values,
+                        start=w_hindcast,
+                        window_length=self.cfg.seq_length_forecast,
+                        n_windows=n_forecast,
+                    )
 
                 # Case 2: If have multiple groups of variables, all the groups need to have NaN elements in
                 # the same point to make the sample invalid.
                 elif isinstance(self.cfg.forecast_input, dict):
-                    mask_groups = None
-                    mask_mandatory_groups = None
-                    for group_name, group_var in self.cfg.forecast_input.items():
-                        x = df_ts[group_var].values[self.cfg.seq_length_hindcast :]
-                        x_slide_view = sliding_window_view(x, (self.cfg.seq_length_forecast, x.shape[1]))
-                        g_mask = ~np.any(np.isnan(x_slide_view), axis=(2, 3)).flatten()
-
-                        # The mask is True if there is at least one valid group (logical OR -> |)
-                        mask_groups = g_mask if mask_groups is None else mask_groups | g_mask
-
-                        # Mandatory groups
-                        if (
-                            self.cfg.nan_probability is not None
-                            and self.cfg.nan_probability[group_name]["nan_seq"] == 0
-                        ):
-                            # The mask is True if all mandatory groups are True (logical AND -> &)
-                            mask_mandatory_groups = (
-                                g_mask if mask_mandatory_groups is None else mask_mandatory_groups & g_mask
-                            )
-
-                    # Final mask: least one group valid AND all mandatory groups valid
-                    mask = mask_groups if mask_mandatory_groups is None else mask_groups & mask_mandatory_groups
-
-                flag[self.cfg.seq_length_hindcast - 1 : last_forecast] &= mask
+                    mask = self._nan_free_groups(
+                        df_ts=df_ts,
+                        groups=self.cfg.forecast_input,
+                        start=w_hindcast,
+                        window_length=self.cfg.seq_length_forecast,
+                        n_windows=n_forecast,
+                    )
+
+                flag[w_hindcast - 1 : last_forecast] &= mask
 
             # -------------------------
             # Ablation_flag check: If I want to exclude certain points
@@ -693,6 +2104,274 @@ class BaseDataset(Dataset):
 
         return flag
 
+    @staticmethod
+    def _as_tensor_dict(x: np.ndarray, columns: list[str]) -> dict[str, torch.Tensor]:
+        """Convert an array with one value per variable into a dictionary of (scalar) tensors indexed by variable name.
+
+        Parameters
+        ----------
+        x : np.ndarray
+            Array of shape [n_variables].
+        columns : list[str]
+            Name of the variables.
+
+        Returns
+        -------
+        dict[str, torch.Tensor]
+            Dictionary indexed by variable name
+
+        """
+        return {k: torch.tensor(v, dtype=torch.float32) for k, v in zip(columns, x, strict=True)}
+
+    @staticmethod
+    def _quantize(
+        x: torch.Tensor, dtype: torch.dtype, memo: dict[int, tuple[torch.Tensor, torch.Tensor]]
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """Convert a float32 tensor to a reduced precision data type.
+
+        Parameters
+        ----------
+        x : torch.Tensor
+            Tensor of shape [time] or [time, n_columns].
+        dtype : torch.dtype
+            Data type of the converted tensor.
+        memo : dict[int, tuple[torch.Tensor, torch.Tensor]]
+            Results of the tensors that were already converted, by id. The result of x is added to it.
+
+        Returns
+        -------
+        tuple[torch.Tensor, torch.Tensor]
+            Converted tensor, and maximum absolute error of each column (ignoring NaN values)
+
+        """
+        if id(x) not in memo:
+            x_cast = x.to(dtype)
+            error = (x_cast.to(torch.float32) - x).abs().nan_to_num(nan=0.0, posinf=torch.inf).reshape(len(x), -1)
+            memo[id(x)] = (x_cast, error.amax(dim=0) if len(x) > 0 else torch.zeros(error.size(1)))
+        return memo[id(x)]
+
+    @staticmethod
+    def _block_mean(x: torch.Tensor, block_size: int) -> torch.Tensor:
+        """Mean of the blocks of `block_size` consecutive elements, for every possible start of the block.
+
+        Element t of the output is the mean of x[t : t + block_size], or NaN if the block exceeds the length of the
+        tensor. The means are calculated in groups of non-overlapping blocks (one group per start position modulo
+        block_size), in the same way as `x[t : t + n * block_size].reshape(n, block_size).mean(dim=1)`, so the
+        results are identical to averaging each sequence individually.
+
+        Parameters
+        ----------
+        x : torch.Tensor
+            1-D tensor.
+        block_size : int
+            Number of consecutive elements in each block.
+
+        Returns
+        -------
+        torch.Tensor
+            1-D tensor with the same length as x
+
+        """
+        x_mean = torch.full_like(x, float("nan"))
+        for r in range(min(block_size, len(x))):
+            n_blocks = (len(x) - r) // block_size
+            x_mean[r : r + n_blocks * block_size : block_size] = (
+                x[r : r + n_blocks * block_size].reshape(n_blocks, block_size).mean(dim=1)
+            )
+        return x_mean
+
+    @staticmethod
+    def _concatenate(x: dict[str, torch.Tensor], n_columns: int) -> torch.Tensor:
+        """Concatenate along the first dimension the [time, variables] tensors of each basin.
+
+        Parameters
+        ----------
+        x : dict[str, torch.Tensor]
+            Dictionary indexed by basin with [time, variables] tensors.
+        n_columns : int
+            Number of variables (used if the dictionary is empty).
+
+        Returns
+        -------
+        torch.Tensor
+            Tensor of shape [total_timesteps, n_columns]
+
+        """
+        return torch.cat(list(x.values())) if x else torch.zeros((0, n_columns), dtype=torch.float32)
+
+    @staticmethod
+    def _lagged_columns(lagged_features: Optional[dict[str, int | list[int]]]) -> dict[str, tuple[str, int]]:
+        """Columns of the lagged features.
+
+        Parameters
+        ----------
+        lagged_features : Optional[dict[str, int | list[int]]]
+            Lag (or list of lags) of each feature, as defined by `lagged_features` in the configuration file.
+
+        Returns
+        -------
+        dict[str, tuple[str, int]]
+            Feature and lag of each lagged feature, indexed by the name of its column (e.g. "prcp_shift1")
+
+        """
+        if not isinstance(lagged_features, dict):
+            return {}
+
+        columns = {}
+        for feature, shift in lagged_features.items():
+            if isinstance(shift, list):  # If we have a list and we want to shift a variable multiple times
+                columns.update({f"{feature}_shift{s}": (feature, s) for s in shift})
+            elif isinstance(shift, int):
+                columns[f"{feature}_shift{shift}"] = (feature, shift)
+            else:
+                raise ValueError("The value of the 'lagged_features' arg must be either an int or a list of ints")
+        return columns
+
+    @staticmethod
+    def _nan_free_windows(x: np.ndarray, start: int, window_length: int, n_windows: int) -> np.ndarray:
+        """Check which windows of a [time, variables] array have no NaN.
+
+        Parameters
+        ----------
+        x : np.ndarray
+            Array of shape [time, variables].
+        start : int
+            Start of the first window.
+        window_length : int
+            Number of timesteps of each window.
+        n_windows : int
+            Number of windows (the window j starts at start + j).
+
+        Returns
+        -------
+        np.ndarray
+            Boolean array of length n_windows, True for the windows without NaN
+
+        """
+        nan_rows = np.any(np.isnan(x), axis=1)
+        return BaseDataset._window_sum(x=nan_rows, start=start, window_length=window_length, n_windows=n_windows) == 0
+
+    @staticmethod
+    def _window_sum(x: np.ndarray, start: int, window_length: int, n_windows: int) -> np.ndarray:
+        """Sum of the elements of x in consecutive windows, using prefix sums.
+
+        Element j of the output is x[start + j : start + j + window_length].sum(). Each sum is the difference of two
+        elements of the cumulative sum of x, so the cost is O(len(x)) regardless of the window length.
+
+        Parameters
+        ----------
+        x : np.ndarray
+            1-D array (e.g. boolean flags of the timesteps).
+        start : int
+            Start of the first window.
+        window_length : int
+            Number of elements of each window.
+        n_windows : int
+            Number of windows.
+
+        Returns
+        -------
+        np.ndarray
+            Array of length n_windows with the sum of each window
+
+        """
+        prefix_sum = np.concatenate(([0], np.cumsum(x, dtype=np.int64)))
+        return (
+            prefix_sum[start + window_length : start + window_length + n_windows]
+            - prefix_sum[start : start + n_windows]
+        )
+
+    @staticmethod
+    def _period_slice(
+        dates: pd.DatetimeIndex, period: Optional[tuple[pd.Timestamp, pd.Timestamp]], n_warmup: int
+    ) -> slice:
+        """Positions of the timesteps of a time period, for time series that can be indexed by position.
+
+        Parameters
+        ----------
+        dates : pd.DatetimeIndex
+            Sorted dates of the time series.
+        period : Optional[tuple[pd.Timestamp, pd.Timestamp]]
+            Start and end of the time period (None for the whole time series).
+        n_warmup : int
+            Number of timesteps before the start of the period that are included.
+
+        Returns
+        -------
+        slice
+            Positions of the timesteps (at least a few of them, so the frequency can be inferred)
+
+        """
+        if period is None:
+            return slice(0, len(dates))
+        first = max(int(dates.searchsorted(period[0])) - n_warmup, 0)
+        last = max(int(dates.searchsorted(period[1], side="right")), min(first + 3, len(dates)))
+        return slice(first, last)
+
+    @staticmethod
+    def _select_period(
+        chunks: Iterable[pd.DataFrame], period: tuple[pd.Timestamp, pd.Timestamp], n_warmup: int
+    ) -> pd.DataFrame:
+        """Combine the consecutive chunks of a time series, keeping only the rows of a time period.
+
+        The chunks that end before the start of the period are discarded, except their last n_warmup rows, and the
+        chunks after the one that contains the end of the period are not consumed (so they are never parsed). The
+        result can contain some additional rows before and after the period.
+
+        Parameters
+        ----------
+        chunks : Iterable[pd.DataFrame]
+            Consecutive chunks of a time series, indexed by date and sorted.
+        period : tuple[pd.Timestamp, pd.Timestamp]
+            Start and end of the time period.
+        n_warmup : int
+            Number of rows before the start of the period that are kept.
+
+        Returns
+        -------
+        pd.DataFrame
+            Rows of the time series that cover the time period
+
+        """
+        start_date, end_date = period
+        # At least a few rows are kept, so the frequency can be inferred even if the period is outside the time series
+        n_keep = max(n_warmup, 3)
+        selected = []
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            if chunk.index[-1] < start_date:
+                # The chunk ends before the period: only its last rows can be part of the warmup
+                selected = [pd.concat([*selected, chunk]).iloc[-n_keep:]]
+                continue
+
+            selected.append(chunk)
+            if chunk.index[-1] >= end_date:
+                break
+
+        return pd.concat(selected)
+
+    @staticmethod
+    def _split_columns(x: torch.Tensor, columns: list[str]) -> dict[str, torch.Tensor]:
+        """Split a [time, variables] tensor into a dictionary of 1-D tensors indexed by variable name.
+
+        Parameters
+        ----------
+        x : torch.Tensor
+            Tensor of shape [time, variables].
+        columns : list[str]
+            Name of the variables.
+
+        Returns
+        -------
+        dict[str, torch.Tensor]
+            Dictionary indexed by variable name
+
+        """
+        # The time series of each variable must be contiguous (e.g. slices of the column-major records already are)
+        x = x.T
+        return dict(zip(columns, x if x.stride(-1) == 1 else x.contiguous(), strict=True))
+
     @staticmethod
     def collate_fn(
         samples: list[dict[str, torch.Tensor | np.ndarray | dict[str, torch.Tensor]]],
@@ -715,6 +2394,8 @@ class BaseDataset(Dataset):
                     - tensors
                     - numpy arrays
                     - Nested dictionaries of tensors
+                If a dictionary is given instead of a list, it is considered an already assembled batch (as
+                returned by `__getitems__`) and it is returned unchanged.
 
         Returns:
         ---------
@@ -726,6 +2407,10 @@ class BaseDataset(Dataset):
         .. [#] F. Kratzert, M. Gauch, G. Nearing and D. Klotz: NeuralHydrology -- A Python library for Deep Learning
             research in hydrology. Journal of Open Source Software, 7, 4050, doi: 10.21105/joss.04050, 2022
         """
+        # The batch was already assembled by `__getitems__`
+        if isinstance(samples, dict):
+            return samples
+
         batch = {}
         if not samples:
             return batch
@@ -744,6 +2429,65 @@ class BaseDataset(Dataset):
                 batch[feature] = torch.stack([sample[feature] for sample in samples], dim=0)
         return batch
 
+    @staticmethod
+    def fill_gaps(series: pd.Series, max_interpolation_gap: int = 3, max_zero_gap: int = 6) -> pd.Series:
+        """Fill the gaps (runs of consecutive missing values) of a regularly spaced time series.
+
+        - Gaps of up to max_interpolation_gap timesteps are filled by linear interpolation between the values before
+          and after the gap. As in `pd.Series.interpolate`, gaps at the end of the series take the last valid value and
+          gaps at the beginning are not filled.
+        - Gaps longer than max_interpolation_gap and up to max_zero_gap timesteps are filled with 0 if the values
+          before and after the gap are 0 (e.g. dry periods in precipitation series).
+
+        The gaps and their neighbouring values are identified with array operations, so the cost is linear in the
+        length of the series regardless of the number of gaps.
+
+        Parameters
+        ----------
+        series : pd.Series
+            Time series with missing values.
+        max_interpolation_gap : int, default=3
+            Maximum length of the gaps filled by linear interpolation.
+        max_zero_gap : int, default=6
+            Maximum length of the gaps filled with 0.
+
+        Returns
+        -------
+        pd.Series
+            Time series with the gaps filled
+
+        """
+        values = series.to_numpy(dtype=np.float64, copy=True)
+        missing = np.isnan(values)
+        if missing.all() or not missing.any():
+            return series.copy()
+
+        # Start (inclusive) and end (exclusive) of each gap
+        edges = np.diff(np.concatenate(([0], missing.astype(np.int8), [0])))
+        gap_start = np.flatnonzero(edges == 1)
+        gap_end = np.flatnonzero(edges == -1)
+        gap_length = gap_end - gap_start
+
+        # Values before and after each gap (NaN at the edges of the series)
+        before = np.where(gap_start > 0, values[np.maximum(gap_start - 1, 0)], np.nan)
+        after = np.where(gap_end < len(values), values[np.minimum(gap_end, len(values) - 1)], np.nan)
+
+        # Position of the missing values and gap to which each one belongs
+        missing_position = np.flatnonzero(missing)
+        gap_id = np.repeat(np.arange(len(gap_start)), gap_length)
+
+        # Short gaps: linear interpolation
+        interpolate_gap = (gap_length <= max_interpolation_gap) & (gap_start > 0)
+        valid_position = np.flatnonzero(~missing)
+        position = missing_position[interpolate_gap[gap_id]]
+        values[position] = np.interp(position, valid_position, values[valid_position])
+
+        # Medium gaps between zeros: fill with 0
+        zero_gap = (gap_length > max_interpolation_gap) & (gap_length <= max_zero_gap) & (before == 0) & (after == 0)
+        values[missing_position[zero_gap[gap_id]]] = 0.0
+
+        return pd.Series(values, index=series.index, name=series.name).astype(series.dtype)
+
     @staticmethod
     def flatten_dict_values(d: dict) -> list:
         """Flatten the values of a (nested) dictionary into a list."""
@@ -757,6 +2501,37 @@ class BaseDataset(Dataset):
                 flatten_v.append(v)
         return flatten_v
 
+    @staticmethod
+    def temporal_folds(time_period: list[str], n_folds: int) -> dict[str, list[str]]:
+        """Split a time period into consecutive folds of (almost) the same length, for temporal cross-validation.
+
+        Parameters
+        ----------
+        time_period : list[str]
+            Start and end date of the period, as in the configuration file (e.g. `training_period`).
+        n_folds : int
+            Number of folds.
+
+        Returns
+        -------
+        dict[str, list[str]]
+            Start and end date of each fold, indexed by the name of the fold ("fold_1", "fold_2", ...). The dates have
+            the same format as the dates of the period.
+
+        """
+        # Dates with time (e.g. "%Y-%m-%d %H:%M:%S") are split in hours, and dates without time in days
+        hourly = len(time_period[0]) > 10
+        step = pd.Timedelta(hours=1) if hourly else pd.Timedelta(days=1)
+        date_format = "%Y-%m-%d %H:%M:%S" if hourly else "%Y-%m-%d"
+
+        start, end = pd.to_datetime(time_period[0]), pd.to_datetime(time_period[1])
+        n_steps = (end - start) // step + 1
+        bounds = [start + (n_steps * i // n_folds) * step for i in range(n_folds + 1)]
+        return {
+            f"fold_{i + 1}": [bounds[i].strftime(date_format), (bounds[i + 1] - step).strftime(date_format)]
+            for i in range(n_folds)
+        }
+
     @staticmethod
     def unique_values(x: list | dict[str, list | dict[str, list]] | None) -> list[str]:
         """Retrieve unique values
@@ -778,3 +2553,46 @@ class BaseDataset(Dataset):
             return list(dict.fromkeys(BaseDataset.flatten_dict_values(x)))
         elif x is None:
             return []
+
+
+# Dataset used by the processes of the ingestion pool (see `BaseDataset._ingest_pool`). Each process creates it once,
+# when it is initialized, from the configuration file and the static attributes.
+_ingest_dataset = None
+
+
+def _init_ingest_worker(
+    dataset_class: type[BaseDataset],
+    cfg: Config,
+    time_period: list[str],
+    check_NaN: bool,
+    entities_ids: list[str],
+    df_attributes: Optional[pd.DataFrame],
+):
+    global _ingest_dataset
+    _ingest_dataset = dataset_class.__new__(dataset_class)
+    _ingest_dataset._initialize(
+        cfg=cfg, time_period=time_period, check_NaN=check_NaN, entities_ids=entities_ids, df_attributes=df_attributes
+    )
+
+
+def _map_bounded(executor: ProcessPoolExecutor, function: Callable, ids: list[str], max_pending: int) -> Iterator:
+    """Apply a function to the entities in a pool, with at most `max_pending` entities submitted at a time.
+
+    The results are returned in the order of `ids`. Unlike `executor.map`, the entities are submitted as the results are
+    consumed, so the results waiting to be merged do not accumulate in memory.
+
+    """
+    ids = iter(ids)
+    pending = deque(executor.submit(function, id) for id in islice(ids, max_pending))
+    while pending:
+        future = pending.popleft()
+        pending.extend(executor.submit(function, id) for id in islice(ids, 1))
+        yield future.result()
+
+
+def _ingest_entity(catch_id: str) -> dict[str, np.ndarray | pd.DataFrame | torch.Tensor]:
+    return _ingest_dataset._process_entity(catch_id=catch_id, check_NaN=_ingest_dataset.check_NaN)
+
+
+def _read_entity_record(catch_id: str) -> dict[str, pd.DataFrame | torch.Tensor]:
+    return _ingest_dataset._read_record(catch_id=catch_id)
@@ -0,0 +1,190 @@
+# import necessary packages
+import hashlib
+import json
+import os
+import shutil
+import uuid
+import warnings
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+class DataCache:
+    """On-disk cache for the dataframes read by the dataset classes.
+
+    Each entry is stored in its own folder in a binary columnar format: the values are saved as a column-major
+    (Fortran ordered) ``.npy`` array, the index as a separate ``.npy`` array (int64 nanoseconds for date-time indices)
+    and the column names in a small json file. Entries are memory-mapped when they are loaded, so reading a cached
+    entity takes a fraction of the time required to parse the original text files.
+
+    The key of each entry is built from the path, size and modification time of the source files, therefore a change
+    in any of the source files automatically invalidates the entry. The size of the cache folder is bounded by
+    ``max_size_gb``; when the limit is exceeded, the least recently used entries are removed.
+
+    Parameters
+    ----------
+    path : Path
+        Folder where the cache entries are stored. It is created if it does not exist.
+    max_size_gb : float
+        Maximum size of the cache folder, in gigabytes.
+
+    """
+
+    def __init__(self, path: Path, max_size_gb: float):
+        self.path = Path(path)
+        self.max_size = int(max_size_gb * 1024**3)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def load(self, key: str) -> Optional[pd.DataFrame]:
+        """Load a cache entry.
+
+        Parameters
+        ----------
+        key : str
+            Key of the entry, as returned by `make_key`.
+
+        Returns
+        -------
+        Optional[pd.DataFrame]
+            Dataframe stored in the entry, or None if the entry does not exist.
+
+        """
+        entry = self.path / key
+        if not (entry / "meta.json").is_file():
+            return None
+
+        try:
+            with open(entry / "meta.json", "r") as f:
+                meta = json.load(f)
+            values = np.load(entry / "values.npy", mmap_mode="r")
+            index = np.load(entry / "index.npy", mmap_mode="r")
+            # Mark the entry as recently used (used by the eviction policy)
+            os.utime(entry)
+        except FileNotFoundError:  # the entry was evicted in the meantime by another process
+            return None
+
+        return self._to_frame(values=values, index=index, meta=meta)
+
+    def save(self, key: str, df: pd.DataFrame, dtype: np.dtype = np.float32) -> pd.DataFrame:
+        """Store a dataframe in the cache.
+
+        Only numeric columns are stored; the other columns are dropped with a warning, since they are not available
+        when the entry is loaded. The new entry is never evicted by its own insertion, so an entry larger than
+        `max_size_gb` is kept until the next entry is stored.
+
+        Parameters
+        ----------
+        key : str
+            Key of the entry, as returned by `make_key`.
+        df : pd.DataFrame
+            Dataframe to store.
+        dtype : np.dtype, default=np.float32
+            Data type used to store the values.
+
+        Returns
+        -------
+        pd.DataFrame
+            Dataframe as it is returned by `load`, so the caller does not need to read the entry back.
+
+        """
+        numeric = df.select_dtypes(include="number")
+        if numeric.shape[1] < df.shape[1]:
+            dropped = [c for c in df.columns if c not in numeric.columns]
+            warnings.warn(
+                f"Columns {dropped} are not numeric and are not stored in the cache entry {key}", stacklevel=2
+            )
+        df = numeric
+        if isinstance(df.index, pd.DatetimeIndex):
+            index = df.index.as_unit("ns").asi8
+            index_type = "datetime"
+        else:
+            index = df.index.to_numpy(dtype=str)
+            index_type = "str"
+
+        meta = {"columns": list(df.columns), "index_name": df.index.name, "index_type": index_type}
+
+        # Write in a temporary folder and move it at the end, so other processes never see half-written entries
+        tmp_entry = self.path / f".tmp_{key}_{uuid.uuid4().hex}"
+        tmp_entry.mkdir()
+        values = np.asfortranarray(df.to_numpy(dtype=dtype, na_value=np.nan))
+        np.save(tmp_entry / "values.npy", values)
+        np.save(tmp_entry / "index.npy", index)
+        with open(tmp_entry / "meta.json", "w") as f:
+            json.dump(meta, f)
+
+        try:
+            os.rename(tmp_entry, self.path / key)
+        except OSError:  # the entry was written in the meantime by another process
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+        self._evict(keep=key)
+
+        return self._to_frame(values=values, index=index, meta=meta)
+
+    def _evict(self, keep: str) -> None:
+        """Remove the least recently used entries until the size of the cache is below the limit.
+
+        Parameters
+        ----------
+        keep : str
+            Key of the entry that was just stored, which is not removed.
+
+        """
+        entries = []
+        for entry in self.path.iterdir():
+            if entry.is_dir() and not entry.name.startswith(".tmp_"):
+                try:
+                    size = sum(f.stat().st_size for f in entry.iterdir())
+                    mtime = entry.stat().st_mtime
+                except FileNotFoundError:  # removed in the meantime by another process
+                    continue
+                entries.append((mtime, size, entry))
+
+        total_size = sum(e[1] for e in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total_size <= self.max_size:
+                break
+            if entry.name == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= size
+
+    @staticmethod
+    def _to_frame(values: np.ndarray, index: np.ndarray, meta: dict) -> pd.DataFrame:
+        """Build the dataframe of an entry from its stored values, index and metadata."""
+        if meta["index_type"] == "datetime":
+            index = pd.DatetimeIndex(index.astype("datetime64[ns]"), name=meta["index_name"])
+        else:
+            index = pd.Index(index.astype(str), name=meta["index_name"])
+
+        return pd.DataFrame(values, index=index, columns=meta["columns"], copy=False)
+
+    @staticmethod
+    def make_key(kind: str, files: list[Path], **kwargs) -> str:
+        """Build the key of a cache entry.
+
+        Parameters
+        ----------
+        kind : str
+            Type of entry (e.g. "data", "attributes").
+        files : list[Path]
+            Source files from which the entry is read. Their path, size and modification time are part of the key.
+        **kwargs
+            Additional (json serializable) information that identifies the entry, e.g. the reader and the entity id.
+
+        Returns
+        -------
+        str
+            Key of the entry.
+
+        """
+        stats = []
+        for file in sorted(Path(f).resolve() for f in files):
+            stat = file.stat()
+            stats.append([str(file), stat.st_size, stat.st_mtime_ns])
+
+        info = json.dumps({"kind": kind, "files": stats, **kwargs}, sort_keys=True, default=str)
+        return f"{kind}_{hashlib.sha1(info.encode()).hexdigest()}"
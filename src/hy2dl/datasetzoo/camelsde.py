@@ -1,4 +1,5 @@
 # import necessary packages
+from pathlib import Path
 from typing import Optional
 
 import pandas as pd
@@ -55,6 +56,33 @@ class CAMELS_DE(BaseDataset):
             entities_ids=entities_ids,
         )
 
+    def _get_attributes_files(self) -> list[Path]:
+        """Files that contain the catchments` attributes
+
+        Returns
+        -------
+        list[Path]
+            Paths of the attribute files
+
+        """
+        return sorted(self.cfg.path_data.glob("*_attributes.csv"))
+
+    def _get_data_files(self, catch_id: str) -> list[Path]:
+        """Files that contain the timeseries of a specific catchment
+
+        Parameters
+        ----------
+        catch_id : str
+            identifier of the basin.
+
+        Returns
+        -------
+        list[Path]
+            Paths of the timeseries files
+
+        """
+        return [self.cfg.path_data / "timeseries" / f"CAMELS_DE_hydromet_timeseries_{catch_id}.csv"]
+
     def _read_attributes(self) -> pd.DataFrame:
         """Read the catchments` attributes
 
@@ -65,8 +93,7 @@ class CAMELS_DE(BaseDataset):
 
         """
         # files that contain the attributes
-        path_attributes = self.cfg.path_data
-        read_files = list(path_attributes.glob("*_attributes.csv"))
+        read_files = self._get_attributes_files()
 
         dfs = []
         # Read each CSV file into a DataFrame and store it in list
@@ -82,18 +109,27 @@ class CAMELS_DE(BaseDataset):
             if df_attributes[column].dtype not in ["float64", "int64"]:
                 df_attributes[column], _ = pd.factorize(df_attributes[column], sort=True)
 
-        # Filter attributes and basins of interest
-        df_attributes = df_attributes.loc[self.entities_ids, self.cfg.static_input]
-
         return df_attributes
 
-    def _read_data(self, catch_id: str) -> pd.DataFrame:
+    def _read_data(
+        self,
+        catch_id: str,
+        columns: Optional[list[str]] = None,
+        period: Optional[tuple[pd.Timestamp, pd.Timestamp]] = None,
+        n_warmup: int = 0,
+    ) -> pd.DataFrame:
         """Read the catchments` timeseries
 
         Parameters
         ----------
         catch_id : str
             identifier of the basin.
+        columns : Optional[list[str]], default=None
+            Columns that are used. By default, all the columns.
+        period : Optional[tuple[pd.Timestamp, pd.Timestamp]], default=None
+            Start and end of the time period that is used. By default, the whole time series.
+        n_warmup : int, default=0
+            Number of rows before the start of the period that are used.
 
         Returns
         -------
@@ -101,7 +137,7 @@ class CAMELS_DE(BaseDataset):
             Dataframe with the catchments` timeseries
 
         """
-        path_timeseries = self.cfg.path_data / "timeseries" / f"CAMELS_DE_hydromet_timeseries_{catch_id}.csv"
+        path_timeseries = self._get_data_files(catch_id=catch_id)[0]
         # load time series
-        df = pd.read_csv(path_timeseries, index_col="date", parse_dates=["date"])
+        df = self._read_csv(path=path_timeseries, columns=columns, period=period, n_warmup=n_warmup)
         return df
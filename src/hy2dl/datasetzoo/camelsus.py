@@ -1,4 +1,5 @@
 # import necessary packages
+from pathlib import Path
 from typing import Optional, Tuple
 
 import numpy as np
@@ -44,6 +45,10 @@ class CAMELS_US(BaseDataset):
 
     """
 
+    # Index of the forcing and discharge files of each directory tree, shared by all the instances in this process
+    # (see `_get_file_index`). The directory trees are then scanned once, instead of once per basin.
+    _file_index = {}
+
     def __init__(
         self,
         cfg: Config,
@@ -59,6 +64,129 @@ class CAMELS_US(BaseDataset):
             entities_ids=entities_ids,
         )
 
+    def _get_attributes_files(self) -> list[Path]:
+        """Files that contain the catchments` attributes
+
+        Returns
+        -------
+        list[Path]
+            Paths of the attribute files
+
+        """
+        return sorted((self.cfg.path_data / "camels_attributes_v2.0").glob("camels_*.txt"))
+
+    def _get_data_files(self, catch_id: str) -> list[Path]:
+        """Files that contain the timeseries of a specific catchment
+
+        Parameters
+        ----------
+        catch_id : str
+            8-digit USGS identifier of the basin.
+
+        Returns
+        -------
+        list[Path]
+            Paths of the forcing and discharge files
+
+        """
+        files = [self._get_forcing_file(catch_id=catch_id, forcing=forcing) for forcing in self.cfg.forcings]
+        files.append(self._get_discharge_file(catch_id=catch_id))
+        return files
+
+    def _get_forcing_file(self, catch_id: str, forcing: str) -> Path:
+        """Path of the forcing file of a specific catchment
+
+        Parameters
+        ----------
+        catch_id : str
+            8-digit USGS identifier of the basin.
+        forcing : str
+            Can be e.g. 'daymet' or 'nldas', etc. Must match the folder names in the 'basin_mean_forcing' directory.
+
+        Returns
+        -------
+        Path
+            Path of the forcing file
+
+        """
+        forcing_path = self.cfg.path_data / "basin_mean_forcing" / forcing
+        file_index = CAMELS_US._get_file_index(path=forcing_path, pattern="*_*_forcing_leap.txt")
+        if catch_id not in file_index:
+            raise FileNotFoundError(f"No forcing file found for basin {catch_id} in {forcing_path}")
+        return file_index[catch_id]
+
+    def _get_discharge_file(self, catch_id: str) -> Path:
+        """Path of the discharge file of a specific catchment
+
+        Parameters
+        ----------
+        catch_id : str
+            8-digit USGS identifier of the basin.
+
+        Returns
+        -------
+        Path
+            Path of the discharge file
+
+        """
+        streamflow_path = self.cfg.path_data / "usgs_streamflow"
+        file_index = CAMELS_US._get_file_index(path=streamflow_path, pattern="*_streamflow_qc.txt")
+        if catch_id not in file_index:
+            raise FileNotFoundError(f"No discharge file found for basin {catch_id} in {streamflow_path}")
+        return file_index[catch_id]
+
+    @staticmethod
+    def _get_file_index(path: Path, pattern: str) -> dict[str, Path]:
+        """Index, by basin, of the files in a directory tree.
+
+        The directory tree is scanned once per process, and the index is reused by all the basins and instances. The
+        identifier of the basin is the part of the file name before the first "_".
+
+        Parameters
+        ----------
+        path : Path
+            Root of the directory tree.
+        pattern : str
+            Pattern of the file names (e.g. "*_streamflow_qc.txt").
+
+        Returns
+        -------
+        dict[str, Path]
+            Path of the file of each basin
+
+        """
+        key = (str(path), pattern)
+        if key not in CAMELS_US._file_index:
+            file_index = {}
+            for file in path.glob(f"**/{pattern}"):
+                file_index.setdefault(file.name.split("_")[0], file)
+            CAMELS_US._file_index[key] = file_index
+
+        return CAMELS_US._file_index[key]
+
+    @staticmethod
+    def clear_file_index():
+        """Remove the file indexes kept in memory by `_get_file_index`, so the directory trees are scanned again."""
+        CAMELS_US._file_index.clear()
+
+    @staticmethod
+    def _set_date_index(df: pd.DataFrame) -> pd.DataFrame:
+        """Index the rows of a CAMELS-US file by date, assembled from the "Year", "Mnth" and "Day" columns.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Dataframe read from a forcing or discharge file.
+
+        Returns
+        -------
+        pd.DataFrame
+            Date-indexed dataframe
+
+        """
+        df["date"] = pd.to_datetime(pd.DataFrame({"year": df["Year"], "month": df["Mnth"], "day": df["Day"]}))
+        return df.set_index("date")
+
     def _read_attributes(self) -> pd.DataFrame:
         """Read the catchments` attributes
 
@@ -69,8 +197,7 @@ class CAMELS_US(BaseDataset):
 
         """
         # files that contain the attributes
-        path_attributes = self.cfg.path_data / "camels_attributes_v2.0"
-        read_files = list(path_attributes.glob("camels_*.txt"))
+        read_files = self._get_attributes_files()
 
         # Read one by one the attributes files
         dfs = []
@@ -89,18 +216,27 @@ class CAMELS_US(BaseDataset):
             if df[column].dtype not in ["float64", "int64"]:
                 df[column], _ = pd.factorize(df[column], sort=True)
 
-        # Filter attributes and basins of interest
-        df = df.loc[self.entities_ids, self.cfg.static_input]
-
         return df
 
-    def _read_data(self, catch_id: str) -> pd.DataFrame:
+    def _read_data(
+        self,
+        catch_id: str,
+        columns: Optional[list[str]] = None,
+        period: Optional[tuple[pd.Timestamp, pd.Timestamp]] = None,
+        n_warmup: int = 0,
+    ) -> pd.DataFrame:
         """Read a specific catchment timeseries into a dataframe.
 
         Parameters
         ----------
         catch_id : str
             8-digit USGS identifier of the basin.
+        columns : Optional[list[str]], default=None
+            Columns that are used. By default, all the columns.
+        period : Optional[tuple[pd.Timestamp, pd.Timestamp]], default=None
+            Start and end of the time period that is used. By default, the whole time series.
+        n_warmup : int, default=0
+            Number of rows before the start of the period that are used.
 
         Returns
         -------
@@ -111,7 +247,13 @@ class CAMELS_US(BaseDataset):
         # Read forcings
         dfs = []
         for forcing in self.cfg.forcings:  # forcings can be daymet, maurer or nldas
-            df, area = self._load_camelsus_data(catch_id=catch_id, forcing=forcing)
+            df, area = self._load_camelsus_data(
+                catch_id=catch_id,
+                forcing=forcing,
+                columns=self._get_forcing_columns(columns=columns, forcing=forcing),
+                period=period,
+                n_warmup=n_warmup,
+            )
             # rename columns in case there are multiple forcings
             if len(self.cfg.forcings) > 1:
                 df = df.rename(columns={col: f"{col}_{forcing}" for col in df.columns})
@@ -121,14 +263,45 @@ class CAMELS_US(BaseDataset):
         df = pd.concat(dfs, axis=1)  # dataframe with all the dynamic forcings
 
         # Read discharges and add them to current dataframe
-        df["QObs(mm/d)"] = self._load_camelsus_discharge(catch_id=catch_id, area=area)
+        df["QObs(mm/d)"] = self._load_camelsus_discharge(catch_id=catch_id, area=area, period=period, n_warmup=n_warmup)
 
         # replace invalid discharge values by NaNs
-        df["QObs(mm/d)"] = df["QObs(mm/d)"].apply(lambda x: np.nan if x < 0 else x)
+        df["QObs(mm/d)"] = df["QObs(mm/d)"].mask(df["QObs(mm/d)"] < 0)
 
         return df
 
-    def _load_camelsus_data(self, catch_id: str, forcing: str) -> Tuple[pd.DataFrame, int]:
+    def _get_forcing_columns(self, columns: Optional[list[str]], forcing: str) -> Optional[list[str]]:
+        """Columns of the file of a specific forcing that are used.
+
+        If multiple forcings are used, the name of the columns in the dataframe contains the name of the forcing as a
+        suffix (e.g. "prcp(mm/day)_daymet"), which is removed.
+
+        Parameters
+        ----------
+        columns : Optional[list[str]]
+            Columns that are used (None if all the columns are used).
+        forcing : str
+            Name of the forcing (e.g. 'daymet').
+
+        Returns
+        -------
+        Optional[list[str]]
+            Columns of the forcing file that are used (None if all the columns are used)
+
+        """
+        if columns is None or len(self.cfg.forcings) == 1:
+            return columns
+        suffix = f"_{forcing}"
+        return [c[: -len(suffix)] for c in columns if c.endswith(suffix)]
+
+    def _load_camelsus_data(
+        self,
+        catch_id: str,
+        forcing: str,
+        columns: Optional[list[str]] = None,
+        period: Optional[tuple[pd.Timestamp, pd.Timestamp]] = None,
+        n_warmup: int = 0,
+    ) -> Tuple[pd.DataFrame, int]:
         """Read a specific catchment forcing timeseries
 
         Parameters
@@ -137,6 +310,12 @@ class CAMELS_US(BaseDataset):
             8-digit USGS identifier of the basin.
         forcing : str
             Can be e.g. 'daymet' or 'nldas', etc. Must match the folder names in the 'basin_mean_forcing' directory.
+        columns : Optional[list[str]], default=None
+            Columns that are used. By default, all the columns.
+        period : Optional[tuple[pd.Timestamp, pd.Timestamp]], default=None
+            Start and end of the time period that is used. By default, the whole time series.
+        n_warmup : int, default=0
+            Number of rows before the start of the period that are used.
 
         Returns
         -------
@@ -146,10 +325,16 @@ class CAMELS_US(BaseDataset):
             Catchment area (m2), specified in the header of the forcing file.
 
         """
+        # Columns to parse (the date is assembled from the "Year", "Mnth" and "Day" columns)
+        kwargs = {}
+        if columns is not None:
+            columns_of_interest = set(columns + ["Year", "Mnth", "Day"])
+            kwargs["usecols"] = lambda c: c in columns_of_interest
+            if self.cfg.read_float32:
+                kwargs["dtype"] = {c: np.float32 for c in columns}
+
         # Create a path to read the data
-        forcing_path = self.cfg.path_data / "basin_mean_forcing" / forcing
-        file_path = list(forcing_path.glob(f"**/{catch_id}_*_forcing_leap.txt"))
-        file_path = file_path[0]
+        file_path = self._get_forcing_file(catch_id=catch_id, forcing=forcing)
         # Read dataframe
         with open(file_path, "r") as fp:
             # load area from header
@@ -157,17 +342,23 @@ class CAMELS_US(BaseDataset):
             fp.readline()
             area = int(fp.readline())
             # load the dataframe from the rest of the stream
-            df = pd.read_csv(fp, sep=r"\s+")
-            df["date"] = pd.to_datetime(
-                df.Year.map(str) + "/" + df.Mnth.map(str) + "/" + df.Day.map(str),
-                format="%Y/%m/%d",
-            )
-
-            df = df.set_index("date")
+            if period is None:
+                df = CAMELS_US._set_date_index(pd.read_csv(fp, sep=r"\s+", **kwargs))
+            else:
+                with pd.read_csv(fp, sep=r"\s+", chunksize=BaseDataset._csv_chunk_size, **kwargs) as chunks:
+                    df = BaseDataset._select_period(
+                        chunks=(CAMELS_US._set_date_index(chunk) for chunk in chunks), period=period, n_warmup=n_warmup
+                    )
 
         return df, area
 
-    def _load_camelsus_discharge(self, catch_id: str, area: int) -> pd.DataFrame:
+    def _load_camelsus_discharge(
+        self,
+        catch_id: str,
+        area: int,
+        period: Optional[tuple[pd.Timestamp, pd.Timestamp]] = None,
+        n_warmup: int = 0,
+    ) -> pd.DataFrame:
         """Read a specific catchment discharge timeseries
 
         Parameters
@@ -176,6 +367,10 @@ class CAMELS_US(BaseDataset):
             8-digit USGS identifier of the basin.
         area : int
             Catchment area (m2), used to normalize the discharge.
+        period : Optional[tuple[pd.Timestamp, pd.Timestamp]], default=None
+            Start and end of the time period that is used. By default, the whole time series.
+        n_warmup : int, default=0
+            Number of rows before the start of the period that are used.
 
         Returns
         -------
@@ -184,17 +379,23 @@ class CAMELS_US(BaseDataset):
 
         """
         # Create a path to read the data
-        streamflow_path = self.cfg.path_data / "usgs_streamflow"
-        file_path = list(streamflow_path.glob(f"**/{catch_id}_streamflow_qc.txt"))
-        file_path = file_path[0]
+        file_path = self._get_discharge_file(catch_id=catch_id)
 
         col_names = ["basin", "Year", "Mnth", "Day", "QObs", "flag"]
-        df = pd.read_csv(file_path, sep=r"\s+", header=None, names=col_names)
-        df["date"] = pd.to_datetime(
-            df.Year.map(str) + "/" + df.Mnth.map(str) + "/" + df.Day.map(str),
-            format="%Y/%m/%d",
-        )
-        df = df.set_index("date")
+        kwargs = {"dtype": {"QObs": np.float32}} if self.cfg.read_float32 else {}
+        read_csv_kwargs = {
+            "sep": r"\s+",
+            "header": None,
+            "names": col_names,
+            "usecols": ["Year", "Mnth", "Day", "QObs"],
+        }
+        if period is None:
+            df = CAMELS_US._set_date_index(pd.read_csv(file_path, **read_csv_kwargs, **kwargs))
+        else:
+            with pd.read_csv(file_path, chunksize=BaseDataset._csv_chunk_size, **read_csv_kwargs, **kwargs) as chunks:
+                df = BaseDataset._select_period(
+                    chunks=(CAMELS_US._set_date_index(chunk) for chunk in chunks), period=period, n_warmup=n_warmup
+                )
 
         # normalize discharge from cubic feet per second to mm per day
         df.QObs = 28316846.592 * df.QObs * 86400 / (area * 10**6)
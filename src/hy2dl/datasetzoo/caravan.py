@@ -1,6 +1,12 @@
 # import necessary packages
+import os
+from pathlib import Path
 from typing import Optional
+
+import numpy as np
 import pandas as pd
+import xarray as xr
+
 from hy2dl.datasetzoo.basedataset import BaseDataset
 from hy2dl.utils.config import Config
 
@@ -12,6 +18,10 @@ class CARAVAN(BaseDataset):
     code the _read_attributes and _read_data methods, that specify how we should read the information from Caravan.
     The code would also run with user created datasets which conform to the Caravan style convention.
 
+    By default, the time series are read from the csv files. If `timeseries_format` is "netcdf", they are read lazily
+    from the netCDF files (or from a single netCDF/Zarr file with all the basins, given by `path_timeseries`), which
+    avoids parsing text files: only the variables and the time period of interest are read, as float32 values.
+
     This class and its methods were adapted from Neural Hydrology [2]_.
 
     Parameters
@@ -35,6 +45,10 @@ class CARAVAN(BaseDataset):
 
     """
 
+    # Lazy handles of the netCDF/Zarr time series opened in this process, shared by all the instances (see
+    # `_open_timeseries`). Each file is then opened once, and only the data that is used is read from it.
+    _timeseries_handles = {}
+
     def __init__(
         self,
         cfg: Config,
@@ -50,6 +64,40 @@ class CARAVAN(BaseDataset):
             entities_ids=entities_ids,
         )
 
+    def _get_attributes_files(self) -> list[Path]:
+        """Files that contain the catchments` attributes, for all the sub-datasets of Caravan
+
+        Returns
+        -------
+        list[Path]
+            Paths of the attribute files
+
+        """
+        return sorted((self.cfg.path_data / "attributes").glob("*/*.csv"))
+
+    def _get_data_files(self, catch_id: str) -> list[Path]:
+        """Files that contain the timeseries of a specific catchment
+
+        Parameters
+        ----------
+        catch_id : str
+            The Caravan gauge id string in the form of {subdataset_name}_{gauge_id}.
+
+        Returns
+        -------
+        list[Path]
+            Paths of the timeseries files
+
+        """
+        if self.cfg.timeseries_format == "netcdf":
+            if self.cfg.path_timeseries:
+                return [self.cfg.path_timeseries]
+            subdataset_name = catch_id.split("_")[0].lower()
+            return [self.cfg.path_data / "timeseries" / "netcdf" / subdataset_name / f"{catch_id}.nc"]
+
+        subdataset_name = catch_id.split("_")[0].lower()
+        return [self.cfg.path_data / "timeseries" / "csv" / subdataset_name / f"{catch_id}.csv"]
+
     def _read_attributes(self) -> pd.DataFrame:
         """Read the catchments` attributes from Caravan
 
@@ -86,12 +134,15 @@ class CARAVAN(BaseDataset):
             if df_attributes[column].dtype not in ["float64", "int64"]:
                 df_attributes[column], _ = pd.factorize(df_attributes[column], sort=True)
 
-        # Filter attributes and basins of interest
-        df_attributes = df_attributes.loc[self.entities_ids, self.cfg.static_input]
-
         return df_attributes
 
-    def _read_data(self, catch_id: str) -> pd.DataFrame:
+    def _read_data(
+        self,
+        catch_id: str,
+        columns: Optional[list[str]] = None,
+        period: Optional[tuple[pd.Timestamp, pd.Timestamp]] = None,
+        n_warmup: int = 0,
+    ) -> pd.DataFrame:
         """Loads the timeseries data of one basin from the Caravan dataset.
 
         Parameters
@@ -101,18 +152,104 @@ class CARAVAN(BaseDataset):
             sub-directory has to contain another sub-directory called 'csv'.
         basin : str
             The Caravan gauge id string in the form of {subdataset_name}_{gauge_id}.
+        columns : Optional[list[str]], default=None
+            Columns that are used. By default, all the columns.
+        period : Optional[tuple[pd.Timestamp, pd.Timestamp]], default=None
+            Start and end of the time period that is used. By default, the whole time series.
+        n_warmup : int, default=0
+            Number of rows before the start of the period that are used.
 
         Returns
         -------
         df: pd.DataFrame
             Dataframe with the catchments` timeseries
         """
+        if self.cfg.timeseries_format == "netcdf":
+            return self._read_netcdf(catch_id=catch_id, columns=columns, period=period, n_warmup=n_warmup)
+        elif self.cfg.timeseries_format != "csv":
+            raise ValueError(f"`timeseries_format` must be 'csv' or 'netcdf', but got '{self.cfg.timeseries_format}'.")
+
         data_dir = self.cfg.path_data
         basin = catch_id
 
         # Get the subdataset name from the basin string.
         subdataset_name = basin.split("_")[0].lower()
         filepath = data_dir / "timeseries" / "csv" / subdataset_name / f"{basin}.csv"
-        df = pd.read_csv(filepath, index_col="date", parse_dates=["date"])
+        df = self._read_csv(path=filepath, columns=columns, period=period, n_warmup=n_warmup)
 
         return df
+
+    def _open_timeseries(self, catch_id: str) -> xr.Dataset:
+        """Lazy handle of the netCDF/Zarr time series of a specific catchment.
+
+        The files are opened once per process and kept in `_timeseries_handles`, so the following calls (e.g. from
+        other periods) do not open them again. Opening a file only reads its metadata.
+
+        Parameters
+        ----------
+        catch_id : str
+            The Caravan gauge id string in the form of {subdataset_name}_{gauge_id}.
+
+        Returns
+        -------
+        xr.Dataset
+            Dataset with the time series of the catchment, indexed by "date"
+
+        """
+        path = self._get_data_files(catch_id=catch_id)[0]
+        key = (os.getpid(), str(path))  # the handles are not shared with other processes
+        if key not in CARAVAN._timeseries_handles:
+            CARAVAN._timeseries_handles[key] = (
+                xr.open_zarr(path, chunks=None) if path.suffix == ".zarr" else xr.open_dataset(path)
+            )
+
+        ds = CARAVAN._timeseries_handles[key]
+        # Files with all the basins have a "gauge_id" dimension
+        return ds.sel(gauge_id=catch_id) if "gauge_id" in ds.dims else ds
+
+    @staticmethod
+    def close_timeseries():
+        """Close the netCDF/Zarr time series opened by `_open_timeseries`."""
+        for ds in CARAVAN._timeseries_handles.values():
+            ds.close()
+        CARAVAN._timeseries_handles.clear()
+
+    def _read_netcdf(
+        self,
+        catch_id: str,
+        columns: Optional[list[str]] = None,
+        period: Optional[tuple[pd.Timestamp, pd.Timestamp]] = None,
+        n_warmup: int = 0,
+    ) -> pd.DataFrame:
+        """Loads the timeseries data of one basin from the netCDF/Zarr files of the Caravan dataset.
+
+        Only the variables and the time steps of interest are read from the files.
+
+        Parameters
+        ----------
+        catch_id : str
+            The Caravan gauge id string in the form of {subdataset_name}_{gauge_id}.
+        columns : Optional[list[str]], default=None
+            Variables that are used. By default, all the variables.
+        period : Optional[tuple[pd.Timestamp, pd.Timestamp]], default=None
+            Start and end of the time period that is used. By default, the whole time series.
+        n_warmup : int, default=0
+            Number of timesteps before the start of the period that are used.
+
+        Returns
+        -------
+        df: pd.DataFrame
+            Dataframe with the catchments` timeseries (float32 values)
+        """
+        ds = self._open_timeseries(catch_id=catch_id)
+        variables = [v for v in ds.data_vars if columns is None or v in set(columns)]
+
+        dates = ds.indexes["date"]
+        time = self._period_slice(dates=dates, period=period, n_warmup=n_warmup)
+        ds = ds[variables].isel(date=time)
+
+        values = np.empty((len(dates[time]), len(variables)), dtype=np.float32)
+        for i, v in enumerate(variables):
+            values[:, i] = ds[v].values
+
+        return pd.DataFrame(values, index=pd.DatetimeIndex(dates[time], name="date"), columns=variables)
@@ -0,0 +1,566 @@
+# import necessary packages
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import torch
+import xarray as xr
+from tqdm import tqdm
+
+from hy2dl.datasetzoo.basedataset import BaseDataset
+from hy2dl.datasetzoo.statistics import RunningStatistics
+from hy2dl.utils.config import Config
+
+
+class ConsolidatedStore(BaseDataset):
+    """Class to process data from a consolidated (out-of-core) store.
+
+    The store is a single Zarr (or netCDF) file, created with `write_consolidated_store`, that contains the time series
+    of all the entities in a [basin, time, variable] array chunked by basin and time, and the attributes in a
+    [basin, attribute] array. In contrast to the other datasets, the time series are not kept in memory. When the
+    dataset is created, the entities are read one by one to find the valid samples and accumulate the statistics of
+    the data, and only the index of the valid samples, the attributes and the scaler are kept. The sequences of each
+    sample are then read lazily from the store in `__getitem__`, so the datasets can be larger than the RAM.
+
+    The path of the store is given by `path_data`. The standardization is applied when the samples are read.
+    Additional features (`path_additional_features`) are not supported.
+
+    Parameters
+    ----------
+    cfg : Config
+        Configuration file.
+    time_period : {'training', 'validation', 'testing'}
+        Defines the period for which the data will be loaded.
+    check_NaN : Optional[bool], default=True
+        Whether to check for NaN values while processing the data. This should typically be True during training,
+        and can be set to False during evaluation (validation/testing).
+    entity : Optional[str], default=None
+        ID of the entity (e.g., single catchment's ID) to be analyzed
+
+    """
+
+    # The windows of the samples are read from the store, so the lagged features are added to each window (see
+    # `_read_window`) instead of being resolved from the columns kept in memory
+    _virtual_lagged_features = False
+
+    def __init__(
+        self,
+        cfg: Config,
+        time_period: str,
+        check_NaN: Optional[bool] = True,
+        entities_ids: Optional[str | list[str]] = None,
+    ):
+        if cfg.path_additional_features:
+            raise NotImplementedError("`path_additional_features` is not supported by the consolidated store.")
+        if cfg.contiguous_storage:
+            raise NotImplementedError("`contiguous_storage` is not supported by the consolidated store.")
+
+        # Run the __init__ method of BaseDataset class, where the data is processed
+        super(ConsolidatedStore, self).__init__(
+            cfg=cfg,
+            time_period=time_period,
+            check_NaN=check_NaN,
+            entities_ids=entities_ids,
+        )
+
+        # Variables read from the store (before adding lagged features)
+        self.window_variables = [v for v in self.store_variables if v in set(self.read_columns)]
+
+        self._standardize_input = False
+        self._standardize_output = False
+
+    def _initialize(
+        self,
+        cfg: Config,
+        time_period: list[str],
+        check_NaN: bool,
+        entities_ids: list[str],
+        df_attributes: Optional[pd.DataFrame] = None,
+    ):
+        # Handle of the store (opened once per process, see `_open_store`)
+        self._store = None
+        self._store_pid = None
+
+        # Information kept for each entity instead of the time series
+        self._statistics = None  # statistics of the data, accumulated entity by entity
+        self._basin_std = {}  # std of the target variable of each basin
+        self.time_offset = {}  # position, in the time axis of the store, of the first timestep of each entity
+        self.start_date = {}  # first date of each entity (including the warmup period)
+
+        self.cfg = cfg
+        store = self._open_store()
+        self.store_basins = {basin: i for i, basin in enumerate(store["basin"].values.astype(str))}
+        self.store_variables = list(store["variable"].values.astype(str))
+        self.store_time = pd.DatetimeIndex(store["time"].values)
+
+        super()._initialize(
+            cfg=cfg,
+            time_period=time_period,
+            check_NaN=check_NaN,
+            entities_ids=entities_ids,
+            df_attributes=df_attributes,
+        )
+
+    def __getitem__(self, id) -> dict[str, torch.Tensor | np.ndarray | dict[str, torch.Tensor]]:
+        """Function used to construct the elements of the batches, reading the sequences from the store"""
+        basin = self.entity_table[self.valid_entities_basin[id]]
+        i = int(self.valid_entities_time[id])
+        seq_length = self.cfg.seq_length_hindcast + self.cfg.seq_length_forecast
+
+        # Read the window of the sample. Rows 0 to seq_length_hindcast - 1 are the hindcast period, and the following
+        # seq_length_forecast rows are the forecast period.
+        df = self._read_window(
+            basin=basin, start=i - self.cfg.seq_length_hindcast + 1, end=i + 1 + self.cfg.seq_length_forecast
+        )
+        dates = pd.date_range(
+            start=self.start_date[basin]
+            + (i - self.cfg.seq_length_hindcast + 1) * pd.tseries.frequencies.to_offset(self.freq),
+            periods=seq_length,
+            freq=self.freq,
+        )
+
+        sample = {}
+        # --------------------------
+        # Input in hindcast period
+        # --------------------------
+        x_d = self._to_tensor_dict(df.iloc[: self.cfg.seq_length_hindcast], self.unique_dynamic_input, "x_d")
+        # If we do not have custom processing (process the whole sequence length the same way)
+        if self.cfg.custom_seq_processing is None:
+            sample["x_d"] = x_d
+
+        # If we have custom processing along the hindcast sequence length (e.g. multiple temporal frequencies)
+        else:
+            current_index = 0  # index to keep track of the current position in the x_d tensor
+            for subset_name, subset_info in self.cfg.custom_seq_processing.items():
+                subset_length = subset_info["n_steps"] * subset_info["freq_factor"]
+                sample["x_d_" + subset_name] = {
+                    k: x_d[k][current_index : current_index + subset_length]
+                    .reshape(subset_info["n_steps"], subset_info["freq_factor"])
+                    .mean(dim=1)
+                    for k in self._variables_of_interest(subset_name)
+                }
+                current_index += subset_length
+        # --------------------------
+        # Input in forecast period
+        # --------------------------
+        if self.cfg.forecast_input:
+            sample["x_d_fc"] = self._to_tensor_dict(
+                df.iloc[self.cfg.seq_length_hindcast :], self.unique_forecast_input, "x_fc"
+            )
+
+            # Forecast metadata
+            sample["date_issue_fc"] = dates[self.cfg.seq_length_hindcast - 1].to_numpy()
+            sample["persistent_q"] = self._target_tensor(df.iloc[[self.cfg.seq_length_hindcast - 1]])[0, :]
+        # --------------------------
+        # Information about the static input
+        # --------------------------
+        if self.cfg.static_input:
+            sample["x_s"] = self.x_s[basin]
+        # --------------------------
+        # Information about target variable
+        # --------------------------
+        sample["y_obs"] = self._target_tensor(df.iloc[seq_length - self.cfg.predict_last_n :])
+        # --------------------------
+        # Information about the conceptual (hybrid model)
+        # --------------------------
+        if self.cfg.dynamic_input_conceptual_model:
+            df_hindcast = df.iloc[: self.cfg.seq_length_hindcast]
+            sample["x_d_conceptual"] = {}
+            for k, v in self.cfg.dynamic_input_conceptual_model.items():
+                col = [v] if isinstance(v, str) else v
+                sample["x_d_conceptual"][k] = torch.tensor(
+                    df_hindcast[col].mean(axis=1, skipna=True).values, dtype=torch.float32
+                )
+        # --------------------------
+        # Additional data
+        # --------------------------
+        if self.basin_std:
+            sample["std_basin"] = self.basin_std[basin].repeat(sample["y_obs"].size(0)).unsqueeze(1)
+        sample["basin"] = np.array(basin, dtype=np.str_)
+        sample["date"] = dates[seq_length - self.cfg.predict_last_n :].to_numpy()
+
+        return sample
+
+    def __getstate__(self) -> dict:
+        # The handle of the store is not shared with other processes (e.g. workers of the dataloader)
+        state = super().__getstate__()
+        state["_store"] = None
+        state["_store_pid"] = None
+        return state
+
+    def calculate_basin_std(self):
+        """Fill the self.basin_std dictionary with the standard deviation of the target variables for each basin.
+
+        The standard deviations are calculated when the entities are processed.
+
+        """
+        self.basin_std = dict(self._basin_std)
+
+    @classmethod
+    def from_periods(
+        cls,
+        cfg: Config,
+        time_periods: list[str] | dict[str, list[str]] = ("training", "validation", "testing"),
+        check_NaN: bool | dict[str, bool] = True,
+        entities_ids: Optional[str | list[str]] = None,
+    ) -> dict[str, BaseDataset]:
+        """Create the datasets of multiple periods.
+
+        The time series are read lazily from the store, so the dataset of each period is created independently (only
+        the periods defined in the configuration file are supported).
+
+        Parameters
+        ----------
+        cfg : Config
+            Configuration file.
+        time_periods : list[str], default=('training', 'validation', 'testing')
+            Name of the periods.
+        check_NaN : bool | dict[str, bool], default=True
+            Whether to check for NaN values while processing the data. It can be defined for each period.
+        entities_ids : Optional[str | list[str]], default=None
+            ID of the entities, for all the periods. By default, the entities of each period defined in the
+            configuration file.
+
+        Returns
+        -------
+        dict[str, BaseDataset]
+            Dataset of each period
+
+        """
+        if isinstance(time_periods, dict):
+            raise NotImplementedError("Periods defined by their dates are not supported by the consolidated store.")
+        if not isinstance(check_NaN, dict):
+            check_NaN = dict.fromkeys(time_periods, check_NaN)
+
+        return {
+            name: cls(cfg=cfg, time_period=name, check_NaN=check_NaN[name], entities_ids=entities_ids)
+            for name in time_periods
+        }
+
+    def standardize_data(self, standardize_output: bool = True):
+        """Standardize data.
+
+        The time series are standardized when the samples are read from the store. The static attributes, which are
+        kept in memory, are standardized directly.
+
+        Parameters
+        ----------
+        standardize_output : bool
+            Boolean to define if the output should be standardize or not.
+
+        """
+        self._standardize_input = True
+        self._standardize_output = standardize_output
+        if self.cfg.static_input:
+            for basin in self.x_s:
+                self.x_s[basin] = (self.x_s[basin] - self.scaler["x_s_mean"]) / self.scaler["x_s_std"]
+
+    def _open_store(self) -> xr.Dataset:
+        """Open the store lazily (once per process).
+
+        Returns
+        -------
+        xr.Dataset
+            Dataset whose variables are read from disk only when they are indexed
+
+        """
+        if self._store is None or self._store_pid != os.getpid():
+            path = Path(self.cfg.path_data)
+            self._store = xr.open_dataset(path) if path.suffix == ".nc" else xr.open_zarr(path, chunks=None)
+            self._store_pid = os.getpid()
+        return self._store
+
+    def _process_entity(self, catch_id: str, check_NaN: bool) -> dict[str, np.ndarray | pd.DataFrame | torch.Tensor]:
+        """Find the valid samples of a specific entity and accumulate the statistics of its data.
+
+        The entity is processed as in BaseDataset, but only the index of the valid samples, the statistics of the data
+        and the first date of the time series are returned.
+
+        Parameters
+        ----------
+        catch_id : str
+            identifier of the basin.
+        check_NaN : bool
+            Boolean to specify if Nan should be checked or not
+
+        Returns
+        -------
+        entity_data : dict[str, np.ndarray | pd.DataFrame | torch.Tensor]
+            Dictionary with the index of the valid samples ("valid_samples") and, if there is at least one valid sample,
+            the statistics ("statistics"), the std of the target variables ("basin_std"), the static input ("x_s") and
+            the first date of the time series ("start_date").
+
+        """
+        entity_data = super()._process_entity(catch_id=catch_id, check_NaN=check_NaN)
+        if entity_data["valid_samples"].size == 0:
+            return entity_data
+
+        df_ts = entity_data["df_ts"]
+        statistics = {
+            "x_d": RunningStatistics(n_features=len(self.unique_dynamic_input)),
+            "y": RunningStatistics(n_features=len(self.cfg.target)),
+            "x_fc": RunningStatistics(n_features=len(self.unique_forecast_input)),
+        }
+        statistics["x_d"].update(df_ts[self.unique_dynamic_input].values)
+        statistics["y"].update(df_ts[self.cfg.target].values)
+        if self.cfg.forecast_input:
+            statistics["x_fc"].update(df_ts[self.unique_forecast_input].values)
+
+        return {
+            "valid_samples": entity_data["valid_samples"],
+            "statistics": statistics,
+            "basin_std": torch.tensor(np.nanstd(entity_data["y_obs"].numpy()), dtype=torch.float32),
+            "x_s": entity_data.get("x_s"),
+            "start_date": df_ts.index[0],
+            "freq": pd.infer_freq(df_ts.index),
+        }
+
+    def _read_attributes(self) -> pd.DataFrame:
+        """Read the catchments` attributes from the store
+
+        Returns
+        -------
+        df : pd.DataFrame
+            Dataframe with the catchments` attributes
+
+        """
+        store = self._open_store()
+        if "attributes" not in store:
+            raise ValueError("The consolidated store does not contain attributes.")
+
+        return pd.DataFrame(
+            store["attributes"].values,
+            index=pd.Index(store["basin"].values.astype(str), name="gauge_id"),
+            columns=store["attribute"].values.astype(str),
+        )
+
+    def _read_data(
+        self,
+        catch_id: str,
+        columns: Optional[list[str]] = None,
+        period: Optional[tuple[pd.Timestamp, pd.Timestamp]] = None,
+        n_warmup: int = 0,
+    ) -> pd.DataFrame:
+        """Read the catchments` timeseries from the store
+
+        Parameters
+        ----------
+        catch_id : str
+            identifier of the basin.
+        columns : Optional[list[str]], default=None
+            Variables that are used. By default, all the variables.
+        period : Optional[tuple[pd.Timestamp, pd.Timestamp]], default=None
+            Start and end of the time period that is used. By default, the whole time series.
+        n_warmup : int, default=0
+            Number of timesteps before the start of the period that are used.
+
+        Returns
+        -------
+        df : pd.DataFrame
+            Dataframe with the catchments` timeseries
+
+        """
+        store = self._open_store()
+        variables = list(range(len(self.store_variables)))
+        if columns is not None:
+            variables = [i for i, v in enumerate(self.store_variables) if v in set(columns)]
+
+        time = self._period_slice(dates=self.store_time, period=period, n_warmup=n_warmup)
+        values = store["timeseries"].isel(basin=self.store_basins[catch_id], time=time, variable=variables)
+        return pd.DataFrame(
+            values.values, index=self.store_time[time], columns=[self.store_variables[i] for i in variables]
+        )
+
+    def _read_window(self, basin: str, start: int, end: int) -> pd.DataFrame:
+        """Read a window of the time series of a specific basin from the store.
+
+        Lagged features are added after reading, using max_lag additional timesteps before the window. Timesteps that
+        are not available in the store are filled with NaN.
+
+        Parameters
+        ----------
+        basin : str
+            identifier of the basin.
+        start : int
+            First time index (inclusive) of the window, relative to the first timestep of the basin.
+        end : int
+            Last time index (exclusive) of the window, relative to the first timestep of the basin.
+
+        Returns
+        -------
+        df : pd.DataFrame
+            Dataframe of end - start rows with the variables of the window
+
+        """
+        store = self._open_store()
+        first = self.time_offset[basin] + start - self.max_lag
+        last = self.time_offset[basin] + end
+        values = np.full((last - first, len(self.store_variables)), np.nan, dtype=np.float32)
+        if last > 0 and first < len(self.store_time):
+            read_first, read_last = max(first, 0), min(last, len(self.store_time))
+            values[read_first - first : read_last - first] = (
+                store["timeseries"].isel(basin=self.store_basins[basin], time=slice(read_first, read_last)).values
+            )
+
+        df = pd.DataFrame(values, columns=self.store_variables)[self.window_variables]
+        if isinstance(self.cfg.lagged_features, dict):
+            df = self._add_lagged_features(df=df)
+
+        return df.iloc[self.max_lag :]
+
+    def _running_statistics(self) -> dict[str, RunningStatistics]:
+        """Statistics of the dynamic inputs ("x_d"), targets ("y") and forecast inputs ("x_fc").
+
+        The statistics were accumulated, entity by entity, when the entities were processed.
+
+        Returns
+        -------
+        dict[str, RunningStatistics]
+            Statistics of each group of variables
+
+        """
+        if self._statistics is None:
+            return {
+                "x_d": RunningStatistics(n_features=len(self.unique_dynamic_input)),
+                "y": RunningStatistics(n_features=len(self.cfg.target)),
+                "x_fc": RunningStatistics(n_features=len(self.unique_forecast_input)),
+            }
+        return self._statistics
+
+    def _store_entity(self, catch_id: str, entity_data: dict[str, np.ndarray | pd.DataFrame | torch.Tensor]):
+        """Store the information of an entity with valid samples.
+
+        Parameters
+        ----------
+        catch_id : str
+            identifier of the basin.
+        entity_data : dict[str, np.ndarray | pd.DataFrame | torch.Tensor]
+            Processed information of the entity, as returned by `_process_entity`.
+
+        """
+        # Merge the statistics of the entity
+        if self._statistics is None:
+            self._statistics = entity_data["statistics"]
+        else:
+            for k, v in self._statistics.items():
+                v.merge(entity_data["statistics"][k])
+
+        self._basin_std[catch_id] = entity_data["basin_std"]
+        if self.cfg.static_input:
+            self.x_s[catch_id] = entity_data["x_s"]
+
+        self.freq = entity_data["freq"]
+        self.start_date[catch_id] = entity_data["start_date"]
+        step = self.store_time[1] - self.store_time[0]
+        self.time_offset[catch_id] = int((entity_data["start_date"] - self.store_time[0]) // step)
+
+    def _target_tensor(self, df: pd.DataFrame) -> torch.Tensor:
+        """Target variables of the rows of a window, standardized if required."""
+        y = torch.tensor(df[self.cfg.target].values, dtype=torch.float32)
+        if self._standardize_output:
+            y = (y - self.scaler["y_mean"]) / self.scaler["y_std"]
+        return y
+
+    def _to_tensor_dict(self, df: pd.DataFrame, columns: list[str], group: str) -> dict[str, torch.Tensor]:
+        """Variables of the rows of a window as dictionary of tensors, standardized if required."""
+        x = {k: torch.tensor(df[k].values, dtype=torch.float32) for k in columns}
+        if self._standardize_input:
+            x = {k: (v - self.scaler[f"{group}_mean"][k]) / self.scaler[f"{group}_std"][k] for k, v in x.items()}
+        return x
+
+
+def write_consolidated_store(
+    cfg: Config,
+    path_store: Path,
+    entities_ids: Optional[list[str]] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    chunk_size_time: int = 8760,
+):
+    """Write the time series and attributes of a dataset into a consolidated Zarr store.
+
+    The entities are read one by one with the reader of the dataset defined in the configuration (`dataset` and
+    `path_data`) and appended to the store, so the whole dataset is never in memory. The time series are stored as
+    float32 values in a [basin, time, variable] array, chunked by basin and time, on a common time axis. The
+    attributes are stored in a [basin, attribute] array. The store can then be used with `dataset: consolidated_store`
+    and `path_data` pointing to the store.
+
+    Parameters
+    ----------
+    cfg : Config
+        Configuration file of the original dataset.
+    path_store : Path
+        Path of the Zarr store that will be created.
+    entities_ids : Optional[list[str]], default=None
+        Entities that will be written. By default, the entities in `path_entities`.
+    start_date : Optional[str], default=None
+        First date of the time axis. By default, the start of the earliest period of the configuration minus the
+        sequence length and the largest lag.
+    end_date : Optional[str], default=None
+        Last date of the time axis. By default, the end of the latest period of the configuration.
+    chunk_size_time : int, default=8760
+        Number of timesteps of each chunk.
+
+    """
+    from hy2dl.datasetzoo import get_dataset
+
+    if entities_ids is None:
+        entities_ids = np.loadtxt(cfg.path_entities, dtype="str").tolist()
+        entities_ids = [entities_ids] if isinstance(entities_ids, str) else entities_ids
+
+    # The readers only need the configuration, so the instance is created without processing the data
+    Dataset = get_dataset(cfg)
+    reader = Dataset.__new__(Dataset)
+    reader.cfg = cfg
+    reader.cache = None
+
+    try:
+        df_attributes = reader._read_attributes().select_dtypes(include="number")
+    except NotImplementedError:
+        df_attributes = None
+
+    periods = [getattr(cfg, f"{p}_period") for p in ("training", "validation", "testing")]
+    periods = [p for p in periods if p]
+
+    # The identifiers of all the entities are stored with the same (fixed-width) string type
+    basin_dtype = np.array(entities_ids).dtype
+
+    time_axis, variables = None, None
+    for n, catch_id in enumerate(tqdm(entities_ids, desc="Writing entities", unit="entity", ascii=True)):
+        df = reader._read_data(catch_id=catch_id).select_dtypes(include="number")
+
+        # Define the time axis of the store using the first entity
+        if time_axis is None:
+            freq = pd.infer_freq(df.index)
+            offset = pd.tseries.frequencies.to_offset(freq)
+            if start_date is None:
+                lags = reader.cfg.lagged_features or {}
+                max_lag = max([max(s) if isinstance(s, list) else s for s in lags.values()], default=0)
+                warmup = reader.cfg.seq_length_hindcast + reader.cfg.seq_length_forecast + max_lag
+                first_date = min(reader._parse_datetime(date_str=p[0], freq=freq) for p in periods) - warmup * offset
+            else:
+                first_date = pd.Timestamp(start_date)
+            last_date = (
+                max(reader._parse_datetime(date_str=p[1], freq=freq) for p in periods)
+                if end_date is None
+                else pd.Timestamp(end_date)
+            )
+            time_axis = pd.date_range(start=first_date, end=last_date, freq=freq)
+            variables = list(df.columns)
+
+        df = df.reindex(index=time_axis, columns=variables)
+        ds = xr.Dataset(
+            {"timeseries": (("basin", "time", "variable"), df.values[None].astype(np.float32))},
+            coords={"basin": np.array([catch_id], dtype=basin_dtype), "time": time_axis, "variable": variables},
+        )
+        if df_attributes is not None:
+            ds["attributes"] = (("basin", "attribute"), df_attributes.loc[[catch_id]].values.astype(np.float64))
+            ds = ds.assign_coords(attribute=list(df_attributes.columns))
+
+        if n == 0:
+            encoding = {"timeseries": {"chunks": (1, min(chunk_size_time, len(time_axis)), len(variables))}}
+            ds.to_zarr(path_store, mode="w", encoding=encoding)
+        else:
+            ds.to_zarr(path_store, append_dim="basin")
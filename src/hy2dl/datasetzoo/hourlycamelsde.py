@@ -1,7 +1,7 @@
 # import necessary packages
+from pathlib import Path
 from typing import Optional
 
-import numpy as np
 import pandas as pd
 
 from hy2dl.datasetzoo.camelsde import CAMELS_DE
@@ -29,6 +29,9 @@ class Hourly_CAMELS_DE(CAMELS_DE):
 
     """
 
+    # Longest gap of the hourly precipitation that is filled (see `_fill_precipitation_gaps`)
+    _max_filled_gap = 6
+
     def __init__(
         self,
         cfg: Config,
@@ -44,13 +47,44 @@ class Hourly_CAMELS_DE(CAMELS_DE):
             entities_ids=entities_ids,
         )
 
-    def _read_data(self, catch_id: str) -> pd.DataFrame:
+    def _get_data_files(self, catch_id: str) -> list[Path]:
+        """Files that contain the timeseries of a specific catchment
+
+        Parameters
+        ----------
+        catch_id : str
+            identifier of the basin.
+
+        Returns
+        -------
+        list[Path]
+            Paths of the hourly and daily timeseries files
+
+        """
+        return [
+            self.cfg.path_data / "hourly" / f"CAMELS_DE_1h_hydromet_timeseries_{catch_id}.csv",
+            self.cfg.path_data / "timeseries" / f"CAMELS_DE_hydromet_timeseries_{catch_id}.csv",
+        ]
+
+    def _read_data(
+        self,
+        catch_id: str,
+        columns: Optional[list[str]] = None,
+        period: Optional[tuple[pd.Timestamp, pd.Timestamp]] = None,
+        n_warmup: int = 0,
+    ) -> pd.DataFrame:
         """Read the catchments` timeseries
 
         Parameters
         ----------
         catch_id : str
             identifier of the basin.
+        columns : Optional[list[str]], default=None
+            Columns that are used. By default, all the columns.
+        period : Optional[tuple[pd.Timestamp, pd.Timestamp]], default=None
+            Start and end of the time period that is used. By default, the whole time series.
+        n_warmup : int, default=0
+            Number of rows before the start of the period that are used.
 
         Returns
         -------
@@ -58,17 +92,31 @@ class Hourly_CAMELS_DE(CAMELS_DE):
             Dataframe with the catchments` timeseries
 
         """
-        # Read hourly data
-        path_timeseries = self.cfg.path_data / "hourly" / f"CAMELS_DE_1h_hydromet_timeseries_{catch_id}.csv"
+        path_timeseries, path_daily_timeseries = self._get_data_files(catch_id=catch_id)
+
+        # Read hourly data. The precipitation is always read, because it is used to create precipitation_resampled.
+        # The gaps are filled using the values around them, so additional hours are read at both sides of the period.
+        if columns is not None:
+            columns = [*columns, "precipitation_sum_mean"]
+        if period is not None:
+            margin = Hourly_CAMELS_DE._max_filled_gap + 1
+            period = (period[0], period[1] + pd.Timedelta(hours=margin))
+            n_warmup += margin
+
         # load time series
-        df_hourly = pd.read_csv(path_timeseries, index_col="time", parse_dates=["time"])
+        df_hourly = self._read_csv(
+            path=path_timeseries, columns=columns, period=period, n_warmup=n_warmup, date_column="time"
+        )
 
         # Fill gaps in the precipitation column
         df_hourly = self._fill_precipitation_gaps(df=df_hourly)
 
-        # Load variables from CAMELS DE (daily) and resample
-        path_daily_timeseries = self.cfg.path_data / "timeseries" / f"CAMELS_DE_hydromet_timeseries_{catch_id}.csv"
-        df_resampled = pd.read_csv(path_daily_timeseries, index_col="date", parse_dates=["date"])
+        # Load variables from CAMELS DE (daily) and resample. The daily values are needed from the first to the day
+        # after the last hour of the hourly data.
+        daily_period = None
+        if period is not None:
+            daily_period = (df_hourly.index[0].floor("D"), df_hourly.index[-1].floor("D") + pd.Timedelta(days=1))
+        df_resampled = self._read_csv(path=path_daily_timeseries, columns=["precipitation_mean"], period=daily_period)
         df_resampled = df_resampled.loc[:, "precipitation_mean"].resample("1h").ffill() / 24
         df_resampled = df_resampled.loc[df_hourly.index.intersection(df_resampled.index)]
 
@@ -96,45 +144,8 @@ class Hourly_CAMELS_DE(CAMELS_DE):
 
         df_filled = df.copy()  # Create a copy to avoid modifying the original DataFrame
         col = "precipitation_sum_mean"
-
-        # Identify missing values
-        df_filled["is_missing"] = df_filled[col].isna()
-
-        # Identify missing groups
-        df_filled["missing_group"] = (df_filled["is_missing"] != df_filled["is_missing"].shift()).cumsum() * df_filled[
-            "is_missing"
-        ]
-
-        # Count length of each missing group
-        gap_lengths = df_filled[df_filled["is_missing"]].groupby("missing_group").size()
-
-        # Iterate over missing groups
-        for group_id, gap_length in gap_lengths.items():
-            if gap_length <= 3:
-                # Apply linear interpolation for gaps < 3 hours
-                df_filled.loc[df_filled["missing_group"] == group_id, col] = df_filled[col].interpolate(method="linear")
-
-            elif 3 < gap_length <= 6:
-                # Get the index range of the missing group
-                missing_indices = df_filled[df_filled["missing_group"] == group_id].index
-
-                # Get values before and after the gap
-                before_value = (
-                    df_filled.loc[missing_indices[0] - pd.Timedelta(hours=1), col]
-                    if missing_indices[0] - pd.Timedelta(hours=1) in df_filled.index
-                    else np.nan
-                )
-                after_value = (
-                    df_filled.loc[missing_indices[-1] + pd.Timedelta(hours=1), col]
-                    if missing_indices[-1] + pd.Timedelta(hours=1) in df_filled.index
-                    else np.nan
-                )
-
-                # Filled if before and after values are 0
-                if before_value == 0 and after_value == 0:
-                    df_filled.loc[df_filled["missing_group"] == group_id, col] = 0
-
-        # Drop helper columns
-        df_filled.drop(columns=["is_missing", "missing_group"], inplace=True)
+        df_filled[col] = self.fill_gaps(
+            series=df_filled[col], max_interpolation_gap=3, max_zero_gap=Hourly_CAMELS_DE._max_filled_gap
+        )
 
         return df_filled
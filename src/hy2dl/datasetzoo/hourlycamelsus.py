@@ -1,7 +1,7 @@
 # import necessary packages
+from pathlib import Path
 from typing import Optional
 
-import numpy as np
 import pandas as pd
 
 from hy2dl.datasetzoo.camelsus import CAMELS_US
@@ -59,13 +59,48 @@ class Hourly_CAMELS_US(CAMELS_US):
             entities_ids=entities_ids,
         )
 
-    def _read_data(self, catch_id: str) -> pd.DataFrame:
+    def _get_data_files(self, catch_id: str) -> list[Path]:
+        """Files that contain the timeseries of a specific catchment
+
+        Parameters
+        ----------
+        catch_id : str
+            8-digit USGS identifier of the basin.
+
+        Returns
+        -------
+        list[Path]
+            Paths of the forcing and discharge files
+
+        """
+        files = []
+        for forcing in self.cfg.forcings:
+            if forcing[-7:] == "_hourly":
+                files.append(self.cfg.path_data / "hourly" / f"{forcing}" / f"{catch_id}_hourly_nldas.csv")
+            else:
+                files.append(self._get_forcing_file(catch_id=catch_id, forcing=forcing))
+        files.append(self.cfg.path_data / "hourly/usgs_streamflow" / f"{catch_id}-usgs-hourly.csv")
+        return files
+
+    def _read_data(
+        self,
+        catch_id: str,
+        columns: Optional[list[str]] = None,
+        period: Optional[tuple[pd.Timestamp, pd.Timestamp]] = None,
+        n_warmup: int = 0,
+    ) -> pd.DataFrame:
         """Read a specific catchment timeseries into a dataframe.
 
         Parameters
         ----------
         catch_id : str
             8-digit USGS identifier of the basin.
+        columns : Optional[list[str]], default=None
+            Columns that are used. By default, all the columns.
+        period : Optional[tuple[pd.Timestamp, pd.Timestamp]], default=None
+            Start and end of the time period that is used. By default, the whole time series.
+        n_warmup : int, default=0
+            Number of rows before the start of the period that are used.
 
         Returns
         -------
@@ -75,11 +110,24 @@ class Hourly_CAMELS_US(CAMELS_US):
         """
         dfs = []
         for forcing in self.cfg.forcings:
+            forcing_columns = self._get_forcing_columns(columns=columns, forcing=forcing)
             if forcing[-7:] == "_hourly":
-                df = self._load_hourly_data(catch_id=catch_id, forcing=forcing)
+                df = self._load_hourly_data(
+                    catch_id=catch_id, forcing=forcing, columns=forcing_columns, period=period, n_warmup=n_warmup
+                )
             else:
-                # load daily CAMELS forcings and upsample to hourly
-                df, _ = self._load_camelsus_data(catch_id=catch_id, forcing=forcing)
+                # load daily CAMELS forcings and upsample to hourly. The daily values are needed from the day of the
+                # first hour to the day after the last hour.
+                daily_period = None
+                if period is not None:
+                    daily_period = (period[0].floor("D"), period[1].floor("D") + pd.Timedelta(days=1))
+                df, _ = self._load_camelsus_data(
+                    catch_id=catch_id,
+                    forcing=forcing,
+                    columns=forcing_columns,
+                    period=daily_period,
+                    n_warmup=n_warmup // 24 + 1,
+                )
                 df = df.resample("1h").ffill()
             if len(self.cfg.forcings) > 1:
                 # rename columns
@@ -89,11 +137,18 @@ class Hourly_CAMELS_US(CAMELS_US):
         df = pd.concat(dfs, axis=1)
 
         # Read discharges and add them to current dataframe
-        df = df.join(self._load_hourly_discharge(catch_id=catch_id))
+        df = df.join(self._load_hourly_discharge(catch_id=catch_id, columns=columns, period=period, n_warmup=n_warmup))
 
         return df
 
-    def _load_hourly_data(self, catch_id: str, forcing: str) -> pd.DataFrame:
+    def _load_hourly_data(
+        self,
+        catch_id: str,
+        forcing: str,
+        columns: Optional[list[str]] = None,
+        period: Optional[tuple[pd.Timestamp, pd.Timestamp]] = None,
+        n_warmup: int = 0,
+    ) -> pd.DataFrame:
         """Read a specific catchment forcing timeseries
 
         Parameters
@@ -102,6 +157,12 @@ class Hourly_CAMELS_US(CAMELS_US):
             8-digit USGS identifier of the basin.
         forcing : str
             e.g. ndlas_hourly'
+        columns : Optional[list[str]], default=None
+            Columns that are used. By default, all the columns.
+        period : Optional[tuple[pd.Timestamp, pd.Timestamp]], default=None
+            Start and end of the time period that is used. By default, the whole time series.
+        n_warmup : int, default=0
+            Number of rows before the start of the period that are used.
 
         Returns
         -------
@@ -111,17 +172,29 @@ class Hourly_CAMELS_US(CAMELS_US):
         """
         path_timeseries = self.cfg.path_data / "hourly" / f"{forcing}" / f"{catch_id}_hourly_nldas.csv"
         # load time series
-        df = pd.read_csv(path_timeseries, index_col=["date"], parse_dates=["date"])
+        df = self._read_csv(path=path_timeseries, columns=columns, period=period, n_warmup=n_warmup)
 
         return df
 
-    def _load_hourly_discharge(self, catch_id: str) -> pd.DataFrame:
+    def _load_hourly_discharge(
+        self,
+        catch_id: str,
+        columns: Optional[list[str]] = None,
+        period: Optional[tuple[pd.Timestamp, pd.Timestamp]] = None,
+        n_warmup: int = 0,
+    ) -> pd.DataFrame:
         """Read a specific catchment discharge timeseries
 
         Parameters
         ----------
         catch_id : str
             8-digit USGS identifier of the basin.
+        columns : Optional[list[str]], default=None
+            Columns that are used. By default, all the columns. The discharge is always read.
+        period : Optional[tuple[pd.Timestamp, pd.Timestamp]], default=None
+            Start and end of the time period that is used. By default, the whole time series.
+        n_warmup : int, default=0
+            Number of rows before the start of the period that are used.
 
         Returns
         -------
@@ -133,9 +206,11 @@ class Hourly_CAMELS_US(CAMELS_US):
         streamflow_path = self.cfg.path_data / "hourly/usgs_streamflow" / f"{catch_id}-usgs-hourly.csv"
 
         # load time series
-        df = pd.read_csv(streamflow_path, index_col=["date"], parse_dates=["date"])
+        if columns is not None:
+            columns = [*columns, "QObs(mm/h)"]
+        df = self._read_csv(path=streamflow_path, columns=columns, period=period, n_warmup=n_warmup)
 
         # Replace invalid discharge values by NaN
-        df["QObs(mm/h)"] = df["QObs(mm/h)"].apply(lambda x: np.nan if x < 0 else x)
+        df["QObs(mm/h)"] = df["QObs(mm/h)"].mask(df["QObs(mm/h)"] < 0)
 
         return df
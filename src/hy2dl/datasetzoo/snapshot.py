@@ -0,0 +1,454 @@
+# import necessary packages
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import uuid
+import warnings
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+import torch
+
+from hy2dl.datasetzoo.basedataset import BaseDataset
+from hy2dl.datasetzoo.cache import DataCache
+from hy2dl.utils.config import Config
+
+# Fields of the configuration file that define the processed data. Two configurations with the same values in these
+# fields produce the same datasets, so they can share the snapshots.
+DATA_FIELDS = [
+    "contiguous_storage",
+    "custom_seq_processing",
+    "dataset",
+    "deduplicate_inputs",
+    "dynamic_input",
+    "dynamic_input_conceptual_model",
+    "forcings",
+    "forecast_input",
+    "lagged_features",
+    "lean_storage",
+    "nan_handling_method",
+    "nan_probability",
+    "path_additional_features",
+    "path_data",
+    "path_timeseries",
+    "predict_last_n",
+    "read_float32",
+    "seq_length_forecast",
+    "seq_length_hindcast",
+    "static_input",
+    "storage_dtype",
+    "target",
+    "testing_period",
+    "timeseries_format",
+    "training_period",
+    "unique_prediction_blocks",
+    "validation_period",
+    "virtual_lagged_features",
+]
+
+
+@dataclass
+class _ArrayRef:
+    """Placeholder of an array in the pickled state of a snapshot."""
+
+    dtype: str  # data type of the array (name of the file with the values)
+    offset: int  # position of the first element in the file
+    shape: tuple[int, ...]
+    kind: str  # "numpy", "tensor" or "bfloat16" (tensor stored as int16)
+
+
+@dataclass
+class _FrameRef:
+    """Placeholder of a date-indexed dataframe in the pickled state of a snapshot."""
+
+    values: _ArrayRef | list[_ArrayRef]  # single [time, columns] array, or one array per column (mixed data types)
+    index: _ArrayRef
+    index_name: Optional[str]
+    freq: Optional[str]
+    columns: list
+
+
+class DatasetSnapshot:
+    """Snapshots of processed datasets, which can be restored without reading and processing the data again.
+
+    A snapshot contains the whole state of a dataset (e.g. after `calculate_global_statistics` and `standardize_data`):
+    tensors, index of the valid samples, scaler, `basin_std`, dates and processed dataframes. The arrays of all the
+    variables are stored in flat ``.npy`` files (one per data type), which are memory-mapped when the snapshot is
+    restored, so the data is only read from disk when it is used. The rest of the state is a small pickle file.
+
+    The key of each snapshot is a stable hash of the configuration fields that define the processed data (see
+    `DATA_FIELDS`), the dataset class, the time period, the NaN check, the entities, an optional tag and, for datasets
+    standardized with the scaler of another dataset (e.g. evaluation datasets), a hash of that scaler. The snapshots
+    also store the size and modification time of the source files (given by `_get_attributes_files` and
+    `_get_data_files`, or `path_data` if the dataset does not specify them), and are rejected if the files change.
+
+    Parameters
+    ----------
+    path : Path
+        Folder where the snapshots are stored. It is created if it does not exist.
+
+    Examples
+    --------
+    >>> snapshot = DatasetSnapshot(path=config.path_save_folder.parent / "snapshots")
+    >>> training_dataset = snapshot.load(Dataset=Dataset, cfg=config, time_period="training")
+    >>> if training_dataset is None:
+    ...     training_dataset = Dataset(cfg=config, time_period="training")
+    ...     training_dataset.calculate_basin_std()
+    ...     training_dataset.calculate_global_statistics()
+    ...     training_dataset.standardize_data()
+    ...     snapshot.save(training_dataset)
+    >>> training_dataset.save_scaler()
+    >>> validation_dataset = snapshot.load(
+    ...     Dataset=Dataset, cfg=config, time_period="validation", scaler=training_dataset.scaler
+    ... )
+    >>> if validation_dataset is None:
+    ...     validation_dataset = Dataset(cfg=config, time_period="validation")
+    ...     validation_dataset.scaler = training_dataset.scaler
+    ...     validation_dataset.standardize_data()
+    ...     snapshot.save(validation_dataset, scaler=training_dataset.scaler)
+
+    """
+
+    # Attributes of the datasets that are not stored in the snapshots. They are recreated when the dataset is restored.
+    _excluded_attributes = ("cfg", "cache")
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def load(
+        self,
+        Dataset: type[BaseDataset],
+        cfg: Config,
+        time_period: str,
+        check_NaN: Optional[bool] = True,
+        entities_ids: Optional[str | list[str]] = None,
+        tag: str = "",
+        scaler: Optional[dict] = None,
+    ) -> Optional[BaseDataset]:
+        """Restore a dataset from its snapshot.
+
+        Parameters
+        ----------
+        Dataset : type[BaseDataset]
+            Dataset class (e.g. as returned by `get_dataset`).
+        cfg : Config
+            Configuration file.
+        time_period : {'training', 'validation', 'testing'}
+            Period of the dataset.
+        check_NaN : Optional[bool], default=True
+            Whether the NaN values were checked while processing the data.
+        entities_ids : Optional[str | list[str]], default=None
+            ID of the entities of the dataset. By default, the entities defined in the configuration file.
+        tag : str, default=""
+            Additional identifier of the snapshot (e.g. to distinguish different stages of the processing).
+        scaler : Optional[dict], default=None
+            Scaler of another dataset with which the dataset was standardized (e.g. the scaler of the training dataset,
+            for the evaluation datasets), as given to `save`.
+
+        Returns
+        -------
+        Optional[BaseDataset]
+            Restored dataset, or None if there is no valid snapshot.
+
+        """
+        dataset = Dataset.__new__(Dataset)
+        dataset.cfg = cfg
+        entities_ids = BaseDataset._get_entities_ids(cfg=cfg, time_period=time_period, entities_ids=entities_ids)
+        fingerprint = self._fingerprint(
+            dataset=dataset,
+            time_period=getattr(cfg, f"{time_period}_period"),
+            check_NaN=check_NaN,
+            entities_ids=entities_ids,
+            tag=tag,
+            scaler=scaler,
+        )
+        entry = self.path / self.make_key(fingerprint)
+        if not entry.is_dir():
+            return None
+
+        with open(entry / "meta.json") as f:
+            meta = json.load(f)
+        if meta["fingerprint"] != fingerprint:
+            warnings.warn(
+                f"Snapshot {entry.name} was created with a different configuration, so it is ignored.", stacklevel=2
+            )
+            return None
+        if meta["files"] != self._files_signature(dataset=dataset, entities_ids=entities_ids):
+            warnings.warn(
+                f"The source files of snapshot {entry.name} have changed, so the snapshot is ignored.", stacklevel=2
+            )
+            return None
+
+        # The arrays are memory-mapped (copy-on-write), so the data can also be modified in place
+        arrays = {dtype: np.load(entry / f"{dtype}.npy", mmap_mode="c") for dtype in meta["dtypes"]}
+        with open(entry / "state.pickle", "rb") as f:
+            state = DatasetSnapshot._restore(pickle.load(f), arrays=arrays, memo={})
+
+        dataset.__setstate__(state)
+        dataset.cache = DataCache(path=cfg.path_cache, max_size_gb=cfg.cache_max_size_gb) if cfg.path_cache else None
+        return dataset
+
+    def save(self, dataset: BaseDataset, tag: str = "", scaler: Optional[dict] = None) -> str:
+        """Store the snapshot of a dataset.
+
+        Parameters
+        ----------
+        dataset : BaseDataset
+            Dataset to store.
+        tag : str, default=""
+            Additional identifier of the snapshot (e.g. to distinguish different stages of the processing).
+        scaler : Optional[dict], default=None
+            Scaler of another dataset with which the dataset was standardized (e.g. the scaler of the training dataset,
+            for the evaluation datasets). It must be given if the dataset was standardized with a scaler that was not
+            calculated from its own data (`calculate_global_statistics`), so the snapshots of datasets standardized
+            with different scalers are kept apart.
+
+        Returns
+        -------
+        str
+            Key of the snapshot.
+
+        """
+        fingerprint = self._fingerprint(
+            dataset=dataset,
+            time_period=dataset.time_period,
+            check_NaN=dataset.check_NaN,
+            entities_ids=dataset.entities_ids,
+            tag=tag,
+            scaler=scaler,
+        )
+        if scaler is not None and DatasetSnapshot._state_hash(scaler) != DatasetSnapshot._state_hash(dataset.scaler):
+            raise ValueError("The scaler of the dataset is not the given `scaler`.")
+        key = self.make_key(fingerprint)
+
+        # The datasets can define which attributes are shared (e.g. without handles of open files)
+        state = dataset.__getstate__() if hasattr(type(dataset), "__getstate__") else dataset.__dict__
+        state = {k: v for k, v in state.items() if k not in DatasetSnapshot._excluded_attributes}
+        arrays = {}
+        state = DatasetSnapshot._extract(state, arrays=arrays, memo={})
+
+        meta = {
+            "fingerprint": fingerprint,
+            "files": self._files_signature(dataset=dataset, entities_ids=dataset.entities_ids),
+            "dtypes": list(arrays),
+        }
+
+        # Write in a temporary folder and move it at the end, so other processes never see half-written snapshots
+        tmp_entry = self.path / f".tmp_{key}_{uuid.uuid4().hex}"
+        tmp_entry.mkdir()
+        for dtype, values in arrays.items():
+            np.save(tmp_entry / f"{dtype}.npy", np.concatenate(values) if values else np.array([], dtype=dtype))
+        with open(tmp_entry / "state.pickle", "wb") as f:
+            pickle.dump(state, f)
+        with open(tmp_entry / "meta.json", "w") as f:
+            json.dump(meta, f)
+
+        shutil.rmtree(self.path / key, ignore_errors=True)  # previous (e.g. stale) snapshot
+        try:
+            os.rename(tmp_entry, self.path / key)
+        except OSError:  # the snapshot was written in the meantime by another process
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+        return key
+
+    @staticmethod
+    def make_key(fingerprint: dict) -> str:
+        """Build the key of a snapshot.
+
+        Parameters
+        ----------
+        fingerprint : dict
+            Information that identifies the snapshot, as returned by `_fingerprint`.
+
+        Returns
+        -------
+        str
+            Key of the snapshot.
+
+        """
+        info = json.dumps(fingerprint, sort_keys=True)
+        return f"snapshot_{hashlib.sha1(info.encode()).hexdigest()}"
+
+    @staticmethod
+    def _fingerprint(
+        dataset: BaseDataset,
+        time_period: list[str],
+        check_NaN: bool,
+        entities_ids: list[str],
+        tag: str,
+        scaler: Optional[dict],
+    ) -> dict:
+        """Information that identifies a processed dataset.
+
+        Returns
+        -------
+        dict
+            Json serializable dictionary with the data-relevant configuration fields, the dataset class, the time
+            period, the NaN check, the entities, the tag and the hash of the scaler (if given).
+
+        """
+        cfg = dataset.cfg
+        fields = {field: getattr(cfg, field) for field in DATA_FIELDS}
+        # The cached time series are read as float32 values
+        fields["cache"] = cfg.path_cache is not None
+        return json.loads(
+            json.dumps(
+                {
+                    "dataset_class": type(dataset).__name__,
+                    "cfg": fields,
+                    "time_period": list(time_period),
+                    "check_NaN": bool(check_NaN),
+                    "entities_ids": list(entities_ids),
+                    "tag": tag,
+                    "scaler": DatasetSnapshot._state_hash(scaler) if scaler is not None else None,
+                },
+                sort_keys=True,
+                default=str,
+            )
+        )
+
+    @staticmethod
+    def _state_hash(x: Any) -> str:
+        """Hash of a state (e.g. a scaler), including the values of its arrays and tensors.
+
+        Returns
+        -------
+        str
+            Hash of the state.
+
+        """
+        arrays = {}
+        state = DatasetSnapshot._extract(x, arrays=arrays, memo={})
+        h = hashlib.sha1(pickle.dumps(state))
+        for dtype in sorted(arrays):
+            for values in arrays[dtype]:
+                h.update(values.tobytes())
+        return h.hexdigest()
+
+    @staticmethod
+    def _files_signature(dataset: BaseDataset, entities_ids: list[str]) -> str:
+        """Hash of the path, size and modification time of the source files of a dataset.
+
+        Returns
+        -------
+        str
+            Signature of the source files.
+
+        """
+        files = []
+        try:
+            if dataset.cfg.static_input:
+                files.extend(dataset._get_attributes_files())
+            for catch_id in entities_ids:
+                files.extend(dataset._get_data_files(catch_id=catch_id))
+        except NotImplementedError:  # the dataset does not specify its source files
+            files = [dataset.cfg.path_data]
+
+        if dataset.cfg.path_additional_features:
+            files.append(dataset.cfg.path_additional_features)
+
+        return DataCache.make_key(kind="files", files=[f for f in files if Path(f).exists()])
+
+    @staticmethod
+    def _extract(x: Any, arrays: dict[str, list[np.ndarray]], memo: dict[int, _ArrayRef]) -> Any:
+        """Replace the arrays, tensors and date-indexed dataframes of a state by placeholders.
+
+        Parameters
+        ----------
+        x : Any
+            State (or part of it).
+        arrays : dict[str, list[np.ndarray]]
+            Flattened arrays, indexed by data type. The arrays of `x` are appended to it.
+        memo : dict[int, _ArrayRef]
+            Placeholders of the tensors already stored, indexed by their id. Tensors referenced multiple times (e.g. the
+            shared inputs of `deduplicate_inputs`) are stored once.
+
+        Returns
+        -------
+        Any
+            State with placeholders.
+
+        """
+        if isinstance(x, dict):
+            return type(x)((k, DatasetSnapshot._extract(v, arrays, memo)) for k, v in x.items())
+        elif isinstance(x, (list, tuple)) and type(x) in (list, tuple):
+            return type(x)(DatasetSnapshot._extract(v, arrays, memo) for v in x)
+        elif isinstance(x, torch.Tensor):
+            if id(x) not in memo:
+                if x.dtype == torch.bfloat16:  # numpy has no bfloat16 type
+                    memo[id(x)] = DatasetSnapshot._add_array(x.view(torch.int16).numpy(), arrays, kind="bfloat16")
+                else:
+                    memo[id(x)] = DatasetSnapshot._add_array(x.detach().cpu().numpy(), arrays, kind="tensor")
+            return memo[id(x)]
+        elif isinstance(x, np.ndarray) and x.dtype.kind in "biufcmM":
+            return DatasetSnapshot._add_array(x, arrays, kind="numpy")
+        elif isinstance(x, pd.DataFrame) and isinstance(x.index, pd.DatetimeIndex):
+            if len(set(x.dtypes)) == 1 and x.dtypes.iloc[0].kind in "biuf":
+                values = DatasetSnapshot._add_array(x.to_numpy(), arrays, kind="numpy")
+            else:
+                values = [DatasetSnapshot._extract(x[c].to_numpy(), arrays, memo) for c in x.columns]
+            index = DatasetSnapshot._add_array(x.index.to_numpy(), arrays, kind="numpy")
+            return _FrameRef(
+                values=values, index=index, index_name=x.index.name, freq=x.index.freqstr, columns=list(x.columns)
+            )
+
+        return x
+
+    @staticmethod
+    def _add_array(x: np.ndarray, arrays: dict[str, list[np.ndarray]], kind: str) -> _ArrayRef:
+        dtype = x.dtype.str.lstrip("<>|=")
+        values = arrays.setdefault(dtype, [])
+        offset = sum(v.size for v in values)
+        values.append(np.ascontiguousarray(x).reshape(-1))
+        return _ArrayRef(dtype=dtype, offset=offset, shape=x.shape, kind=kind)
+
+    @staticmethod
+    def _restore(x: Any, arrays: dict[str, np.ndarray], memo: dict[int, torch.Tensor]) -> Any:
+        """Replace the placeholders of a state by (memory-mapped) views of the stored arrays.
+
+        Parameters
+        ----------
+        x : Any
+            State with placeholders (or part of it).
+        arrays : dict[str, np.ndarray]
+            Flattened arrays, indexed by data type.
+        memo : dict[int, torch.Tensor]
+            Tensors already restored, indexed by the id of their placeholder, so shared tensors are restored once.
+
+        Returns
+        -------
+        Any
+            Restored state.
+
+        """
+        if isinstance(x, dict):
+            return type(x)((k, DatasetSnapshot._restore(v, arrays, memo)) for k, v in x.items())
+        elif isinstance(x, (list, tuple)) and type(x) in (list, tuple):
+            return type(x)(DatasetSnapshot._restore(v, arrays, memo) for v in x)
+        elif isinstance(x, _ArrayRef):
+            values = arrays[x.dtype][x.offset : x.offset + int(np.prod(x.shape))].reshape(x.shape)
+            if x.kind == "numpy":
+                return np.asarray(values)
+            if id(x) not in memo:
+                memo[id(x)] = torch.from_numpy(values)
+                if x.kind == "bfloat16":
+                    memo[id(x)] = memo[id(x)].view(torch.bfloat16)
+            return memo[id(x)]
+        elif isinstance(x, _FrameRef):
+            index = pd.DatetimeIndex(DatasetSnapshot._restore(x.index, arrays, memo), name=x.index_name, freq=x.freq)
+            if isinstance(x.values, list):
+                values = {
+                    c: DatasetSnapshot._restore(v, arrays, memo) for c, v in zip(x.columns, x.values, strict=True)
+                }
+                return pd.DataFrame(values, index=index)
+            return pd.DataFrame(
+                DatasetSnapshot._restore(x.values, arrays, memo), index=index, columns=x.columns, copy=False
+            )
+
+        return x
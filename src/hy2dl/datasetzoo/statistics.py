@@ -0,0 +1,75 @@
+# import necessary packages
+import numpy as np
+
+
+class RunningStatistics:
+    """Streaming mean and standard deviation of a group of variables, ignoring NaN values.
+
+    The statistics are updated with blocks of data (e.g. the time series of one basin), so the whole data never needs
+    to be in memory at once. Partial statistics, computed for example in different processes or for different shards
+    of the data, can be combined with `merge`, using the parallel algorithm of Chan et al. [#]_.
+
+    Parameters
+    ----------
+    n_features : int
+        Number of variables.
+
+    References
+    ----------
+    .. [#] T. F. Chan, G. H. Golub and R. J. LeVeque: "Updating formulae and a pairwise algorithm for computing sample
+        variances", Technical Report STAN-CS-79-773, Department of Computer Science, Stanford University, 1979
+
+    """
+
+    def __init__(self, n_features: int):
+        self.count = np.zeros(n_features, dtype=np.int64)
+        self._mean = np.zeros(n_features, dtype=np.float64)
+        self._m2 = np.zeros(n_features, dtype=np.float64)  # sum of squared differences from the mean
+
+    @property
+    def mean(self) -> np.ndarray:
+        """Mean of each variable (NaN if the variable has no valid values)."""
+        return np.where(self.count > 0, self._mean, np.nan)
+
+    @property
+    def std(self) -> np.ndarray:
+        """Population standard deviation of each variable (NaN if the variable has no valid values)."""
+        variance = np.divide(self._m2, self.count, out=np.full_like(self._m2, np.nan), where=self.count > 0)
+        return np.sqrt(variance)
+
+    def update(self, x: np.ndarray) -> None:
+        """Update the statistics with a new block of data.
+
+        Parameters
+        ----------
+        x : np.ndarray
+            Array of shape [n_samples, n_features] (or [n_samples] if there is a single variable).
+
+        """
+        x = np.asarray(x, dtype=np.float64).reshape(len(x), -1)
+        valid = ~np.isnan(x)
+        count = valid.sum(axis=0)
+        mean = np.divide(
+            np.where(valid, x, 0.0).sum(axis=0), count, out=np.zeros(x.shape[1], dtype=np.float64), where=count > 0
+        )
+        m2 = (np.where(valid, x - mean, 0.0) ** 2).sum(axis=0)
+        self._combine(count=count, mean=mean, m2=m2)
+
+    def merge(self, other: "RunningStatistics") -> None:
+        """Combine the statistics with the (partial) statistics of another block of data.
+
+        Parameters
+        ----------
+        other : RunningStatistics
+            Statistics of the same variables, calculated with different data.
+
+        """
+        self._combine(count=other.count, mean=other._mean, m2=other._m2)
+
+    def _combine(self, count: np.ndarray, mean: np.ndarray, m2: np.ndarray) -> None:
+        total_count = self.count + count
+        weight = np.divide(count, total_count, out=np.zeros_like(self._mean), where=total_count > 0)
+        delta = mean - self._mean
+        self._mean = self._mean + delta * weight
+        self._m2 = self._m2 + m2 + delta**2 * self.count * weight
+        self.count = total_count
@@ -1,8 +1,13 @@
+from itertools import pairwise
+from typing import Optional
+
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 
 from hy2dl.modelzoo.inputlayer import InputLayer
 from hy2dl.utils.config import Config
+from hy2dl.utils.utils import select_outputs
 
 
 class CudaLSTM(nn.Module):
@@ -18,7 +23,7 @@ class CudaLSTM(nn.Module):
     """
 
     # specify sub-modules of the model that can later be used for finetuning.
-    module_parts = ['embedding_hindcast', 'lstm', 'linear']   # TL add it
+    module_parts = ["embedding_hindcast", "lstm", "linear"]  # TL add it
 
     def __init__(self, cfg: Config):
         super().__init__()
@@ -35,6 +40,7 @@ class CudaLSTM(nn.Module):
         self.linear = nn.Linear(in_features=cfg.hidden_size, out_features=cfg.output_features)
 
         self.predict_last_n = cfg.predict_last_n
+        self.seq_length = cfg.seq_length_hindcast
         self._reset_parameters(cfg=cfg)
 
     def _reset_parameters(self, cfg: Config):
@@ -42,18 +48,24 @@ class CudaLSTM(nn.Module):
         if cfg.initial_forget_bias is not None:
             self.lstm.bias_hh_l0.data[cfg.hidden_size : 2 * cfg.hidden_size] = cfg.initial_forget_bias
 
-    def forward(self, sample: dict[str, torch.Tensor | dict[str, torch.Tensor]]) -> dict[str, torch.Tensor]:
+    def forward(
+        self, sample: dict[str, torch.Tensor | dict[str, torch.Tensor]], outputs: Optional[set[str]] = None
+    ) -> dict[str, torch.Tensor]:
         """Forward pass of lstm network
 
         Parameters
         ----------
         sample: dict[str, torch.Tensor | dict[str, torch.Tensor]]
             Dictionary with the different tensors / dictionaries that will be used for the forward pass.
+        outputs: Optional[set[str]]
+            Names of the outputs to return (e.g. {"y_hat"} during training). If None, all the outputs are returned.
+            Unknown names raise a ValueError.
 
         Returns
         -------
         Dict[str, torch.Tensor]
             y_hat: Prediction for the `predict_last_n` time steps.
+            hs: Hidden states of the LSTM for the `predict_last_n` time steps.
 
         """
         # Preprocess data for hindcast period
@@ -67,4 +79,178 @@ class CudaLSTM(nn.Module):
         # Transform the output to the desired shape using a linear layer
         out = self.linear(out)
 
-        return {"y_hat": out, "hs": hs}
+        pred = {"y_hat": out, "hs": hs}
+        return select_outputs(pred=pred, outputs=outputs)
+
+    def forward_stateful(
+        self,
+        sample: dict[str, torch.Tensor | dict[str, torch.Tensor]],
+        verify: bool = False,
+        atol: float = 1e-3,
+    ) -> dict[str, torch.Tensor]:
+        """Stateful forward pass over long sequences (e.g. the whole evaluation period of a basin).
+
+        Instead of running the LSTM over one window of `seq_length` timesteps for each prediction, the LSTM runs once
+        over the whole sequence, carrying the states (h, c) forward. Predictions are only emitted for the timesteps
+        preceded by a full `seq_length` of (finite) inputs, which are the ones the windowed path can predict. As the
+        states carry information from before the window, the results differ from the windowed path. How much depends
+        on the memory of the model: the difference is negligible if the model forgets what happened more than
+        `seq_length` timesteps ago, but it can be large otherwise (e.g. for untrained models or short `seq_length`).
+        Run the first basin with `verify=True` before using this method for evaluation. See `stateful_lstm`.
+
+        Parameters
+        ----------
+        sample: dict[str, torch.Tensor | dict[str, torch.Tensor]]
+            Dictionary with the different tensors / dictionaries of the whole sequence (see
+            `BaseDataset.full_sequence`).
+        verify: bool
+            If True, the hidden states are checked against the ones of the windowed path. This is as expensive as the
+            windowed path, so it is meant for a first basin, to check that the model is suited for stateful inference.
+        atol: float
+            Absolute tolerance of the verification.
+
+        Returns
+        -------
+        Dict[str, torch.Tensor]
+            y_hat: Prediction for every timestep of the sequence, NaN where no full `seq_length` of inputs is
+            available.
+
+        """
+        # Preprocess data for the whole sequence
+        x_lstm = self.embedding_hindcast(sample)
+
+        # Stateful forward pass through the LSTM
+        hs, valid = stateful_lstm(lstm=self.lstm, x=x_lstm, seq_length=self.seq_length, verify=verify, atol=atol)
+        out = self.linear(self.dropout(hs))
+
+        return {"y_hat": torch.where(valid.unsqueeze(2), out, torch.nan)}
+
+
+def stateful_lstm(
+    lstm: nn.LSTM, x: torch.Tensor, seq_length: int, verify: bool = False, atol: float = 1e-3
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """Run an LSTM over long sequences, carrying the states (h, c) forward.
+
+    Timesteps with non-finite inputs (e.g. missing data) are processed with zeros, and the states of the sequence are
+    reset to zero at the first finite timestep after them, so missing data only affects the following `seq_length`
+    timesteps, as in the windowed path. The sequences are processed in chunks between the resets.
+
+    Parameters
+    ----------
+    lstm : nn.LSTM
+        LSTM (batch_first) to run.
+    x : torch.Tensor
+        Tensor of size [batch_size, time_steps, input_size] with the inputs of the LSTM.
+    seq_length : int
+        Number of timesteps of the windowed path. Timesteps preceded by less than `seq_length` finite inputs (including
+        themselves) are flagged as not valid.
+    verify : bool
+        If True, the hidden states of the valid timesteps are compared with the ones of the windowed path, in which
+        the LSTM runs from zero states over the last `seq_length` inputs. A RuntimeError is raised if the maximum
+        absolute difference is larger than `atol`.
+    atol : float
+        Absolute tolerance of the verification.
+
+    Returns
+    -------
+    Tuple[torch.Tensor, torch.Tensor]
+        - hs: torch.Tensor
+            Tensor of size [batch_size, time_steps, hidden_size] with the hidden states of the LSTM
+        - valid: torch.Tensor
+            Boolean tensor of size [batch_size, time_steps], True for the timesteps preceded by `seq_length` finite
+            inputs
+
+    """
+    batch_size, n_steps, _ = x.shape
+    x, finite, reset = _fill_non_finite(x)
+
+    # Valid timesteps: at least seq_length finite inputs since the last non-finite one
+    time = torch.arange(n_steps, device=x.device).expand(batch_size, -1)
+    last_non_finite = torch.cummax(torch.where(finite, -1, time), dim=1).values
+    valid = (time - last_non_finite) >= seq_length
+
+    # The sequences are processed in chunks between the resets
+    boundaries = [0, *torch.nonzero(reset.any(dim=0)).flatten().tolist(), n_steps]
+
+    h = x.new_zeros(lstm.num_layers, batch_size, lstm.hidden_size)
+    c = x.new_zeros(lstm.num_layers, batch_size, lstm.hidden_size)
+    hs = []
+    for start, end in pairwise(boundaries):
+        keep = (~reset[:, start]).to(x.dtype).view(1, -1, 1)
+        out, (h, c) = lstm(x[:, start:end], (h * keep, c * keep))
+        hs.append(out)
+    hs = torch.cat(hs, dim=1)
+
+    if verify:
+        # Windows of the windowed path that end in the valid timesteps, processed in chunks to bound the memory
+        batch_index, time_index = torch.nonzero(valid, as_tuple=True)
+        offsets = torch.arange(-seq_length + 1, 1, device=x.device)
+        max_error = 0.0
+        for i in range(0, len(batch_index), 256):
+            b, t = batch_index[i : i + 256], time_index[i : i + 256]
+            hs_windowed, _ = lstm(x[b.unsqueeze(1), t.unsqueeze(1) + offsets])
+            max_error = max(max_error, (hs_windowed[:, -1, :] - hs[b, t]).abs().max().item())
+
+        if max_error > atol:
+            raise RuntimeError(
+                f"Stateful and windowed hidden states differ by {max_error:.2e} (tolerance {atol:.2e}). "
+                "Use the windowed path for this model."
+            )
+
+    return hs, valid
+
+
+def lstm_cell_states(lstm: nn.LSTM, x: torch.Tensor, hs: torch.Tensor) -> torch.Tensor:
+    """Recover the cell states of a stateful run of a single-layer LSTM (see `stateful_lstm`).
+
+    `nn.LSTM` only returns the cell state of the last timestep. The gates of every timestep are recomputed at once
+    from the inputs and the previous hidden states, and the cell states, which follow the linear recurrence
+    c_t = f_t * c_{t-1} + i_t * g_t, are obtained with a parallel (log-depth) scan over time. The results match the
+    cell states of the LSTM up to rounding.
+
+    Parameters
+    ----------
+    lstm : nn.LSTM
+        Single-layer LSTM (batch_first) that produced `hs`.
+    x : torch.Tensor
+        Tensor of size [batch_size, time_steps, input_size] with the inputs of the LSTM.
+    hs : torch.Tensor
+        Tensor of size [batch_size, time_steps, hidden_size] with the hidden states returned by `stateful_lstm`.
+
+    Returns
+    -------
+    torch.Tensor
+        Tensor of size [batch_size, time_steps, hidden_size] with the cell states of the LSTM
+
+    """
+    if lstm.num_layers != 1:
+        raise ValueError("The cell states can only be recovered for single-layer LSTMs")
+
+    x, _, reset = _fill_non_finite(x)
+    keep = (~reset).unsqueeze(2)
+    h_prev = torch.cat((hs.new_zeros(hs.shape[0], 1, hs.shape[2]), hs[:, :-1]), dim=1) * keep
+    gates = F.linear(x, lstm.weight_ih_l0, lstm.bias_ih_l0) + F.linear(h_prev, lstm.weight_hh_l0, lstm.bias_hh_l0)
+    i, f, g, _ = gates.chunk(4, dim=2)
+
+    # Hillis-Steele scan of c_t = a_t * c_{t-1} + b_t, with the states reset to zero after non-finite inputs
+    a = f.sigmoid() * keep
+    c = i.sigmoid() * g.tanh()
+    step = 1
+    while step < c.shape[1]:
+        c = torch.cat((c[:, :step], torch.addcmul(c[:, step:], a[:, step:], c[:, :-step])), dim=1)
+        a = torch.cat((a[:, :step], a[:, step:] * a[:, :-step]), dim=1)
+        step *= 2
+
+    return c
+
+
+def _fill_non_finite(x: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Replace the timesteps with non-finite inputs by zeros, and flag where the states of the LSTM are reset.
+
+    Returns the filled inputs, a [batch_size, time_steps] mask of the finite timesteps and a [batch_size, time_steps]
+    mask of the first finite timesteps after non-finite inputs.
+    """
+    finite = torch.isfinite(x).all(dim=2)
+    reset = torch.zeros_like(finite)
+    reset[:, 1:] = finite[:, 1:] & ~finite[:, :-1]
+    return torch.where(finite.unsqueeze(2), x, 0.0), finite, reset
@@ -1,6 +1,7 @@
 import torch
 import torch.nn as nn
 
+from hy2dl.modelzoo.cudalstm import lstm_cell_states, stateful_lstm
 from hy2dl.modelzoo.inputlayer import InputLayer
 from hy2dl.utils.config import Config
 
@@ -33,6 +34,9 @@ class ForecastLSTM(nn.Module):
         self.linear = nn.Linear(in_features=cfg.hidden_size, out_features=cfg.output_features)
 
         self.predict_last_n = cfg.predict_last_n
+        self.seq_length_hindcast = cfg.seq_length_hindcast
+        self.seq_length_forecast = cfg.seq_length_forecast
+        self.custom_seq_processing = cfg.custom_seq_processing is not None
         self._reset_parameters(cfg=cfg)
 
     def _reset_parameters(self, cfg: Config):
@@ -72,3 +76,73 @@ class ForecastLSTM(nn.Module):
         out = self.linear(out)
 
         return {"y_hat": out}
+
+    def forward_stateful(
+        self,
+        sample: dict[str, torch.Tensor | dict[str, torch.Tensor]],
+        chunk_size: int = 1024,
+        verify: bool = False,
+        atol: float = 1e-3,
+    ) -> dict[str, torch.Tensor]:
+        """Stateful forward pass over the whole evaluation period of a basin, with one forecast per issue time.
+
+        Consecutive issue times share almost the whole hindcast period, so instead of running the LSTM over the
+        hindcast and forecast periods of each issue time, the hindcast LSTM runs once over the whole sequence, carrying
+        the states (h, c) forward (see `stateful_lstm`). The states at each issue time are the initial states of its
+        forecast period, and the forecast periods are run in batches of issue times.
+
+        As the states carry information from before the hindcast window, the results differ from the windowed path.
+        How much depends on the memory of the model, and it can be large, so run the first basin with `verify=True`
+        before using this method for evaluation.
+
+        Multi-frequency hindcasts (`custom_seq_processing`) are not supported: their low-frequency blocks are aligned
+        with each issue time, so consecutive issue times do not share a single hindcast sequence.
+
+        Parameters
+        ----------
+        sample: dict[str, torch.Tensor | dict[str, torch.Tensor]]
+            Dictionary with the hindcast sequence and the forecast inputs of each issue time (see
+            `BaseDataset.full_sequence`).
+        chunk_size: int
+            Number of issue times whose forecast periods are run together.
+        verify: bool
+            If True, the hidden states of the hindcast are checked against the ones of the windowed path. This is as
+            expensive as the windowed hindcast, so it is meant for a first basin.
+        atol: float
+            Absolute tolerance of the verification.
+
+        Returns
+        -------
+        Dict[str, torch.Tensor]
+            y_hat: Prediction of shape [issue_times, predict_last_n, output_features], NaN for the issue times without a
+            full hindcast period of inputs.
+
+        """
+        if self.custom_seq_processing:
+            raise ValueError("Stateful forecasts do not support custom_seq_processing")
+        if self.predict_last_n > self.seq_length_forecast:
+            raise ValueError("Stateful forecasts require `predict_last_n` <= `seq_length_forecast`")
+
+        # Hindcast: a single pass over the whole sequence, and states at each issue time
+        x_lstm = self.embedding_hindcast(sample)
+        hs, valid = stateful_lstm(
+            lstm=self.lstm, x=x_lstm, seq_length=self.seq_length_hindcast, verify=verify, atol=atol
+        )
+        cs = lstm_cell_states(lstm=self.lstm, x=x_lstm, hs=hs)
+        issue_index = sample["issue_index"]
+        h_issue, c_issue = hs[0, issue_index].unsqueeze(0), cs[0, issue_index].unsqueeze(0)
+
+        # Forecast: the periods of a chunk of issue times run as a batch, starting from the states at the issue times
+        n_issue = issue_index.shape[0]
+        y_hat = x_lstm.new_full((n_issue, self.predict_last_n, self.linear.out_features), torch.nan)
+        for start in range(0, n_issue, chunk_size):
+            end = min(start + chunk_size, n_issue)
+            chunk = {"x_d_fc": {k: v[start:end] for k, v in sample["x_d_fc"].items()}}
+            if "x_s" in sample:
+                chunk["x_s"] = sample["x_s"].expand(end - start, -1)
+            out, _ = self.lstm(
+                self.embedding_forecast(chunk), (h_issue[:, start:end].contiguous(), c_issue[:, start:end].contiguous())
+            )
+            y_hat[start:end] = self.linear(self.dropout(out[:, -self.predict_last_n :, :]))
+
+        return {"y_hat": torch.where(valid[0, issue_index].view(-1, 1, 1), y_hat, torch.nan)}
@@ -4,6 +4,7 @@ import torch
 
 from hy2dl.modelzoo.baseconceptualmodel import BaseConceptualModel
 from hy2dl.utils.config import Config
+from hy2dl.utils.utils import select_outputs
 
 
 class HBV(BaseConceptualModel):
@@ -32,12 +33,14 @@ class HBV(BaseConceptualModel):
         super(HBV, self).__init__()
         self.n_conceptual_models = cfg.num_conceptual_models
         self.parameter_type = self._map_parameter_type(cfg=cfg)
+        self.compile_time_step = cfg.compile_conceptual_model
 
     def forward(
         self,
         x_conceptual: dict[str, torch.Tensor],
         parameters: dict[str, torch.Tensor],
         initial_states: Optional[dict[str, torch.Tensor]] = None,
+        outputs: Optional[set[str]] = None,
     ) -> dict[str, torch.Tensor | dict[str, torch.Tensor]]:
         """Forward pass on the HBV model.
 
@@ -50,6 +53,9 @@ class HBV(BaseConceptualModel):
         initial_states: Optional[dict[str, torch.Tensor]]
             Optional parameter! In case one wants to specify the initial state of the internal states of the conceptual
             model.
+        outputs: Optional[set[str]]
+            Optional parameter! Names of the outputs to return (e.g. {"y_hat"}). If None, all the outputs are
+            returned. The time evolution of the internal states is only recorded if "internal_states" is requested.
 
         Returns
         -------
@@ -64,11 +70,8 @@ class HBV(BaseConceptualModel):
                 Internal states of the conceptual model in the last timestep
 
         """
-        # initialize structures to store the information
-        states, out = self._initialize_information(conceptual_inputs=x_conceptual)
-
         # initialize constants
-        batch_size, seq_length = x_conceptual["precipitation"].shape
+        batch_size = x_conceptual["precipitation"].shape[0]
         device = x_conceptual["precipitation"].device
         zero = torch.tensor(0.0, dtype=torch.float32, device=device)
 
@@ -123,79 +126,99 @@ class HBV(BaseConceptualModel):
             SLZ = initial_states["SLZ"]
 
         # run hydrological model for each time step
-        for j in range(seq_length):
-            # Snow module -----------------------------------------------------------------------------------------
-            SNOWPACK = SNOWPACK + snow[:, j, :]
-            melt = parameters["CFMAX"][:, j, :] * (temperature[:, j, :] - parameters["TT"][:, j, :])
-            melt = torch.clamp(melt, min=0.0)
-            melt = torch.min(melt, SNOWPACK)
-            MELTWATER = MELTWATER + melt
-            SNOWPACK = SNOWPACK - melt
-            refreezing = (
-                parameters["CFR"][:, j, :]
-                * parameters["CFMAX"][:, j, :]
-                * (parameters["TT"][:, j, :] - temperature[:, j, :])
-            )
-            refreezing = torch.clamp(refreezing, min=0.0)
-            refreezing = torch.min(refreezing, MELTWATER)
-            SNOWPACK = SNOWPACK + refreezing
-            MELTWATER = MELTWATER - refreezing
-            tosoil = MELTWATER - (parameters["CWH"][:, j, :] * SNOWPACK)
-            tosoil = torch.clamp(tosoil, min=0.0)
-            MELTWATER = MELTWATER - tosoil
-
-            # Soil and evaporation ---------------------------------------------------------------------------------
-            soil_wetness = (SM / parameters["FC"][:, j, :]) ** parameters["BETA"][:, j, :]
-            soil_wetness = torch.clamp(soil_wetness, min=0.0, max=1.0)
-            recharge = (liquid_p[:, j, :] + tosoil) * soil_wetness
-
-            SM = SM + liquid_p[:, j, :] + tosoil - recharge
-            excess = SM - parameters["FC"][:, j, :]
-            excess = torch.clamp(excess, min=0.0)
-            SM = SM - excess
-            if "BETAET" in parameters:
-                evapfactor = (SM / (parameters["LP"][:, j, :] * parameters["FC"][:, j, :])) ** parameters["BETAET"][
-                    :, j, :
-                ]
-            else:
-                evapfactor = SM / (parameters["LP"][:, j, :] * parameters["FC"][:, j, :])
-            evapfactor = torch.clamp(evapfactor, min=0.0, max=1.0)
-            ETact = et[:, j, :] * evapfactor
-            ETact = torch.min(SM, ETact)
-            SM = torch.clamp(SM - ETact, min=1e-5)  # SM can not be zero for gradient tracking
-
-            # Groundwater boxes -------------------------------------------------------------------------------------
-            SUZ = SUZ + recharge + excess
-            PERC = torch.min(SUZ, parameters["PERC"][:, j, :])
-            SUZ = SUZ - PERC
-            Q0 = parameters["K0"][:, j, :] * torch.clamp(SUZ - parameters["UZL"][:, j, :], min=0.0)
-            SUZ = SUZ - Q0
-            Q1 = parameters["K1"][:, j, :] * SUZ
-            SUZ = SUZ - Q1
-            SLZ = SLZ + PERC
-            Q2 = parameters["K2"][:, j, :] * SLZ
-            SLZ = SLZ - Q2
-
-            # Store time evolution of the internal states
-            states["SNOWPACK"][:, j, :] = SNOWPACK
-            states["MELTWATER"][:, j, :] = MELTWATER
-            states["SM"][:, j, :] = SM
-            states["SUZ"][:, j, :] = SUZ
-            states["SLZ"][:, j, :] = SLZ
-
-            # total outflow
-            out[:, j, 0] = torch.mean(Q0 + Q1 + Q2, dim=1)  # [mm]
-
-        # last states
-        final_states = self._get_final_states(states=states)
-
-        return {
+        out, states, final_states = self._time_loop(
+            inputs={"liquid_p": liquid_p, "snow": snow, "temperature": temperature, "et": et},
+            parameters=parameters,
+            states={"SNOWPACK": SNOWPACK, "MELTWATER": MELTWATER, "SM": SM, "SUZ": SUZ, "SLZ": SLZ},
+            record_states=outputs is None or "internal_states" in outputs,
+            record_output=outputs is None or "y_hat" in outputs,
+        )
+
+        pred = {
             "y_hat": out,
             "parameters": parameters,
             "internal_states": states,
             "final_states": final_states,
         }
 
+        return select_outputs(pred=pred, outputs=outputs)
+
+    @staticmethod
+    def _step(
+        inputs: dict[str, torch.Tensor], parameters: dict[str, torch.Tensor], states: dict[str, torch.Tensor]
+    ) -> tuple[dict[str, torch.Tensor], torch.Tensor]:
+        """Advance the HBV model one timestep.
+
+        Parameters
+        ----------
+        inputs: dict[str, torch.Tensor]
+            dictionary with the inputs of the timestep, as tensors of size [batch_size, n_conceptual_models].
+        parameters: dict[str, torch.Tensor]
+            dictionary with the parameterization of the timestep
+        states: dict[str, torch.Tensor]
+            dictionary with the internal states of the conceptual model at the end of the previous timestep
+
+        Returns
+        -------
+        Tuple[dict[str, torch.Tensor], torch.Tensor]
+            - states: dict[str, torch.Tensor]
+                Internal states of the conceptual model at the end of the timestep
+            - q_out: torch.Tensor
+                Outflow of the timestep, averaged over the conceptual models
+
+        """
+        SNOWPACK, MELTWATER, SM, SUZ, SLZ = (states[name] for name in ("SNOWPACK", "MELTWATER", "SM", "SUZ", "SLZ"))
+
+        # Snow module -----------------------------------------------------------------------------------------
+        SNOWPACK = SNOWPACK + inputs["snow"]
+        melt = parameters["CFMAX"] * (inputs["temperature"] - parameters["TT"])
+        melt = torch.clamp(melt, min=0.0)
+        melt = torch.min(melt, SNOWPACK)
+        MELTWATER = MELTWATER + melt
+        SNOWPACK = SNOWPACK - melt
+        refreezing = parameters["CFR"] * parameters["CFMAX"] * (parameters["TT"] - inputs["temperature"])
+        refreezing = torch.clamp(refreezing, min=0.0)
+        refreezing = torch.min(refreezing, MELTWATER)
+        SNOWPACK = SNOWPACK + refreezing
+        MELTWATER = MELTWATER - refreezing
+        tosoil = MELTWATER - (parameters["CWH"] * SNOWPACK)
+        tosoil = torch.clamp(tosoil, min=0.0)
+        MELTWATER = MELTWATER - tosoil
+
+        # Soil and evaporation ---------------------------------------------------------------------------------
+        soil_wetness = (SM / parameters["FC"]) ** parameters["BETA"]
+        soil_wetness = torch.clamp(soil_wetness, min=0.0, max=1.0)
+        recharge = (inputs["liquid_p"] + tosoil) * soil_wetness
+
+        SM = SM + inputs["liquid_p"] + tosoil - recharge
+        excess = SM - parameters["FC"]
+        excess = torch.clamp(excess, min=0.0)
+        SM = SM - excess
+        if "BETAET" in parameters:
+            evapfactor = (SM / (parameters["LP"] * parameters["FC"])) ** parameters["BETAET"]
+        else:
+            evapfactor = SM / (parameters["LP"] * parameters["FC"])
+        evapfactor = torch.clamp(evapfactor, min=0.0, max=1.0)
+        ETact = inputs["et"] * evapfactor
+        ETact = torch.min(SM, ETact)
+        SM = torch.clamp(SM - ETact, min=1e-5)  # SM can not be zero for gradient tracking
+
+        # Groundwater boxes -------------------------------------------------------------------------------------
+        SUZ = SUZ + recharge + excess
+        PERC = torch.min(SUZ, parameters["PERC"])
+        SUZ = SUZ - PERC
+        Q0 = parameters["K0"] * torch.clamp(SUZ - parameters["UZL"], min=0.0)
+        SUZ = SUZ - Q0
+        Q1 = parameters["K1"] * SUZ
+        SUZ = SUZ - Q1
+        SLZ = SLZ + PERC
+        Q2 = parameters["K2"] * SLZ
+        SLZ = SLZ - Q2
+
+        states = {"SNOWPACK": SNOWPACK, "MELTWATER": MELTWATER, "SM": SM, "SUZ": SUZ, "SLZ": SLZ}
+        # total outflow
+        return states, torch.mean(Q0 + Q1 + Q2, dim=1)  # [mm]
+
     @property
     def _initial_states(self) -> dict[str, float]:
         return {
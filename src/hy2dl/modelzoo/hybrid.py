@@ -1,3 +1,5 @@
+from typing import Optional
+
 import torch
 import torch.nn as nn
 
@@ -12,6 +14,7 @@ from hy2dl.modelzoo.shm import SHM
 # Routing models
 from hy2dl.modelzoo.uh_routing import UH_routing
 from hy2dl.utils.config import Config
+from hy2dl.utils.utils import select_outputs
 
 
 class Hybrid(nn.Module):
@@ -54,7 +57,9 @@ class Hybrid(nn.Module):
 
         self.cfg = cfg
 
-    def forward(self, sample: dict[str, torch.Tensor | dict[str, torch.Tensor]]) -> dict[str, torch.Tensor]:
+    def forward(
+        self, sample: dict[str, torch.Tensor | dict[str, torch.Tensor]], outputs: Optional[set[str]] = None
+    ) -> dict[str, torch.Tensor]:
         """Forward pass on hybrid model.
 
         In the forward pass, each element of the batch is associated with a basin. Therefore, the conceptual model is
@@ -64,6 +69,11 @@ class Hybrid(nn.Module):
         ----------
         sample: dict[str, torch.Tensor]
             Dictionary with the different tensors that will be used for the forward pass.
+        outputs: Optional[set[str]]
+            Names of the outputs to return (e.g. {"y_hat"} during training). Available outputs are the ones of the
+            conceptual model ("y_hat", "parameters", "internal_states", "final_states") and "hs". If None, all the
+            outputs are returned. The time evolution of the internal states is only recorded if requested. Unknown names
+            raise a ValueError.
 
         Returns
         -------
@@ -83,21 +93,23 @@ class Hybrid(nn.Module):
         # map lstm output to parameters of conceptual model
         warmup_period = self.cfg.seq_length - self.cfg.predict_last_n
         parameters_warmup, parameters_simulation = self.conceptual_model.map_parameters(
-            lstm_out=lstm_output[:, :, : self.n_conceptual_model_params], warmup_period=warmup_period
+            lstm_out=lstm_output[:, :, : self.n_conceptual_model_params],
+            warmup_period=warmup_period,
+            expand_warmup=False,
         )
 
-        # run conceptual model: warmup
-        with torch.no_grad():
-            pred = self.conceptual_model(
-                x_conceptual={k: v[:, :warmup_period] for k, v in sample["x_d_conceptual"].items()},
-                parameters=parameters_warmup,
-            )
+        # run conceptual model: warmup (only the final states are needed)
+        final_states = self.conceptual_model.warmup(
+            x_conceptual={k: v[:, :warmup_period] for k, v in sample["x_d_conceptual"].items()},
+            parameters=parameters_warmup,
+        )
 
         # run conceptual model: simulation
         pred = self.conceptual_model(
             x_conceptual={k: v[:, warmup_period:] for k, v in sample["x_d_conceptual"].items()},
             parameters=parameters_simulation,
-            initial_states=pred["final_states"],
+            initial_states=final_states,
+            outputs=None if outputs is None else (set(outputs) - {"hs"}) | {"y_hat"},
         )
         # Conceptual routing
         if self.routing_model is not None:
@@ -108,7 +120,7 @@ class Hybrid(nn.Module):
             pred["y_hat"] = self.routing_model(discharge=pred["y_hat"], parameters=parameters_simulation)
 
         pred["hs"] = hs[:, -self.cfg.predict_last_n :, :]
-        return pred
+        return select_outputs(pred=pred, outputs=outputs)
 
 
 def _get_conceptual_model(cfg: Config) -> BaseConceptualModel:
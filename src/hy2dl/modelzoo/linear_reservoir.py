@@ -1,9 +1,11 @@
+import warnings
 from typing import Optional
 
 import torch
 
 from hy2dl.modelzoo.baseconceptualmodel import BaseConceptualModel
 from hy2dl.utils.config import Config
+from hy2dl.utils.utils import select_outputs
 
 
 class linear_reservoir(BaseConceptualModel):
@@ -29,12 +31,22 @@ class linear_reservoir(BaseConceptualModel):
         super(linear_reservoir, self).__init__()
         self.n_conceptual_models = cfg.num_conceptual_models
         self.parameter_type = self._map_parameter_type(cfg=cfg)
+        # The step of the linear reservoir has too few operations for compiling to pay off (it is slower than the eager
+        # loop), so the flag is ignored.
+        self.compile_time_step = False
+        if cfg.compile_conceptual_model:
+            warnings.warn(
+                "compile_conceptual_model is ignored for linear_reservoir: the compiled step is slower than the eager "
+                "loop for this model",
+                stacklevel=2,
+            )
 
     def forward(
         self,
         x_conceptual: dict[str, torch.Tensor],
         parameters: dict[str, torch.Tensor],
         initial_states: Optional[dict[str, torch.Tensor]] = None,
+        outputs: Optional[set[str]] = None,
     ) -> dict[str, torch.Tensor | dict[str, torch.Tensor]]:
         """Forward pass on the linear reservoir model
 
@@ -47,6 +59,9 @@ class linear_reservoir(BaseConceptualModel):
         initial_states: Optional[dict[str, torch.Tensor]]
             Optional parameter! In case one wants to specify the initial state of the internal states of the conceptual
             model.
+        outputs: Optional[set[str]]
+            Optional parameter! Names of the outputs to return (e.g. {"y_hat"}). If None, all the outputs are
+            returned. The time evolution of the internal states is only recorded if "internal_states" is requested.
 
         Returns
         -------
@@ -61,11 +76,8 @@ class linear_reservoir(BaseConceptualModel):
                 Internal states of the conceptual model in the last timestep
 
         """
-        # initialize structures to store the information
-        states, out = self._initialize_information(conceptual_inputs=x_conceptual)
-
         # initialize constants
-        batch_size, seq_length = x_conceptual["precipitation"].shape
+        batch_size = x_conceptual["precipitation"].shape[0]
         device = x_conceptual["precipitation"].device
 
         if initial_states is None:  # if we did not specify initial states it takes the default values
@@ -79,38 +91,65 @@ class linear_reservoir(BaseConceptualModel):
         else:  # we specify the initial states
             si = initial_states["si"]
 
-        # run hydrological model for each time step
-        for j in range(seq_length):
-            # Broadcast tensor to consider multiple conceptual models running in parallel
-            p = torch.tile(
-                x_conceptual["precipitation"][:, j].unsqueeze(1),
-                (1, self.n_conceptual_models),
-            )
-            et = torch.tile(x_conceptual["pet"][:, j].unsqueeze(1), (1, self.n_conceptual_models))
-
-            # 1 bucket reservoir ------------------
-            si = si + p  # [mm]
-            ret = et * parameters["aux_ET"][:, j, :]  # [mm]
-            si = torch.maximum(torch.tensor(0.0, requires_grad=True, dtype=torch.float32), si - ret)  # [mm]
-            qi_out = si * parameters["ki"][:, j, :]  # [mm]
-            si = si - qi_out  # [mm]
-
-            # states
-            states["si"][:, j, :] = si
+        # Broadcast tensor to consider multiple conceptual models running in parallel
+        p = torch.tile(x_conceptual["precipitation"].unsqueeze(2), (1, 1, self.n_conceptual_models))
+        et = torch.tile(x_conceptual["pet"].unsqueeze(2), (1, 1, self.n_conceptual_models))
 
-            # discharge
-            out[:, j, 0] = torch.mean(qi_out, dim=1)  # [mm]
-
-        # last states
-        final_states = self._get_final_states(states=states)
-
-        return {
+        # run hydrological model for each time step
+        out, states, final_states = self._time_loop(
+            inputs={"p": p, "et": et},
+            parameters=parameters,
+            states={"si": si},
+            record_states=outputs is None or "internal_states" in outputs,
+            record_output=outputs is None or "y_hat" in outputs,
+        )
+
+        pred = {
             "y_hat": out,
             "parameters": parameters,
             "internal_states": states,
             "final_states": final_states,
         }
 
+        return select_outputs(pred=pred, outputs=outputs)
+
+    @staticmethod
+    def _step(
+        inputs: dict[str, torch.Tensor], parameters: dict[str, torch.Tensor], states: dict[str, torch.Tensor]
+    ) -> tuple[dict[str, torch.Tensor], torch.Tensor]:
+        """Advance the linear reservoir model one timestep.
+
+        Parameters
+        ----------
+        inputs: dict[str, torch.Tensor]
+            dictionary with the inputs of the timestep, as tensors of size [batch_size, n_conceptual_models].
+        parameters: dict[str, torch.Tensor]
+            dictionary with the parameterization of the timestep
+        states: dict[str, torch.Tensor]
+            dictionary with the internal states of the conceptual model at the end of the previous timestep
+
+        Returns
+        -------
+        Tuple[dict[str, torch.Tensor], torch.Tensor]
+            - states: dict[str, torch.Tensor]
+                Internal states of the conceptual model at the end of the timestep
+            - q_out: torch.Tensor
+                Outflow of the timestep, averaged over the conceptual models
+
+        """
+        si = states["si"]
+        zero = torch.zeros((), dtype=si.dtype, device=si.device)
+
+        # 1 bucket reservoir ------------------
+        si = si + inputs["p"]  # [mm]
+        ret = inputs["et"] * parameters["aux_ET"]  # [mm]
+        si = torch.maximum(zero, si - ret)  # [mm]
+        qi_out = si * parameters["ki"]  # [mm]
+        si = si - qi_out  # [mm]
+
+        # discharge
+        return {"si": si}, torch.mean(qi_out, dim=1)  # [mm]
+
     @property
     def _initial_states(self) -> dict[str, float]:
         return {
@@ -4,6 +4,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
+from hy2dl.modelzoo.cudalstm import stateful_lstm
 from hy2dl.modelzoo.inputlayer import InputLayer
 from hy2dl.utils.config import Config
 from hy2dl.utils.distributions import Distribution
@@ -64,6 +65,7 @@ class LSTMMDN(nn.Module):
 
         self.num_mixture_components = cfg.num_mixture_components
         self.predict_last_n = cfg.predict_last_n
+        self.seq_length = cfg.seq_length_hindcast
 
         self.output_features = cfg.output_features
 
@@ -119,6 +121,65 @@ class LSTMMDN(nn.Module):
         
         # Extract sequence of interest
         out = out[:, -self.predict_last_n:, :]
+
+        return self._head(out)
+
+    def forward_stateful(
+        self, sample: dict[str, torch.Tensor | dict[str, torch.Tensor]], verify: bool = False, atol: float = 1e-3
+    ) -> dict[str, torch.Tensor | dict[str, torch.Tensor]]:
+        """Stateful forward pass of LSTM-MDN over long sequences (e.g. the whole evaluation period of a basin).
+
+        The LSTM runs once over the whole sequence, carrying the states (h, c) forward, instead of once per window of
+        `seq_length` timesteps. Parameters and weights are NaN for the timesteps that are not preceded by a full
+        `seq_length` of (finite) inputs. The difference to the windowed path depends on the memory of the model and
+        can be large, so run the first basin with `verify=True` before using this method for evaluation. See
+        :py:func:`hy2dl.modelzoo.cudalstm.stateful_lstm`.
+
+        Parameters
+        ----------
+        sample: dict[str, torch.Tensor | dict[str, torch.Tensor]]
+            Dictionary with the different tensors / dictionaries of the whole sequence (see
+            `BaseDataset.full_sequence`).
+        verify: bool
+            If True, the hidden states are checked against the ones of the windowed path. This is as expensive as the
+            windowed path, so it is meant for a first basin.
+        atol: float
+            Absolute tolerance of the verification.
+
+        Returns
+        -------
+        dict
+            Dictionary containing:
+            - 'params': dict of distribution parameters [B, time_steps, K, T]
+            - 'weights': mixture weights of shape [B, time_steps, K, T]
+
+        """
+        x_lstm = self.embedding_net(sample)
+        out, valid = stateful_lstm(lstm=self.lstm, x=x_lstm, seq_length=self.seq_length, verify=verify, atol=atol)
+        pred = self._head(out)
+
+        valid = valid.view(valid.shape[0], valid.shape[1], 1, 1)
+        return {
+            "params": {k: torch.where(valid, v, torch.nan) for k, v in pred["params"].items()},
+            "weights": torch.where(valid, pred["weights"], torch.nan),
+        }
+
+    def _head(self, out: torch.Tensor) -> dict[str, torch.Tensor | dict[str, torch.Tensor]]:
+        """Map the hidden states of the LSTM to the parameters and weights of the mixture distribution.
+
+        Parameters
+        ----------
+        out : torch.Tensor
+            Hidden states of the LSTM [B, N, H]
+
+        Returns
+        -------
+        dict
+            Dictionary containing:
+            - 'params': dict of distribution parameters [B, N, K, T]
+            - 'weights': mixture weights of shape [B, N, K, T]
+
+        """
         out = self.dropout(out)
 
         # Probabilistic things
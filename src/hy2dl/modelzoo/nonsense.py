@@ -1,9 +1,11 @@
+import warnings
 from typing import Optional
 
 import torch
 
 from hy2dl.modelzoo.baseconceptualmodel import BaseConceptualModel
 from hy2dl.utils.config import Config
+from hy2dl.utils.utils import select_outputs
 
 
 class NonSense(BaseConceptualModel):
@@ -30,12 +32,21 @@ class NonSense(BaseConceptualModel):
         super(NonSense, self).__init__()
         self.n_conceptual_models = cfg.num_conceptual_models
         self.parameter_type = self._map_parameter_type(cfg=cfg)
+        self.compile_time_step = cfg.compile_conceptual_model
+        if cfg.compile_conceptual_model:
+            warnings.warn(
+                "compile_conceptual_model gives a small and inconsistent speedup for NonSense, and can be slower than "
+                "the eager loop for large batch sizes. Run benchmarks/conceptual_models_cpu.py to check it on your "
+                "hardware",
+                stacklevel=2,
+            )
 
     def forward(
         self,
         x_conceptual: dict[str, torch.Tensor],
         parameters: dict[str, torch.Tensor],
         initial_states: Optional[dict[str, torch.Tensor]] = None,
+        outputs: Optional[set[str]] = None,
     ) -> dict[str, torch.Tensor | dict[str, torch.Tensor]]:
         """Forward pass of the Nonsense model (conceptual model).
 
@@ -48,6 +59,9 @@ class NonSense(BaseConceptualModel):
         initial_states: Optional[dict[str, torch.Tensor]]
             Optional parameter! In case one wants to specify the initial state of the internal states of the conceptual
             model.
+        outputs: Optional[set[str]]
+            Optional parameter! Names of the outputs to return (e.g. {"y_hat"}). If None, all the outputs are
+            returned. The time evolution of the internal states is only recorded if "internal_states" is requested.
 
         Returns
         -------
@@ -62,15 +76,10 @@ class NonSense(BaseConceptualModel):
                 Internal states of the conceptual model for the last time-step
 
         """
-        # initialize structures to store the information
-        states, out = self._initialize_information(conceptual_inputs=x_conceptual)
-
         # initialize constants
-        batch_size, seq_length = x_conceptual["precipitation"].shape
+        batch_size = x_conceptual["precipitation"].shape[0]
         device = x_conceptual["precipitation"].device
         zero = torch.tensor(0.0, dtype=torch.float32, device=device)
-        one = torch.tensor(1.0, dtype=torch.float32, device=device)
-        klu = torch.tensor(0.90, dtype=torch.float32, device=device)  # land use correction factor [-]
 
         # Reshape tensor to consider multiple conceptual models running in parallel
         precipitation = torch.tile(x_conceptual["precipitation"].unsqueeze(2), (1, 1, self.n_conceptual_models))
@@ -122,54 +131,81 @@ class NonSense(BaseConceptualModel):
             su = initial_states["su"]
 
         # Run hydrologycal model for every time step
-        for j in range(seq_length):
-            # Snow module --------------------------
-            qs_out = torch.minimum(ss, snow_melt[:, j, :])
-            ss = ss - qs_out + snow[:, j, :]
-            qsp_out = qs_out + liquid_p[:, j, :]
-
-            # Baseflow reservoir -------------------
-            sb = sb + qsp_out  # [mm]
-            qb_out = sb / parameters["kb"][:, j, :]  # [mm]
-            sb = sb - qb_out  # [mm]
-
-            # Interflow
-            si = si + qb_out  # [mm]
-            qi_out = si / parameters["ki"][:, j, :]  # [mm]
-            si = si - qi_out  # [mm]
-
-            # Unsaturated zone --------------------
-            psi = (su / parameters["sumax"][:, j, :]) ** parameters["beta"][:, j, :]  # [-]
-            su_temp = su + qi_out * (1 - psi)
-            su = torch.minimum(su_temp, parameters["sumax"][:, j, :])
-            qu_out = qi_out * psi + torch.maximum(zero, su_temp - parameters["sumax"][:, j, :])  # [mm]
-
-            # Evapotranspiration -----------------
-            ktetha = su / parameters["sumax"][:, j, :]
-            et_mask = su <= pwp[:, j, :]
-            ktetha[~et_mask] = one
-            ret = et[:, j, :] * klu * ktetha  # [mm]
-            su = torch.maximum(zero, su - ret)  # [mm]
-
-            # Save internal states
-            states["ss"][:, j, :] = ss
-            states["sb"][:, j, :] = sb
-            states["si"][:, j, :] = si
-            states["su"][:, j, :] = su
-
-            # Outflow
-            out[:, j, 0] = torch.mean(qu_out, dim=1)  # [mm]
-
-        # Save last states
-        final_states = self._get_final_states(states=states)
-
-        return {
+        out, states, final_states = self._time_loop(
+            inputs={"snow_melt": snow_melt, "liquid_p": liquid_p, "snow": snow, "et": et, "pwp": pwp},
+            parameters=parameters,
+            states={"ss": ss, "sb": sb, "si": si, "su": su},
+            record_states=outputs is None or "internal_states" in outputs,
+            record_output=outputs is None or "y_hat" in outputs,
+        )
+
+        pred = {
             "y_hat": out,
             "parameters": parameters,
             "internal_states": states,
             "final_states": final_states,
         }
 
+        return select_outputs(pred=pred, outputs=outputs)
+
+    @staticmethod
+    def _step(
+        inputs: dict[str, torch.Tensor], parameters: dict[str, torch.Tensor], states: dict[str, torch.Tensor]
+    ) -> tuple[dict[str, torch.Tensor], torch.Tensor]:
+        """Advance the Nonsense model one time-step.
+
+        Parameters
+        ----------
+        inputs: dict[str, torch.Tensor]
+            dictionary with the inputs of the time-step, as tensors of size [batch_size, n_conceptual_models].
+        parameters: dict[str, torch.Tensor]
+            dict with parametrization of the time-step.
+        states: dict[str, torch.Tensor]
+            Internal states of the conceptual model at the end of the previous time-step.
+
+        Returns
+        -------
+        Tuple[dict[str, torch.Tensor], torch.Tensor]
+            - states: dict[str, torch.Tensor]
+                Internal states of the conceptual model at the end of the time-step
+            - q_out: torch.Tensor
+                Outflow of the time-step, averaged over the conceptual models
+
+        """
+        ss, sb, si, su = states["ss"], states["sb"], states["si"], states["su"]
+        zero = torch.zeros((), dtype=ss.dtype, device=ss.device)
+        one = torch.ones((), dtype=ss.dtype, device=ss.device)
+        klu = torch.full((), 0.90, dtype=ss.dtype, device=ss.device)  # land use correction factor [-]
+
+        # Snow module --------------------------
+        qs_out = torch.minimum(ss, inputs["snow_melt"])
+        ss = ss - qs_out + inputs["snow"]
+        qsp_out = qs_out + inputs["liquid_p"]
+
+        # Baseflow reservoir -------------------
+        sb = sb + qsp_out  # [mm]
+        qb_out = sb / parameters["kb"]  # [mm]
+        sb = sb - qb_out  # [mm]
+
+        # Interflow
+        si = si + qb_out  # [mm]
+        qi_out = si / parameters["ki"]  # [mm]
+        si = si - qi_out  # [mm]
+
+        # Unsaturated zone --------------------
+        psi = (su / parameters["sumax"]) ** parameters["beta"]  # [-]
+        su_temp = su + qi_out * (1 - psi)
+        su = torch.minimum(su_temp, parameters["sumax"])
+        qu_out = qi_out * psi + torch.maximum(zero, su_temp - parameters["sumax"])  # [mm]
+
+        # Evapotranspiration -----------------
+        ktetha = torch.where(su <= inputs["pwp"], su / parameters["sumax"], one)
+        ret = inputs["et"] * klu * ktetha  # [mm]
+        su = torch.maximum(zero, su - ret)  # [mm]
+
+        # Outflow
+        return {"ss": ss, "sb": sb, "si": si, "su": su}, torch.mean(qu_out, dim=1)  # [mm]
+
     @property
     def _initial_states(self) -> dict[str, float]:
         return {"ss": 0.0, "su": 5.0, "si": 10.0, "sb": 15.0}
@@ -4,6 +4,7 @@ import torch
 
 from hy2dl.modelzoo.baseconceptualmodel import BaseConceptualModel
 from hy2dl.utils.config import Config
+from hy2dl.utils.utils import select_outputs
 
 
 class SHM(BaseConceptualModel):
@@ -32,12 +33,14 @@ class SHM(BaseConceptualModel):
         super(SHM, self).__init__()
         self.n_conceptual_models = cfg.num_conceptual_models
         self.parameter_type = self._map_parameter_type(cfg=cfg)
+        self.compile_time_step = cfg.compile_conceptual_model
 
     def forward(
         self,
         x_conceptual: dict[str, torch.Tensor],
         parameters: dict[str, torch.Tensor],
         initial_states: Optional[dict[str, torch.Tensor]] = None,
+        outputs: Optional[set[str]] = None,
     ) -> dict[str, torch.Tensor | dict[str, torch.Tensor]]:
         """Forward pass on the SHM model.
 
@@ -50,6 +53,9 @@ class SHM(BaseConceptualModel):
         initial_states: Optional[dict[str, torch.Tensor]]
             Optional parameter! In case one wants to specify the initial state of the internal states of the conceptual
             model.
+        outputs: Optional[set[str]]
+            Optional parameter! Names of the outputs to return (e.g. {"y_hat"}). If None, all the outputs are
+            returned. The time evolution of the internal states is only recorded if "internal_states" is requested.
 
         Returns
         -------
@@ -64,15 +70,10 @@ class SHM(BaseConceptualModel):
                 Internal states of the conceptual model in the last timestep
 
         """
-        # initialize structures to store the information
-        states, out = self._initialize_information(conceptual_inputs=x_conceptual)
-
         # initialize constants
-        batch_size, seq_length = x_conceptual["precipitation"].shape
+        batch_size = x_conceptual["precipitation"].shape[0]
         device = x_conceptual["precipitation"].device
         zero = torch.tensor(0.0, dtype=torch.float32, device=device)
-        one = torch.tensor(1.0, dtype=torch.float32, device=device)
-        klu = torch.tensor(0.90, dtype=torch.float32, device=device)  # land use correction factor [-]
 
         # Reshape tensor to consider multiple conceptual models running in parallel
         precipitation = torch.tile(x_conceptual["precipitation"].unsqueeze(2), (1, 1, self.n_conceptual_models))
@@ -132,65 +133,91 @@ class SHM(BaseConceptualModel):
             sb = initial_states["sb"]
 
         # run hydrological model for each time step
-        for j in range(seq_length):
-            # Snow module --------------------------
-            qs_out = torch.minimum(ss, snow_melt[:, j, :])
-            ss = ss - qs_out + snow[:, j, :]
-            qsp_out = qs_out + liquid_p[:, j, :]
-
-            # Split snowmelt+rainfall into inflow to fastflow reservoir and unsaturated reservoir ------
-            qf_in = torch.maximum(zero, qsp_out - parameters["f_thr"][:, j, :])
-            qu_in = torch.minimum(qsp_out, parameters["f_thr"][:, j, :])
-
-            # Fastflow module ----------------------
-            sf = sf + qf_in
-            qf_out = sf * parameters["kf"][:, j, :]
-            sf = sf - qf_out
-
-            # Unsaturated zone----------------------
-            psi = (su / parameters["sumax"][:, j, :]) ** parameters["beta"][:, j, :]  # [-]
-            su_temp = su + qu_in * (1 - psi)
-            su = torch.minimum(su_temp, parameters["sumax"][:, j, :])
-            qu_out = qu_in * psi + torch.maximum(zero, su_temp - parameters["sumax"][:, j, :])  # [mm]
-            # Evapotranspiration -------------------
-            ktetha = su / parameters["sumax"][:, j, :]
-            et_mask = su <= pwp[:, j, :]
-            ktetha[~et_mask] = one
-            ret = et[:, j, :] * klu * ktetha  # [mm]
-            su = torch.maximum(zero, su - ret)  # [mm]
-
-            # Interflow reservoir ------------------
-            qi_in = qu_out * parameters["perc"][:, j, :]  # [mm]
-            si = si + qi_in  # [mm]
-            qi_out = si * parameters["ki"][:, j, :]  # [mm]
-            si = si - qi_out  # [mm]
-
-            # Baseflow reservoir -------------------
-            qb_in = qu_out * (one - parameters["perc"][:, j, :])  # [mm]
-            sb = sb + qb_in  # [mm]
-            qb_out = sb * parameters["kb"][:, j, :]  # [mm]
-            sb = sb - qb_out
-
-            # Store time evolution of the internal states
-            states["ss"][:, j, :] = ss
-            states["sf"][:, j, :] = sf
-            states["su"][:, j, :] = su
-            states["si"][:, j, :] = si
-            states["sb"][:, j, :] = sb
-
-            # total outflow
-            out[:, j, 0] = torch.mean(qf_out + qi_out + qb_out, dim=1)  # [mm]
-
-        # last states
-        final_states = self._get_final_states(states=states)
-
-        return {
+        out, states, final_states = self._time_loop(
+            inputs={"snow_melt": snow_melt, "liquid_p": liquid_p, "snow": snow, "et": et, "pwp": pwp},
+            parameters=parameters,
+            states={"ss": ss, "sf": sf, "su": su, "si": si, "sb": sb},
+            record_states=outputs is None or "internal_states" in outputs,
+            record_output=outputs is None or "y_hat" in outputs,
+        )
+
+        pred = {
             "y_hat": out,
             "parameters": parameters,
             "internal_states": states,
             "final_states": final_states,
         }
 
+        return select_outputs(pred=pred, outputs=outputs)
+
+    @staticmethod
+    def _step(
+        inputs: dict[str, torch.Tensor], parameters: dict[str, torch.Tensor], states: dict[str, torch.Tensor]
+    ) -> tuple[dict[str, torch.Tensor], torch.Tensor]:
+        """Advance the SHM model one timestep.
+
+        Parameters
+        ----------
+        inputs: dict[str, torch.Tensor]
+            Dictionary with the inputs of the timestep, as tensors of size [batch_size, n_conceptual_models].
+        parameters: dict[str, torch.Tensor]
+            Dictionary with the parameterization of the timestep
+        states: dict[str, torch.Tensor]
+            Dictionary with the internal states of the conceptual model at the end of the previous timestep
+
+        Returns
+        -------
+        Tuple[dict[str, torch.Tensor], torch.Tensor]
+            - states: dict[str, torch.Tensor]
+                Internal states of the conceptual model at the end of the timestep
+            - q_out: torch.Tensor
+                Outflow of the timestep, averaged over the conceptual models
+
+        """
+        ss, sf, su, si, sb = states["ss"], states["sf"], states["su"], states["si"], states["sb"]
+        zero = torch.zeros((), dtype=ss.dtype, device=ss.device)
+        one = torch.ones((), dtype=ss.dtype, device=ss.device)
+        klu = torch.full((), 0.90, dtype=ss.dtype, device=ss.device)  # land use correction factor [-]
+
+        # Snow module --------------------------
+        qs_out = torch.minimum(ss, inputs["snow_melt"])
+        ss = ss - qs_out + inputs["snow"]
+        qsp_out = qs_out + inputs["liquid_p"]
+
+        # Split snowmelt+rainfall into inflow to fastflow reservoir and unsaturated reservoir ------
+        qf_in = torch.maximum(zero, qsp_out - parameters["f_thr"])
+        qu_in = torch.minimum(qsp_out, parameters["f_thr"])
+
+        # Fastflow module ----------------------
+        sf = sf + qf_in
+        qf_out = sf * parameters["kf"]
+        sf = sf - qf_out
+
+        # Unsaturated zone----------------------
+        psi = (su / parameters["sumax"]) ** parameters["beta"]  # [-]
+        su_temp = su + qu_in * (1 - psi)
+        su = torch.minimum(su_temp, parameters["sumax"])
+        qu_out = qu_in * psi + torch.maximum(zero, su_temp - parameters["sumax"])  # [mm]
+        # Evapotranspiration -------------------
+        ktetha = torch.where(su <= inputs["pwp"], su / parameters["sumax"], one)
+        ret = inputs["et"] * klu * ktetha  # [mm]
+        su = torch.maximum(zero, su - ret)  # [mm]
+
+        # Interflow reservoir ------------------
+        qi_in = qu_out * parameters["perc"]  # [mm]
+        si = si + qi_in  # [mm]
+        qi_out = si * parameters["ki"]  # [mm]
+        si = si - qi_out  # [mm]
+
+        # Baseflow reservoir -------------------
+        qb_in = qu_out * (one - parameters["perc"])  # [mm]
+        sb = sb + qb_in  # [mm]
+        qb_out = sb * parameters["kb"]  # [mm]
+        sb = sb - qb_out
+
+        # total outflow
+        return {"ss": ss, "sf": sf, "su": su, "si": si, "sb": sb}, torch.mean(qf_out + qi_out + qb_out, dim=1)  # [mm]
+
     @property
     def _initial_states(self) -> dict[str, float]:
         return {"ss": 0.001, "sf": 0.001, "su": 0.001, "si": 0.001, "sb": 0.001}
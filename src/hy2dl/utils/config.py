@@ -143,13 +143,17 @@ class Config(object):
                     )
 
     def _check_num_workers(self):
-        """Checks if the number of workers that will be used in the dataloaders is valid."""
+        """Checks if the number of workers that will be used in the dataloaders and to ingest the data is valid."""
         num_workers = self.num_workers
         if num_workers < 0:
             raise ValueError(f"num_workers must be non-negative, got {num_workers}.")
         elif num_workers > 0 and os.cpu_count() < num_workers:
             raise RuntimeError(f"num_workers ({num_workers}) must be less than number of cores ({os.cpu_count()}).")
 
+        num_ingest_workers = self.num_ingest_workers
+        if num_ingest_workers < 0:
+            raise ValueError(f"num_ingest_workers must be non-negative, got {num_ingest_workers}.")
+
     def _check_seq_length(self):
         """Checks the consistency of sequence length when custom_seq_processing is used."""
         if self.custom_seq_processing:
@@ -302,10 +306,22 @@ class Config(object):
     def batch_size_evaluation(self) -> int:
         return self._cfg.get("batch_size_evaluation", self.batch_size_training)
 
+    @property
+    def cache_max_size_gb(self) -> float:
+        return self._cfg.get("cache_max_size_gb", 10.0)
+
+    @property
+    def compile_conceptual_model(self) -> bool:
+        return self._cfg.get("compile_conceptual_model", False)
+
     @property
     def conceptual_model(self) -> Optional[str]:
         return self._cfg.get("conceptual_model")
 
+    @property
+    def contiguous_storage(self) -> bool:
+        return self._cfg.get("contiguous_storage", False)
+
     @property
     def custom_seq_processing(self) -> Optional[dict[str, dict[str, int]]]:
         return self._cfg.get("custom_seq_processing")
@@ -318,6 +334,10 @@ class Config(object):
     def dataset(self) -> str:
         return self._cfg.get("dataset")
 
+    @property
+    def deduplicate_inputs(self) -> bool:
+        return self._cfg.get("deduplicate_inputs", False)
+
     @property
     def device(self) -> str:
         return self._device
@@ -385,6 +405,10 @@ class Config(object):
     def lagged_features(self) -> Optional[dict[str, int | list[int]]]:
         return self._cfg.get("lagged_features")
 
+    @property
+    def lean_storage(self) -> bool:
+        return self._cfg.get("lean_storage", False)
+
     @property
     def learning_rate(self) -> float | dict[str, float]:
         return self._cfg.get("learning_rate", 0.001)
@@ -413,6 +437,10 @@ class Config(object):
     def nan_probabilistic_masking(self, value: bool) -> None:
         self._cfg["nan_probabilistic_masking"] = value
 
+    @property
+    def num_ingest_workers(self) -> int:
+        return self._cfg.get("num_ingest_workers", 0)
+
     @property
     def num_mixture_components(self) -> int:
         return self._cfg.get("num_mixture_components")
@@ -435,6 +463,11 @@ class Config(object):
         path = self._cfg.get("path_additional_features")
         return Path(path) if path else None
     
+    @property
+    def path_cache(self) -> Optional[Path]:
+        path = self._cfg.get("path_cache")
+        return Path(path) if path else None
+
     @property
     def path_entities(self) -> Optional[Path]:
         path = self._cfg.get("path_entities")
@@ -475,6 +508,11 @@ class Config(object):
         else:
             return Path(f"../results/{self.experiment_name}_seed_{self.random_seed}")
 
+    @property
+    def path_timeseries(self) -> Optional[Path]:
+        path = self._cfg.get("path_timeseries")
+        return Path(path) if path else None
+
     @property
     def predict_last_n(self) -> int:
         return self._cfg.get("predict_last_n", 1)
@@ -501,6 +539,10 @@ class Config(object):
     def random_seed(self, value: int):
         self._cfg["random_seed"] = value
 
+    @property
+    def read_float32(self) -> bool:
+        return self._cfg.get("read_float32", False)
+
     @property
     def routing_model(self) -> Optional[str]:
         return self._cfg.get("routing_model")
@@ -538,6 +580,10 @@ class Config(object):
     def steplr_gamma(self) -> Optional[float]:
         return self._cfg.get("steplr_gamma")
 
+    @property
+    def storage_dtype(self) -> str:
+        return self._cfg.get("storage_dtype", "float32")
+
     @property
     def target(self) -> list[str]:
         return Config._as_default_list(self._cfg.get("target"))
@@ -550,6 +596,10 @@ class Config(object):
     def testing_period(self) -> list[str]:
         return self._cfg.get("testing_period")
 
+    @property
+    def timeseries_format(self) -> str:
+        return self._cfg.get("timeseries_format", "csv")
+
     @property
     def training_period(self) -> list[str]:
         return self._cfg.get("training_period")
@@ -573,6 +623,10 @@ class Config(object):
     @property
     def validation_period(self) -> list[str]:
         return self._cfg.get("validation_period")
+
+    @property
+    def virtual_lagged_features(self) -> bool:
+        return self._cfg.get("virtual_lagged_features", False)
     
     @property
     def pre_trained_path(self) -> Path:
@@ -1,4 +1,5 @@
 import random
+from typing import Optional
 
 import numpy as np
 import torch
@@ -25,6 +26,39 @@ def upload_to_device(sample: dict, device):
     return sample
 
 
+def select_outputs(
+    pred: dict[str, torch.Tensor | dict[str, torch.Tensor]], outputs: Optional[set[str]]
+) -> dict[str, torch.Tensor | dict[str, torch.Tensor]]:
+    """Keep only the requested outputs of a forward pass.
+
+    Parameters
+    ----------
+    pred : dict[str, torch.Tensor | dict[str, torch.Tensor]]
+        All the outputs of the forward pass.
+    outputs : Optional[set[str]]
+        Names of the outputs to return. If None, all the outputs are returned.
+
+    Returns
+    -------
+    dict[str, torch.Tensor | dict[str, torch.Tensor]]
+        Requested outputs of the forward pass.
+
+    Raises
+    ------
+    ValueError
+        If any of the requested outputs is not an output of the forward pass.
+
+    """
+    if outputs is None:
+        return pred
+
+    unknown_outputs = set(outputs) - pred.keys()
+    if unknown_outputs:
+        raise ValueError(f"Unknown outputs {sorted(unknown_outputs)}. Available outputs: {list(pred)}")
+
+    return {name: value for name, value in pred.items() if name in outputs}
+
+
 def set_random_seed(cfg: Config):
     """Set a seed for various packages to be able to reproduce the results.
 
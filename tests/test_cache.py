@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hy2dl.datasetzoo.cache import DataCache
+
+
+def _frame(n_steps: int = 100) -> pd.DataFrame:
+    index = pd.date_range("2000-01-01", periods=n_steps, freq="D", name="date")
+    return pd.DataFrame({"a": np.arange(n_steps, dtype=np.float64), "b": np.ones(n_steps)}, index=index)
+
+
+def test_save_returns_loaded_frame(tmp_path):
+    cache = DataCache(tmp_path, max_size_gb=1.0)
+    df = _frame()
+
+    saved = cache.save("data_a", df)
+
+    pd.testing.assert_frame_equal(saved, cache.load("data_a"))
+    np.testing.assert_array_equal(saved.to_numpy(), df.to_numpy(dtype=np.float32))
+
+
+def test_entry_larger_than_limit_is_not_evicted_by_its_own_save(tmp_path):
+    cache = DataCache(tmp_path, max_size_gb=1e-6)  # ~1 kB, smaller than any entry
+
+    saved = cache.save("data_a", _frame())
+
+    assert saved is not None
+    assert cache.load("data_a") is not None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = DataCache(tmp_path, max_size_gb=1e-6)
+
+    cache.save("data_a", _frame())
+    cache.save("data_b", _frame())
+
+    assert cache.load("data_a") is None
+    assert cache.load("data_b") is not None
+
+
+def test_non_numeric_columns_are_dropped_with_a_warning(tmp_path):
+    cache = DataCache(tmp_path, max_size_gb=1.0)
+    df = _frame().assign(name="basin")
+
+    with pytest.warns(UserWarning, match="name"):
+        saved = cache.save("data_a", df)
+
+    assert list(saved.columns) == ["a", "b"]
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hy2dl.datasetzoo.basedataset import BaseDataset
+
+
+def _fill_gaps_loop(series: pd.Series) -> pd.Series:
+    """Gap filling of hourly precipitation as done before `BaseDataset.fill_gaps` (one iteration per gap)."""
+    df_filled = series.to_frame(name="col")
+    df_filled["is_missing"] = df_filled["col"].isna()
+    df_filled["missing_group"] = (df_filled["is_missing"] != df_filled["is_missing"].shift()).cumsum() * df_filled[
+        "is_missing"
+    ]
+    gap_lengths = df_filled[df_filled["is_missing"]].groupby("missing_group").size()
+    for group_id, gap_length in gap_lengths.items():
+        if gap_length <= 3:
+            df_filled.loc[df_filled["missing_group"] == group_id, "col"] = df_filled["col"].interpolate(method="linear")
+        elif 3 < gap_length <= 6:
+            missing_indices = df_filled[df_filled["missing_group"] == group_id].index
+            before = missing_indices[0] - pd.Timedelta(hours=1)
+            after = missing_indices[-1] + pd.Timedelta(hours=1)
+            before_value = df_filled.loc[before, "col"] if before in df_filled.index else np.nan
+            after_value = df_filled.loc[after, "col"] if after in df_filled.index else np.nan
+            if before_value == 0 and after_value == 0:
+                df_filled.loc[df_filled["missing_group"] == group_id, "col"] = 0
+
+    return df_filled["col"].rename(series.name)
+
+
+def _series(values: list[float]) -> pd.Series:
+    index = pd.date_range("2000-01-01", periods=len(values), freq="h", name="date")
+    return pd.Series(values, index=index, dtype=np.float64, name="precipitation")
+
+
+nan = np.nan
+CASES = {
+    "leading_gap": [nan, nan, 1.0, 2.0, 3.0],
+    "leading_gap_of_zeros": [nan, nan, nan, nan, 0.0, 0.0],
+    "trailing_gap": [1.0, 2.0, nan, nan],
+    "trailing_gap_of_zeros": [0.0, 1.0, 0.0, nan, nan, nan, nan],
+    "gap_of_interpolation_threshold": [1.0, nan, nan, nan, 5.0],
+    "gap_above_interpolation_threshold": [1.0, nan, nan, nan, nan, 6.0],
+    "zero_gap_of_threshold": [0.0, nan, nan, nan, nan, nan, nan, 0.0],
+    "zero_gap_above_threshold": [0.0, nan, nan, nan, nan, nan, nan, nan, 0.0],
+    "zero_gap_with_one_non_zero_neighbour": [0.0, nan, nan, nan, nan, 1.0],
+    "zero_runs": [0.0, 0.0, nan, nan, nan, nan, 0.0, 0.0, nan, nan, nan, nan, nan, 0.0, nan, 0.0],
+    "all_missing": [nan, nan, nan],
+    "no_missing": [0.0, 1.0, 2.0],
+}
+
+
+@pytest.mark.parametrize("name", list(CASES))
+def test_fill_gaps_matches_loop(name):
+    series = _series(CASES[name])
+
+    pd.testing.assert_series_equal(BaseDataset.fill_gaps(series=series), _fill_gaps_loop(series=series))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_fill_gaps_matches_loop_on_random_series(seed):
+    rng = np.random.default_rng(seed)
+    n_steps = int(rng.integers(1, 200))
+    values = np.where(rng.random(n_steps) < 0.5, 0.0, rng.gamma(1.0, 1.0, n_steps))
+    for _ in range(int(rng.integers(0, 10))):
+        start = int(rng.integers(0, n_steps))
+        values[start : start + int(rng.integers(1, 9))] = np.nan
+    series = _series(list(values))
+
+    pd.testing.assert_series_equal(BaseDataset.fill_gaps(series=series), _fill_gaps_loop(series=series))
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from hy2dl.datasetzoo.basedataset import BaseDataset
+from hy2dl.utils.config import Config
+
+BASINS = ["b1", "b2", "b3"]
+
+CONFIGS = {
+    "single_frequency": {
+        "dynamic_input": ["p", "t", "p_shift1", "p_shift3", "q_shift2"],
+        "lagged_features": {"p": [1, 3], "q": 2},
+        "seq_length": 10,
+        "predict_last_n": 2,
+    },
+    "custom_seq_processing": {
+        "dynamic_input": ["p", "t", "p_shift1", "t_shift4"],
+        "lagged_features": {"p": 1, "t": [4]},
+        "custom_seq_processing": {"low": {"n_steps": 3, "freq_factor": 4}, "high": {"n_steps": 6, "freq_factor": 1}},
+        "custom_seq_processing_flag": True,
+        "seq_length": 18,
+        "predict_last_n": 1,
+    },
+    "forecast": {
+        "dynamic_input": ["p", "t", "p_shift2"],
+        "forecast_input": ["p", "t", "p_shift1"],
+        "lagged_features": {"p": [1, 2]},
+        "seq_length_hindcast": 8,
+        "seq_length_forecast": 3,
+        "predict_last_n": 3,
+    },
+}
+
+
+class _SyntheticDataset(BaseDataset):
+    """Dataset with random daily time series (with NaN runs) and attributes.
+
+    The time series cover the whole period without missing dates. At missing dates, the virtual lagged features take
+    the value of the feature at the lagged date, while the lagged columns are NaN.
+    """
+
+    def _read_attributes(self) -> pd.DataFrame:
+        rng = np.random.default_rng(0)
+        return pd.DataFrame(rng.normal(size=(len(BASINS), 2)), index=BASINS, columns=["area", "elev"])
+
+    def _read_data(
+        self,
+        catch_id: str,
+        columns: list[str] | None = None,
+        period: tuple[pd.Timestamp, pd.Timestamp] | None = None,
+        n_warmup: int = 0,
+    ) -> pd.DataFrame:
+        rng = np.random.default_rng(BASINS.index(catch_id))
+        n_steps = 200 + 20 * BASINS.index(catch_id)
+        index = pd.date_range("2000-01-01", periods=n_steps, freq="D", name="date")
+        df = pd.DataFrame(rng.gamma(1.0, 2.0, size=(n_steps, 3)), index=index, columns=["p", "t", "q"])
+        for column in df.columns:
+            start = rng.integers(0, n_steps - 5)
+            df.iloc[start : start + rng.integers(1, 5), df.columns.get_loc(column)] = np.nan
+        return df
+
+
+def _dataset(tmp_path, name: str, virtual: bool, contiguous: bool) -> BaseDataset:
+    cfg = Config(
+        {
+            "target": ["q"],
+            "static_input": ["area", "elev"],
+            "model": "cudalstm",
+            "training_period": ["2000-01-20", "2000-06-30"],
+            "path_save_folder": str(tmp_path),
+            "experiment_name": "test",
+            "virtual_lagged_features": virtual,
+            "contiguous_storage": contiguous,
+            **CONFIGS[name],
+        },
+        dev_mode=True,
+    )
+    cfg.init_experiment()
+    dataset = _SyntheticDataset(cfg=cfg, time_period="training", entities_ids=BASINS)
+    dataset.calculate_global_statistics()
+    dataset.standardize_data()
+    return dataset
+
+
+def _assert_samples_equal(x, y):
+    if isinstance(x, dict):
+        assert x.keys() == y.keys()
+        for k in x:
+            _assert_samples_equal(x[k], y[k])
+    elif isinstance(x, torch.Tensor):
+        torch.testing.assert_close(x, y, rtol=0, atol=0, equal_nan=True)
+    else:
+        np.testing.assert_array_equal(x, y)
+
+
+@pytest.mark.parametrize("contiguous", [False, True])
+@pytest.mark.parametrize("name", list(CONFIGS))
+def test_virtual_lagged_features_match_lagged_columns(tmp_path, name, contiguous):
+    materialized = _dataset(tmp_path, name=name, virtual=False, contiguous=contiguous)
+    virtual = _dataset(tmp_path, name=name, virtual=True, contiguous=contiguous)
+
+    assert virtual.lagged_columns and not materialized.lagged_columns
+    assert virtual.entity_table == materialized.entity_table
+    np.testing.assert_array_equal(virtual.valid_entities_basin, materialized.valid_entities_basin)
+    np.testing.assert_array_equal(virtual.valid_entities_time, materialized.valid_entities_time)
+    _assert_samples_equal(virtual.scaler, materialized.scaler)
+    for i in range(len(materialized)):
+        _assert_samples_equal(virtual[i], materialized[i])
@@ -0,0 +1,52 @@
+import pytest
+import torch
+
+from hy2dl.modelzoo.cudalstm import CudaLSTM
+from hy2dl.modelzoo.hybrid import Hybrid
+from hy2dl.utils.config import Config
+from hy2dl.utils.utils import select_outputs
+
+
+def test_select_outputs():
+    pred = {"y_hat": torch.zeros(1), "hs": torch.ones(1)}
+
+    assert select_outputs(pred=pred, outputs=None) is pred
+    assert list(select_outputs(pred=pred, outputs={"hs"})) == ["hs"]
+    with pytest.raises(ValueError, match="Unknown outputs \\['y'\\]"):
+        select_outputs(pred=pred, outputs={"y_hat", "y"})
+
+
+def test_cudalstm_rejects_unknown_outputs():
+    cfg = Config(
+        {"dynamic_input": ["p", "t"], "target": ["q"], "model": "cudalstm", "hidden_size": 4, "seq_length": 5},
+        dev_mode=True,
+    )
+    model = CudaLSTM(cfg=cfg)
+    sample = {"x_d": {"p": torch.rand(2, 5), "t": torch.rand(2, 5)}}
+
+    assert list(model(sample, outputs={"y_hat"})) == ["y_hat"]
+    with pytest.raises(ValueError, match="Unknown outputs"):
+        model(sample, outputs={"y_hat", "h"})
+
+
+def test_hybrid_rejects_unknown_outputs():
+    cfg = Config(
+        {
+            "dynamic_input": ["p", "t"],
+            "target": ["q"],
+            "model": "hybrid",
+            "conceptual_model": "linear_reservoir",
+            "dynamic_input_conceptual_model": {"precipitation": "p", "pet": "t"},
+            "hidden_size": 4,
+            "seq_length": 6,
+            "predict_last_n": 3,
+        },
+        dev_mode=True,
+    )
+    model = Hybrid(cfg=cfg)
+    x_d = {"p": torch.rand(2, 6), "t": torch.rand(2, 6)}
+    sample = {"x_d": x_d, "x_d_conceptual": {"precipitation": x_d["p"], "pet": x_d["t"]}}
+
+    assert set(model(sample, outputs={"y_hat", "hs"})) == {"y_hat", "hs"}
+    with pytest.raises(ValueError, match="Unknown outputs"):
+        model(sample, outputs={"y_hat", "states"})
@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+import pytest
+from numpy.lib.stride_tricks import sliding_window_view
+
+from hy2dl.datasetzoo.basedataset import BaseDataset
+from hy2dl.utils.config import Config
+
+VARIABLES = ["p", "t", "pet", "q_lag", "p_fc", "t_fc"]
+NAN_PROBABILITY = {"g1": {"nan_seq": 0.0, "nan_step": 0.0}, "g2": {"nan_seq": 0.2, "nan_step": 0.1}}
+
+CONFIGS = {
+    "single_group": {"dynamic_input": ["p", "t", "pet"], "seq_length": 20, "predict_last_n": 3},
+    "groups": {
+        "dynamic_input": {"g1": ["p", "t"], "g2": ["pet", "q_lag"]},
+        "nan_handling_method": "masked_mean",
+        "dynamic_embedding": {"hiddens": [8]},
+        "seq_length": 20,
+        "predict_last_n": 1,
+    },
+    "groups_with_mandatory": {
+        "dynamic_input": {"g1": ["p", "t"], "g2": ["pet", "q_lag"]},
+        "nan_handling_method": "input_replacement",
+        "nan_probability": NAN_PROBABILITY,
+        "dynamic_embedding": {"hiddens": [8]},
+        "seq_length": 20,
+        "predict_last_n": 4,
+    },
+    "forecast": {
+        "dynamic_input": ["p", "t", "pet"],
+        "forecast_input": ["p_fc", "t_fc"],
+        "dynamic_embedding": {"hiddens": [8]},
+        "seq_length_hindcast": 15,
+        "seq_length_forecast": 5,
+        "predict_last_n": 5,
+    },
+    "forecast_groups": {
+        "dynamic_input": {"g1": ["p", "t"], "g2": ["pet"]},
+        "forecast_input": {"g1": ["p_fc"], "g2": ["t_fc"]},
+        "nan_handling_method": "masked_mean",
+        "nan_probability": NAN_PROBABILITY,
+        "dynamic_embedding": {"hiddens": [8]},
+        "seq_length_hindcast": 15,
+        "seq_length_forecast": 4,
+        "predict_last_n": 2,
+    },
+    "custom_seq_processing": {
+        "dynamic_input": {"1D": ["p", "t"], "1h": ["p", "t", "pet"]},
+        "custom_seq_processing": {"1D": {"n_steps": 3, "freq_factor": 6}, "1h": {"n_steps": 6, "freq_factor": 1}},
+        "dynamic_embedding": {"hiddens": [8]},
+        "seq_length": 24,
+        "predict_last_n": 2,
+    },
+    "custom_seq_processing_groups": {
+        "dynamic_input": {"1D": {"g1": ["p", "t"], "g2": ["pet"]}, "1h": ["p", "t"]},
+        "custom_seq_processing": {"1D": {"n_steps": 3, "freq_factor": 6}, "1h": {"n_steps": 6, "freq_factor": 1}},
+        "nan_handling_method": "input_replacement",
+        "nan_probability": NAN_PROBABILITY,
+        "dynamic_embedding": {"hiddens": [8]},
+        "seq_length": 24,
+        "predict_last_n": 2,
+    },
+}
+
+
+def _dataset(name: str) -> BaseDataset:
+    cfg = Config({"target": ["q"], "model": "cudalstm", **CONFIGS[name]}, dev_mode=True)
+    dataset = BaseDataset.__new__(BaseDataset)
+    dataset.cfg = cfg
+    dataset.hindcast_input = BaseDataset.unique_values(x=cfg.dynamic_input)
+    return dataset
+
+
+def _frame(n_steps: int, seed: int) -> pd.DataFrame:
+    """Time series with random NaN runs, including runs at the start and the end of the series."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(n_steps, len(VARIABLES) + 1)), columns=[*VARIABLES, "q"])
+    for column in df.columns:
+        for _ in range(rng.integers(1, 6)):
+            start = rng.integers(0, n_steps)
+            df.iloc[start : start + rng.integers(1, 15), df.columns.get_loc(column)] = np.nan
+        df.iloc[: rng.integers(0, 4), df.columns.get_loc(column)] = np.nan
+        df.iloc[n_steps - rng.integers(0, 4) :, df.columns.get_loc(column)] = np.nan
+    return df
+
+
+def _windows_without_nan(x: np.ndarray, window_length: int, subset: slice = slice(None)) -> np.ndarray:
+    x_slide_view = sliding_window_view(x, (window_length, x.shape[1]))[:, :, subset]
+    return ~np.any(np.isnan(x_slide_view), axis=(2, 3)).flatten()
+
+
+def _groups_without_nan(
+    cfg: Config, df_ts: pd.DataFrame, groups: dict, window_length: int, offset: int = 0, subset=None
+):
+    mask_groups, mask_mandatory_groups = None, None
+    for group_name, group_var in groups.items():
+        g_mask = _windows_without_nan(
+            df_ts[group_var].values[offset:], window_length, subset if subset is not None else slice(None)
+        )
+        mask_groups = g_mask if mask_groups is None else mask_groups | g_mask
+        if cfg.nan_probability is not None and cfg.nan_probability[group_name]["nan_seq"] == 0:
+            mask_mandatory_groups = g_mask if mask_mandatory_groups is None else mask_mandatory_groups & g_mask
+    return mask_groups if mask_mandatory_groups is None else mask_groups & mask_mandatory_groups
+
+
+def _sliding_window_validation(dataset: BaseDataset, df_ts: pd.DataFrame) -> np.ndarray:
+    """Sliding-window implementation of `BaseDataset._validate_samples` (before the prefix sums were used)."""
+    cfg = dataset.cfg
+    w_hindcast = cfg.seq_length_hindcast
+    flag = np.arange(len(df_ts)) >= w_hindcast - 1
+    last_forecast = len(df_ts) - cfg.seq_length_forecast
+    flag &= np.arange(len(df_ts)) < last_forecast
+
+    if isinstance(cfg.dynamic_input, list):
+        flag[w_hindcast - 1 :] &= _windows_without_nan(df_ts[dataset.hindcast_input].values, w_hindcast)
+    elif cfg.custom_seq_processing is None:
+        flag[w_hindcast - 1 :] &= _groups_without_nan(cfg, df_ts, cfg.dynamic_input, w_hindcast)
+    else:
+        aux_index = 0
+        for k, v in cfg.custom_seq_processing.items():
+            subset = slice(aux_index, aux_index + v["n_steps"] * v["freq_factor"])
+            if isinstance(cfg.dynamic_input[k], list):
+                flag[w_hindcast - 1 :] &= _windows_without_nan(df_ts[cfg.dynamic_input[k]].values, w_hindcast, subset)
+            else:
+                flag[w_hindcast - 1 :] &= _groups_without_nan(
+                    cfg, df_ts, cfg.dynamic_input[k], w_hindcast, subset=subset
+                )
+            aux_index += v["n_steps"] * v["freq_factor"]
+
+    y = df_ts[cfg.target].values[w_hindcast + cfg.seq_length_forecast - cfg.predict_last_n :]
+    y_slide_view = sliding_window_view(y, (cfg.predict_last_n, y.shape[1]))
+    flag[w_hindcast - 1 : last_forecast] &= ~np.all(np.isnan(y_slide_view), axis=(2, 3)).flatten()
+
+    if isinstance(cfg.forecast_input, list) and cfg.forecast_input:
+        x = df_ts[cfg.forecast_input].values[w_hindcast:]
+        flag[w_hindcast - 1 : last_forecast] &= _windows_without_nan(x, cfg.seq_length_forecast)
+    elif isinstance(cfg.forecast_input, dict):
+        flag[w_hindcast - 1 : last_forecast] &= _groups_without_nan(
+            cfg, df_ts, cfg.forecast_input, cfg.seq_length_forecast, offset=w_hindcast
+        )
+
+    return flag
+
+
+@pytest.mark.parametrize("name", list(CONFIGS))
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("n_steps", [30, 45, 200])
+def test_validate_samples_matches_sliding_windows(name, seed, n_steps):
+    dataset = _dataset(name)
+    df_ts = _frame(n_steps=n_steps, seed=seed)
+
+    flag = dataset._validate_samples(df_ts=df_ts, df_attributes=None, check_NaN=True)
+
+    np.testing.assert_array_equal(flag, _sliding_window_validation(dataset=dataset, df_ts=df_ts))
+
+
+@pytest.mark.parametrize("window_length", [1, 4, 10])
+def test_window_sum_matches_direct_sums(window_length):
+    x = np.random.default_rng(0).integers(0, 2, size=40).astype(bool)
+    for start in (0, 3):
+        n_windows = len(x) - start - window_length + 1
+        expected = [x[start + j : start + j + window_length].sum() for j in range(n_windows)]
+
+        result = BaseDataset._window_sum(x=x, start=start, window_length=window_length, n_windows=n_windows)
+
+        np.testing.assert_array_equal(result, expected)
+
+
+def test_nan_free_windows_with_nan_at_the_edges():
+    x = np.ones((10, 2))
+    x[0, 0] = np.nan
+    x[-1, 1] = np.nan
+
+    result = BaseDataset._nan_free_windows(x=x, start=0, window_length=3, n_windows=8)
+
+    np.testing.assert_array_equal(result, [False, True, True, True, True, True, True, False])